@@ -27,7 +27,12 @@
 
 #include "boost/python/stl_iterator.hpp"
 
+#include <algorithm>
+#include <cstdio>
+#include <cstring>
 #include <fstream>
+#include <map>
+#include <memory>
 
 // Custom error codes for Exiv2 exceptions
 #define METADATA_NOT_READ 101
@@ -45,9 +50,735 @@
 namespace exiv2wrapper
 {
 
+// A process-wide cache of the static descriptions of the tags, by key.
+// The descriptions are computed outside of the lock (this calls into libexiv2
+// and may throw), a description computed concurrently for the same key is
+// discarded. The descriptions of EXIF and IPTC tags never change, their number
+// is bounded. Those of XMP tags depend on the namespaces registered, they are
+// cleared whenever a namespace is registered or unregistered.
+template <typename Info>
+class TagInfoCache
+{
+public:
+    typedef boost::shared_ptr<const Info> Pointer;
+
+    TagInfoCache(): _lock(PyThread_allocate_lock()) {}
+
+    Pointer find(const std::string& key)
+    {
+        Pointer info;
+        PyThread_acquire_lock(_lock, WAIT_LOCK);
+        typename std::map<std::string, Pointer>::const_iterator i =
+            _infos.find(key);
+        if (i != _infos.end())
+        {
+            info = i->second;
+        }
+        PyThread_release_lock(_lock);
+        return info;
+    }
+
+    Pointer insert(const std::string& key, Info* info)
+    {
+        Pointer pointer(info);
+        PyThread_acquire_lock(_lock, WAIT_LOCK);
+        pointer = _infos.insert(std::make_pair(key, pointer)).first->second;
+        PyThread_release_lock(_lock);
+        return pointer;
+    }
+
+    void clear()
+    {
+        // The descriptions still referenced by tags are kept alive by them,
+        // the others are deleted once the lock is released.
+        std::map<std::string, Pointer> infos;
+        PyThread_acquire_lock(_lock, WAIT_LOCK);
+        _infos.swap(infos);
+        PyThread_release_lock(_lock);
+    }
+
+private:
+    PyThread_type_lock _lock;
+    std::map<std::string, Pointer> _infos;
+};
+
+static TagInfoCache<ExifTagInfo>& exifTagInfos()
+{
+    static TagInfoCache<ExifTagInfo> cache;
+    return cache;
+}
+
+static TagInfoCache<IptcTagInfo>& iptcTagInfos()
+{
+    static TagInfoCache<IptcTagInfo> cache;
+    return cache;
+}
+
+static TagInfoCache<XmpTagInfo>& xmpTagInfos()
+{
+    static TagInfoCache<XmpTagInfo> cache;
+    return cache;
+}
+
+// Return the shared description of the EXIF tag of a datum.
+static ExifTagInfoPointer exifTagInfo(const Exiv2::Exifdatum& datum)
+{
+    const std::string key = datum.key();
+    ExifTagInfoPointer cached = exifTagInfos().find(key);
+    if (cached)
+    {
+        return cached;
+    }
+
+    ExifTagInfo* info = new ExifTagInfo();
+// Conditional code, exiv2 0.21 changed APIs we need
+// (see https://bugs.launchpad.net/pyexiv2/+bug/684177).
+#if EXIV2_TEST_VERSION(0,21,0)
+    Exiv2::ExifKey exifKey(key);
+    info->type = Exiv2::TypeInfo::typeName(exifKey.defaultTypeId());
+    info->name = exifKey.tagName();
+    info->label = exifKey.tagLabel();
+    info->description = exifKey.tagDesc();
+    info->sectionName = Exiv2::ExifTags::sectionName(exifKey);
+    // The section description is not exposed in the API any longer
+    // (see http://dev.exiv2.org/issues/744). For want of anything better,
+    // fall back on the section’s name.
+    info->sectionDescription = info->sectionName;
+#else
+    const uint16_t tag = datum.tag();
+    const Exiv2::IfdId ifd = datum.ifdId();
+    info->type = Exiv2::TypeInfo::typeName(Exiv2::ExifTags::tagType(tag, ifd));
+    info->name = Exiv2::ExifTags::tagName(tag, ifd);
+    info->label = Exiv2::ExifTags::tagLabel(tag, ifd);
+    info->description = Exiv2::ExifTags::tagDesc(tag, ifd);
+    info->sectionName = Exiv2::ExifTags::sectionName(tag, ifd);
+    info->sectionDescription = Exiv2::ExifTags::sectionDesc(tag, ifd);
+#endif
+    return exifTagInfos().insert(key, info);
+}
+
+// Return the shared description of the IPTC tag of a datum.
+static IptcTagInfoPointer iptcTagInfo(const Exiv2::Iptcdatum& datum)
+{
+    const std::string key = datum.key();
+    IptcTagInfoPointer cached = iptcTagInfos().find(key);
+    if (cached)
+    {
+        return cached;
+    }
+
+    IptcTagInfo* info = new IptcTagInfo();
+    const uint16_t tag = datum.tag();
+    const uint16_t record = datum.record();
+    info->type = Exiv2::TypeInfo::typeName(Exiv2::IptcDataSets::dataSetType(tag, record));
+    info->name = Exiv2::IptcDataSets::dataSetName(tag, record);
+    info->title = Exiv2::IptcDataSets::dataSetTitle(tag, record);
+    info->description = Exiv2::IptcDataSets::dataSetDesc(tag, record);
+    // What is the photoshop name anyway? Where is it used?
+    info->photoshopName = Exiv2::IptcDataSets::dataSetPsName(tag, record);
+    info->repeatable = Exiv2::IptcDataSets::dataSetRepeatable(tag, record);
+    info->recordName = Exiv2::IptcDataSets::recordName(record);
+    info->recordDescription = Exiv2::IptcDataSets::recordDesc(record);
+    return iptcTagInfos().insert(key, info);
+}
+
+// Return the shared description of an XMP tag.
+static XmpTagInfoPointer xmpTagInfo(const Exiv2::XmpKey& key)
+{
+    XmpTagInfoPointer cached = xmpTagInfos().find(key.key());
+    if (cached)
+    {
+        return cached;
+    }
+
+    XmpTagInfo* info = new XmpTagInfo();
+    info->exiv2Type = Exiv2::TypeInfo::typeName(Exiv2::XmpProperties::propertyType(key));
+
+    const char* title = Exiv2::XmpProperties::propertyTitle(key);
+    if (title != 0)
+    {
+        info->title = title;
+    }
+
+    const char* description = Exiv2::XmpProperties::propertyDesc(key);
+    if (description != 0)
+    {
+        info->description = description;
+    }
+
+    const Exiv2::XmpPropertyInfo* property = Exiv2::XmpProperties::propertyInfo(key);
+    if (property != 0)
+    {
+        info->name = property->name_;
+        info->type = property->xmpValueType_;
+    }
+    return xmpTagInfos().insert(key.key(), info);
+}
+
+// Return the shared description of an EXIF tag, given its key.
+static ExifTagInfoPointer exifTagInfo(const std::string& key)
+{
+    ExifTagInfoPointer cached = exifTagInfos().find(key);
+    if (cached)
+    {
+        return cached;
+    }
+    return exifTagInfo(Exiv2::Exifdatum(Exiv2::ExifKey(key)));
+}
+
+// Return the shared description of an IPTC tag, given its key.
+static IptcTagInfoPointer iptcTagInfo(const std::string& key)
+{
+    IptcTagInfoPointer cached = iptcTagInfos().find(key);
+    if (cached)
+    {
+        return cached;
+    }
+    return iptcTagInfo(Exiv2::Iptcdatum(Exiv2::IptcKey(key)));
+}
+
+// Append the components of an integer value to a python list.
+// Return false if the value is not of the expected type.
+template <typename T>
+static bool appendIntegers(const Exiv2::Value& value,
+                           boost::python::list& components)
+{
+    const Exiv2::ValueType<T>* typed =
+        dynamic_cast<const Exiv2::ValueType<T>*>(&value);
+    if (typed == 0)
+    {
+        return false;
+    }
+    for(typename Exiv2::ValueType<T>::ValueList::const_iterator i =
+            typed->value_.begin();
+        i != typed->value_.end();
+        ++i)
+    {
+        components.append(*i);
+    }
+    return true;
+}
+
+// Append the components of a rational value to a python list, as
+// (numerator, denominator) tuples.
+// Return false if the value is not of the expected type.
+template <typename T>
+static bool appendRationals(const Exiv2::Value& value,
+                            boost::python::list& components)
+{
+    const Exiv2::ValueType<T>* typed =
+        dynamic_cast<const Exiv2::ValueType<T>*>(&value);
+    if (typed == 0)
+    {
+        return false;
+    }
+    for(typename Exiv2::ValueType<T>::ValueList::const_iterator i =
+            typed->value_.begin();
+        i != typed->value_.end();
+        ++i)
+    {
+        components.append(boost::python::make_tuple(i->first, i->second));
+    }
+    return true;
+}
+
+// Return the type name of an EXIF datum that belongs to an image.
+// Where available, the type is extracted from the metadata, it is more
+// reliable than static type information. The exception is for user comments,
+// for which we’d rather keep the 'Comment' type instead of 'Undefined'.
+static std::string exifDatumTypeName(const Exiv2::Exifdatum& datum)
+{
+    const std::string type = exifTagInfo(datum)->type;
+    if (type != "Comment")
+    {
+        const char* typeName = datum.typeName();
+        if (typeName != 0)
+        {
+            return typeName;
+        }
+    }
+    return type;
+}
+
+// Return the value of an XMP datum as a string (XmpText), a list of strings
+// (XmpAlt, XmpBag, XmpSeq) or a dictionary (LangAlt).
+static const std::string xmpTextValue(const Exiv2::Xmpdatum& datum)
+{
+    return dynamic_cast<const Exiv2::XmpTextValue*>(&datum.value())->value_;
+}
+
+static const boost::python::list xmpArrayValue(const Exiv2::Xmpdatum& datum)
+{
+    std::vector<std::string> value =
+        dynamic_cast<const Exiv2::XmpArrayValue*>(&datum.value())->value_;
+    boost::python::list rvalue;
+    for(std::vector<std::string>::const_iterator i = value.begin();
+        i != value.end(); ++i)
+    {
+        rvalue.append(*i);
+    }
+    return rvalue;
+}
+
+static const boost::python::dict xmpLangAltValue(const Exiv2::Xmpdatum& datum)
+{
+    Exiv2::LangAltValue::ValueType value =
+        dynamic_cast<const Exiv2::LangAltValue*>(&datum.value())->value_;
+    boost::python::dict rvalue;
+    for (Exiv2::LangAltValue::ValueType::const_iterator i = value.begin();
+         i != value.end(); ++i)
+    {
+        rvalue[i->first] = i->second;
+    }
+    return rvalue;
+}
+
+// The data of (all the repetitions of) an IPTC tag.
+typedef std::vector<Exiv2::Iptcdatum> IptcValues;
+
+// Convert raw values to the data of (all the repetitions of) an IPTC tag,
+// without modifying any metadata.
+// Throw an exception if a value is invalid or if several values are given to
+// a tag that is not repeatable.
+static IptcValues readIptcRawValues(const Exiv2::IptcKey& key,
+                                    bool repeatable,
+                                    const boost::python::list& values)
+{
+    if (!repeatable && (boost::python::len(values) > 1))
+    {
+        // The tag is not repeatable but we are trying to assign it more than
+        // one value.
+        throw Exiv2::Error(NON_REPEATABLE);
+    }
+
+    IptcValues data;
+    unsigned int max = boost::python::len(values);
+    for (unsigned int i = 0; i < max; ++i)
+    {
+        std::string value = boost::python::extract<std::string>(values[i]);
+        Exiv2::Iptcdatum datum(key);
+        int result = datum.setValue(value);
+        if (result != 0)
+        {
+            throw Exiv2::Error(INVALID_VALUE);
+        }
+        data.push_back(datum);
+    }
+    return data;
+}
+
+// Set (all the repetitions of) an IPTC tag in the data of the given view to
+// data converted by readIptcRawValues(). Existing values are overridden in
+// place, missing ones are appended and extra ones are erased.
+static void setIptcValues(IptcIndex& index, const std::string& key,
+                          const IptcValues& data)
+{
+    // A copy, the positions of the tag change as values are appended.
+    const IptcIndex::Positions positions = index.find(key);
+    for (unsigned int i = 0; i < data.size(); ++i)
+    {
+        if (i < positions.size())
+        {
+            // Override an existing value
+            index.datum(positions[i]).setValue(&data[i].value());
+        }
+        else
+        {
+            // Append a new value
+            int state = index.add(data[i]);
+            if (state == 6)
+            {
+                throw Exiv2::Error(NON_REPEATABLE);
+            }
+        }
+    }
+    // Erase the remaining values if any
+    index.erase(key, data.size());
+}
+
+// Set the values of (all the repetitions of) an IPTC tag in the data of the
+// given view. The data is left untouched if a value is invalid.
+static void setIptcRawValues(IptcIndex& index, const Exiv2::IptcKey& key,
+                             bool repeatable,
+                             const boost::python::list& values)
+{
+    setIptcValues(index, key.key(), readIptcRawValues(key, repeatable, values));
+}
+
+// Set the value of an XMP datum from a list of strings (XmpAlt, XmpBag, XmpSeq)
+// or a dictionary (LangAlt).
+static void setXmpArrayValue(Exiv2::Xmpdatum& datum,
+                             const boost::python::list& values)
+{
+    // Reset the value
+    datum.setValue(0);
+
+    for(boost::python::stl_input_iterator<std::string> iterator(values);
+        iterator != boost::python::stl_input_iterator<std::string>();
+        ++iterator)
+    {
+        datum.setValue(*iterator);
+    }
+}
+
+static void setXmpLangAltValue(Exiv2::Xmpdatum& datum,
+                               const boost::python::dict& values)
+{
+    // Reset the value
+    datum.setValue(0);
+
+    for(boost::python::stl_input_iterator<std::string> iterator(values);
+        iterator != boost::python::stl_input_iterator<std::string>();
+        ++iterator)
+    {
+        std::string key = *iterator;
+        std::string value = boost::python::extract<std::string>(values.get(key));
+        datum.setValue("lang=\"" + key + "\" " + value);
+    }
+}
+
+PendingError::PendingError(): _type(0), _value(0), _traceback(0)
+{
+}
+
+PendingError::~PendingError()
+{
+    Py_XDECREF(_type);
+    Py_XDECREF(_value);
+    Py_XDECREF(_traceback);
+}
+
+void PendingError::fetch()
+{
+    if (_type == 0)
+    {
+        PyErr_Fetch(&_type, &_value, &_traceback);
+    }
+    else
+    {
+        PyErr_Clear();
+    }
+}
+
+void PendingError::raise()
+{
+    if (_type != 0)
+    {
+        // PyErr_Restore steals the references.
+        PyErr_Restore(_type, _value, _traceback);
+        _type = _value = _traceback = 0;
+        boost::python::throw_error_already_set();
+    }
+}
+
+// The size of the buffer of data read ahead from a python file object.
+#define FILE_OBJECT_CHUNK_SIZE 4096
+
+FileObjectIo::FileObjectIo(boost::python::object fileobj, PendingError& error):
+    _pendingError(error), _position(0), _open(false), _eof(false), _error(0),
+    _chunk(FILE_OBJECT_CHUNK_SIZE), _chunkOffset(0), _chunkSize(0)
+{
+    boost::python::object name = boost::python::getattr(fileobj, "name", "");
+    boost::python::extract<std::string> path(name);
+    if (path.check())
+    {
+        _path = path();
+    }
+
+    // Determine the size of the data, and leave the file object where it was.
+    boost::python::object position = fileobj.attr("tell")();
+    fileobj.attr("seek")(0, 2);
+    _size = boost::python::extract<long>(fileobj.attr("tell")());
+    fileobj.attr("seek")(position);
+
+    _fileobj = fileobj.ptr();
+    Py_INCREF(_fileobj);
+}
+
+FileObjectIo::~FileObjectIo()
+{
+    // The io may be destroyed by libexiv2 while the GIL is released.
+    PyGILState_STATE state = PyGILState_Ensure();
+    Py_DECREF(_fileobj);
+    PyGILState_Release(state);
+}
+
+long FileObjectIo::_readAt(long offset, Exiv2::byte* buf, long count)
+{
+    long total = 0;
+    PyGILState_STATE state = PyGILState_Ensure();
+    try
+    {
+        boost::python::object fileobj(
+            boost::python::handle<>(boost::python::borrowed(_fileobj)));
+        fileobj.attr("seek")(offset);
+        // A file object may return less data than requested before the end
+        // of the file (e.g. a network stream).
+        while (total < count)
+        {
+            boost::python::object data = fileobj.attr("read")(count - total);
+            char* bytes = 0;
+            Py_ssize_t length = 0;
+            if (PyString_AsStringAndSize(data.ptr(), &bytes, &length) != 0)
+            {
+                boost::python::throw_error_already_set();
+            }
+            if (length == 0)
+            {
+                break;
+            }
+            length = std::min((long) length, count - total);
+            std::memcpy(buf + total, bytes, length);
+            total += length;
+        }
+    }
+    catch (boost::python::error_already_set&)
+    {
+        _pendingError.fetch();
+        total = -1;
+    }
+    PyGILState_Release(state);
+    return total;
+}
+
+bool FileObjectIo::_load()
+{
+    if (_memory.get() != 0)
+    {
+        return true;
+    }
+    Exiv2::DataBuf data(_size);
+    if (_readAt(0, data.pData_, _size) != _size)
+    {
+        _error = 1;
+        return false;
+    }
+    // Let the memory io own a copy of the data, as it modifies it in place
+    // when mapped writeable.
+    _memory.reset(new Exiv2::MemIo);
+    _memory->write(data.pData_, data.size_);
+    _memory->seek(_position, Exiv2::BasicIo::beg);
+    return true;
+}
+
+int FileObjectIo::open()
+{
+    if (_memory.get() != 0)
+    {
+        return _memory->open();
+    }
+    _position = 0;
+    _open = true;
+    _eof = false;
+    _error = 0;
+    return 0;
+}
+
+int FileObjectIo::close()
+{
+    if (_memory.get() != 0)
+    {
+        return _memory->close();
+    }
+    _open = false;
+    return 0;
+}
+
+long FileObjectIo::write(const Exiv2::byte* data, long wcount)
+{
+    return _load() ? _memory->write(data, wcount) : 0;
+}
+
+long FileObjectIo::write(Exiv2::BasicIo& src)
+{
+    return _load() ? _memory->write(src) : 0;
+}
+
+int FileObjectIo::putb(Exiv2::byte data)
+{
+    return _load() ? _memory->putb(data) : EOF;
+}
+
+Exiv2::DataBuf FileObjectIo::read(long rcount)
+{
+    Exiv2::DataBuf buf(rcount);
+    long readCount = read(buf.pData_, buf.size_);
+    buf.size_ = readCount;
+    return buf;
+}
+
+long FileObjectIo::read(Exiv2::byte* buf, long rcount)
+{
+    if (_memory.get() != 0)
+    {
+        return _memory->read(buf, rcount);
+    }
+
+    if (rcount > _size - _position)
+    {
+        rcount = _size - _position;
+        _eof = true;
+    }
+    long done = 0;
+    while (done < rcount)
+    {
+        if (_position >= _chunkOffset && _position < _chunkOffset + _chunkSize)
+        {
+            // Serve what was read ahead.
+            long count = std::min(rcount - done,
+                                  _chunkOffset + _chunkSize - _position);
+            std::memcpy(buf + done, &_chunk[_position - _chunkOffset], count);
+            done += count;
+            _position += count;
+        }
+        else if (rcount - done >= FILE_OBJECT_CHUNK_SIZE)
+        {
+            // Large reads bypass the buffer.
+            long count = _readAt(_position, buf + done, rcount - done);
+            if (count < rcount - done)
+            {
+                if (count < 0)
+                {
+                    _error = 1;
+                }
+                _eof = true;
+                done += std::max(count, 0L);
+                _position += std::max(count, 0L);
+                break;
+            }
+            done += count;
+            _position += count;
+        }
+        else
+        {
+            long count = _readAt(_position, &_chunk[0],
+                                 std::min((long) FILE_OBJECT_CHUNK_SIZE,
+                                          _size - _position));
+            _chunkOffset = _position;
+            _chunkSize = std::max(count, 0L);
+            if (count <= 0)
+            {
+                if (count < 0)
+                {
+                    _error = 1;
+                }
+                _eof = true;
+                break;
+            }
+        }
+    }
+    return done;
+}
+
+int FileObjectIo::getb()
+{
+    Exiv2::byte data;
+    if (read(&data, 1) != 1)
+    {
+        return EOF;
+    }
+    return data;
+}
+
+void FileObjectIo::transfer(Exiv2::BasicIo& src)
+{
+    // Keep the data written back in memory, the file object is left as is.
+    if (_memory.get() == 0)
+    {
+        _memory.reset(new Exiv2::MemIo);
+    }
+    _memory->transfer(src);
+}
+
+int FileObjectIo::seek(long offset, Exiv2::BasicIo::Position pos)
+{
+    if (_memory.get() != 0)
+    {
+        return _memory->seek(offset, pos);
+    }
+
+    long position = 0;
+    switch (pos)
+    {
+        case Exiv2::BasicIo::cur:
+            position = _position + offset;
+            break;
+        case Exiv2::BasicIo::beg:
+            position = offset;
+            break;
+        case Exiv2::BasicIo::end:
+            position = _size + offset;
+            break;
+    }
+    if (position < 0 || position > _size)
+    {
+        return 1;
+    }
+    _position = position;
+    _eof = false;
+    return 0;
+}
+
+Exiv2::byte* FileObjectIo::mmap(bool isWriteable)
+{
+    if (!_load())
+    {
+        throw Exiv2::Error(2, _path, "read failed", "FileObjectIo::mmap");
+    }
+    return _memory->mmap(isWriteable);
+}
+
+int FileObjectIo::munmap()
+{
+    return (_memory.get() != 0) ? _memory->munmap() : 0;
+}
+
+long FileObjectIo::tell() const
+{
+    return (_memory.get() != 0) ? _memory->tell() : _position;
+}
+
+long FileObjectIo::size() const
+{
+    return (_memory.get() != 0) ? _memory->size() : _size;
+}
+
+bool FileObjectIo::isopen() const
+{
+    return (_memory.get() != 0) ? _memory->isopen() : _open;
+}
+
+int FileObjectIo::error() const
+{
+    return (_memory.get() != 0) ? _memory->error() : _error;
+}
+
+bool FileObjectIo::eof() const
+{
+    return (_memory.get() != 0) ? _memory->eof() : _eof;
+}
+
+std::string FileObjectIo::path() const
+{
+    return _path;
+}
+
+#ifdef EXV_UNICODE_PATH
+std::wstring FileObjectIo::wpath() const
+{
+    return std::wstring(_path.begin(), _path.end());
+}
+#endif
+
+Exiv2::BasicIo::AutoPtr FileObjectIo::temporary() const
+{
+    return Exiv2::BasicIo::AutoPtr(new Exiv2::MemIo);
+}
+
 void Image::_instantiate_image()
 {
     _exifThumbnail = 0;
+    _invalidateIndexes();
 
     // If an exception is thrown, it has to be done outside of the
     // Py_{BEGIN,END}_ALLOW_THREADS block.
@@ -59,7 +790,18 @@ void Image::_instantiate_image()
 
     try
     {
-        if (_data != 0)
+        if (_fileIo != 0)
+        {
+            // libexiv2 takes ownership of the io.
+            const std::string path = _fileIo->path();
+            _image = Exiv2::ImageFactory::open(Exiv2::BasicIo::AutoPtr(_fileIo));
+            if (_image.get() == 0)
+            {
+                _fileIo = 0;
+                throw Exiv2::Error(11, path);
+            }
+        }
+        else if (_data != 0)
         {
             _image = Exiv2::ImageFactory::open(_data, _size);
         }
@@ -76,6 +818,8 @@ void Image::_instantiate_image()
     // Re-acquire the GIL
     Py_END_ALLOW_THREADS
 
+    _ioError.raise();
+
     if (error.code() == 0)
     {
         assert(_image.get() != 0);
@@ -92,40 +836,148 @@ Image::Image(const std::string& filename)
 {
     _filename = filename;
     _data = 0;
+    _ownData = false;
+    _view.obj = 0;
+    _fileIo = 0;
     _instantiate_image();
 }
 
-// From buffer constructor
-Image::Image(const std::string& buffer, unsigned long size)
-{
-    // Deep copy of the data buffer
-    _data = new Exiv2::byte[size];
-    for (unsigned long i = 0; i < size; ++i)
+Image::Image()
+{
+    _data = 0;
+    _ownData = false;
+    _view.obj = 0;
+    _fileIo = 0;
+    _exifThumbnail = 0;
+}
+
+// From file object constructor
+Image* Image::fromFileObject(boost::python::object fileobj)
+{
+    std::auto_ptr<Image> image(new Image());
+    image->_fileIo = new FileObjectIo(fileobj, image->_ioError);
+    image->_instantiate_image();
+    return image.release();
+}
+
+// From buffer constructor
+Image::Image(boost::python::object buffer, bool copy)
+{
+    _data = 0;
+    _ownData = false;
+    _view.obj = 0;
+    _fileIo = 0;
+    _initFromBuffer(buffer, copy, false);
+}
+
+// From memory mapping constructor
+Image* Image::fromMapping(boost::python::object mapping)
+{
+    std::auto_ptr<Image> image(new Image());
+    image->_initFromBuffer(mapping, false, true);
+    return image.release();
+}
+
+void Image::_initFromBuffer(boost::python::object buffer, bool copy,
+                            bool borrowOldStyle)
+{
+    const void* data = 0;
+    Py_ssize_t size = 0;
+
+    if (PyObject_CheckBuffer(buffer.ptr()))
+    {
+        // New-style buffer interface (str, bytearray, memoryview).
+        // The view is held until the image is destroyed, which e.g. prevents
+        // a bytearray from being resized under our feet.
+        if (PyObject_GetBuffer(buffer.ptr(), &_view, PyBUF_SIMPLE) != 0)
+        {
+            boost::python::throw_error_already_set();
+        }
+        data = _view.buf;
+        size = _view.len;
+    }
+    else if (PyObject_AsReadBuffer(buffer.ptr(), &data, &size) == 0)
+    {
+        // Old-style buffer interface (buffer, mmap). No view can be held on
+        // such a buffer, nothing would prevent e.g. an mmap from being closed
+        // under our feet: the data is copied, unless the caller guarantees
+        // that the buffer stays valid.
+        copy = copy || !borrowOldStyle;
+    }
+    else
+    {
+        boost::python::throw_error_already_set();
+    }
+
+    // The destructor is not called if the constructor throws, release the
+    // view (and the data) whatever the exception.
+    try
+    {
+        if (copy)
+        {
+            // Deep copy of the data buffer
+            _data = new Exiv2::byte[size];
+            _ownData = true;
+            std::memcpy(_data, data, size);
+            if (_view.obj != 0)
+            {
+                PyBuffer_Release(&_view);
+            }
+        }
+        else
+        {
+            // Borrow the data buffer. It is copied before the metadata is
+            // written back (see writeMetadata()), libexiv2 would otherwise
+            // modify it in place for TIFF-based images.
+            _data = (Exiv2::byte*) data;
+            _ownData = false;
+            _buffer = buffer;
+        }
+
+        _size = size;
+
+        _instantiate_image();
+    }
+    catch (...)
     {
-        _data[i] = buffer[i];
+        _releaseBuffer();
+        throw;
     }
-
-    _size = size;
-    _instantiate_image();
 }
 
 // Copy constructor
 Image::Image(const Image& image)
 {
     _filename = image._filename;
+    _data = 0;
+    _ownData = false;
+    _view.obj = 0;
+    _fileIo = 0;
     _instantiate_image();
 }
 
 Image::~Image()
 {
-    if (_data != 0)
+    _releaseBuffer();
+    if (_exifThumbnail != 0)
+    {
+        delete _exifThumbnail;
+    }
+}
+
+void Image::_releaseBuffer()
+{
+    if (_ownData)
     {
         delete[] _data;
     }
-    if (_exifThumbnail != 0)
+    _data = 0;
+    _ownData = false;
+    if (_view.obj != 0)
     {
-        delete _exifThumbnail;
+        PyBuffer_Release(&_view);
     }
+    _buffer = boost::python::object();
 }
 
 void Image::readMetadata()
@@ -141,8 +993,10 @@ void Image::readMetadata()
     try
     {
         _image->readMetadata();
+        _invalidateIndexes();
         _exifData = &_image->exifData();
         _iptcData = &_image->iptcData();
+        _iptcIndex.reset(_iptcData);
         _xmpData = &_image->xmpData();
         _dataRead = true;
     }
@@ -154,6 +1008,8 @@ void Image::readMetadata()
     // Re-acquire the GIL
     Py_END_ALLOW_THREADS
 
+    _ioError.raise();
+
     if (error.code() != 0)
     {
         throw error;
@@ -168,13 +1024,28 @@ void Image::writeMetadata()
     // Py_{BEGIN,END}_ALLOW_THREADS block.
     Exiv2::Error error(0);
 
+    // libexiv2 maps the data of the memory io writeable and patches
+    // TIFF-based images in place when the new values fit. Data borrowed from
+    // a python buffer (possibly read-only, or a read-only mapping) is copied
+    // first, the memory io then owns the copy.
+    const bool borrowed = (_data != 0) && !_ownData;
+    bool copied = false;
+
     // Release the GIL to allow other python threads to run
     // while writing metadata.
     Py_BEGIN_ALLOW_THREADS
 
     try
     {
+        if (borrowed)
+        {
+            Exiv2::MemIo copy;
+            copy.write(_data, _size);
+            _image->io().transfer(copy);
+            copied = true;
+        }
         _image->writeMetadata();
+        _invalidateIndexes();
     }
     catch (Exiv2::Error& err)
     {
@@ -184,6 +1055,14 @@ void Image::writeMetadata()
     // Re-acquire the GIL
     Py_END_ALLOW_THREADS
 
+    if (copied)
+    {
+        // The image no longer refers to the buffer.
+        _releaseBuffer();
+    }
+
+    _ioError.raise();
+
     if (error.code() != 0)
     {
         throw error;
@@ -226,88 +1105,204 @@ const ExifTag Image::getExifTag(std::string key)
 {
     CHECK_METADATA_READ
 
-    Exiv2::ExifKey exifKey = Exiv2::ExifKey(key);
-
-    if(_exifData->findKey(exifKey) == _exifData->end())
+    Exiv2::ExifData::iterator datum = _findExifDatum(key);
+    if(datum == _exifData->end())
     {
         throw Exiv2::Error(KEY_NOT_FOUND, key);
     }
 
-    return ExifTag(key, &(*_exifData)[key], _exifData, _image->byteOrder());
+    return ExifTag(key, &(*datum), _exifData, _image->byteOrder());
+}
+
+boost::python::tuple Image::exifSnapshot()
+{
+    CHECK_METADATA_READ
+
+    boost::python::list keys;
+    boost::python::list types;
+    boost::python::list values;
+    _exifSnapshot(0, keys, types, values);
+    return boost::python::make_tuple(boost::python::tuple(keys),
+                                     boost::python::tuple(types),
+                                     boost::python::tuple(values),
+                                     int(_image->byteOrder()));
+}
+
+void Image::_exifSnapshot(const KeySet* filter,
+                          boost::python::list& keys,
+                          boost::python::list& types,
+                          boost::python::list& values)
+{
+    for(Exiv2::ExifMetadata::iterator i = _exifData->begin();
+        i != _exifData->end();
+        ++i)
+    {
+        const std::string key = i->key();
+        if ((filter != 0) && (filter->find(key) == filter->end()))
+        {
+            continue;
+        }
+        keys.append(key);
+        types.append(exifDatumTypeName(*i));
+        values.append(i->toString());
+    }
 }
 
 void Image::deleteExifTag(std::string key)
 {
     CHECK_METADATA_READ
 
-    Exiv2::ExifKey exifKey = Exiv2::ExifKey(key);
-    Exiv2::ExifMetadata::iterator datum = _exifData->findKey(exifKey);
+    Exiv2::ExifData::iterator datum = _findExifDatum(key);
     if(datum == _exifData->end())
     {
         throw Exiv2::Error(KEY_NOT_FOUND, key);
     }
 
+    if (_exifDuplicates)
+    {
+        // Another datum with the same key may become the first one.
+        _exifIndexed = false;
+    }
+    else
+    {
+        _exifIndex.erase(datum->key());
+    }
     _exifData->erase(datum);
 }
 
-boost::python::list Image::iptcKeys()
+void Image::_iptcKeyCounts(std::vector<std::string>& keys,
+                           std::map<std::string, long>& counts)
 {
-    CHECK_METADATA_READ
-
-    boost::python::list keys;
     for(Exiv2::IptcMetadata::iterator i = _iptcData->begin();
         i != _iptcData->end();
         ++i)
     {
         // The key is appended to the list if and only if it is not already
         // present.
-        if (keys.count(i->key()) == 0)
+        const std::string key = i->key();
+        long& count = counts[key];
+        if (count == 0)
         {
-            keys.append(i->key());
+            keys.push_back(key);
         }
+        ++count;
     }
-    return keys;
 }
 
-const IptcTag Image::getIptcTag(std::string key)
+boost::python::list Image::iptcKeys()
 {
     CHECK_METADATA_READ
 
-    Exiv2::IptcKey iptcKey = Exiv2::IptcKey(key);
+    std::vector<std::string> keys;
+    std::map<std::string, long> counts;
+    _iptcKeyCounts(keys, counts);
 
-    if(_iptcData->findKey(iptcKey) == _iptcData->end())
+    boost::python::list result;
+    for(std::vector<std::string>::const_iterator i = keys.begin();
+        i != keys.end();
+        ++i)
     {
-        throw Exiv2::Error(KEY_NOT_FOUND, key);
+        result.append(*i);
     }
+    return result;
+}
 
-    return IptcTag(key, _iptcData);
+boost::python::list Image::iptcKeyCounts()
+{
+    CHECK_METADATA_READ
+
+    std::vector<std::string> keys;
+    std::map<std::string, long> counts;
+    _iptcKeyCounts(keys, counts);
+
+    boost::python::list result;
+    for(std::vector<std::string>::const_iterator i = keys.begin();
+        i != keys.end();
+        ++i)
+    {
+        result.append(boost::python::make_tuple(*i, counts[*i]));
+    }
+    return result;
 }
 
-void Image::deleteIptcTag(std::string key)
+const IptcTag Image::getIptcTag(std::string key)
 {
     CHECK_METADATA_READ
 
     Exiv2::IptcKey iptcKey = Exiv2::IptcKey(key);
-    Exiv2::IptcMetadata::iterator dataIterator = _iptcData->findKey(iptcKey);
 
-    if (dataIterator == _iptcData->end())
+    if(_iptcIndex.find(iptcKey.key()).empty())
     {
         throw Exiv2::Error(KEY_NOT_FOUND, key);
     }
 
-    while (dataIterator != _iptcData->end())
+    return IptcTag(key, &_iptcIndex);
+}
+
+boost::python::tuple Image::iptcSnapshot()
+{
+    CHECK_METADATA_READ
+
+    boost::python::list keys;
+    boost::python::list types;
+    boost::python::list values;
+    _iptcSnapshot(0, keys, types, values);
+    return boost::python::make_tuple(boost::python::tuple(keys),
+                                     boost::python::tuple(types),
+                                     boost::python::tuple(values));
+}
+
+void Image::_iptcSnapshot(const KeySet* filter,
+                          boost::python::list& keys,
+                          boost::python::list& types,
+                          boost::python::list& values)
+{
+    // Position of each key in the lists above
+    std::map<std::string, long> positions;
+    for(Exiv2::IptcMetadata::iterator i = _iptcData->begin();
+        i != _iptcData->end();
+        ++i)
     {
-        if (dataIterator->key() == key)
+        const std::string key = i->key();
+        if ((filter != 0) && (filter->find(key) == filter->end()))
+        {
+            continue;
+        }
+        std::map<std::string, long>::const_iterator position =
+            positions.find(key);
+        if (position == positions.end())
         {
-            dataIterator = _iptcData->erase(dataIterator);
+            positions[key] = boost::python::len(keys);
+            keys.append(key);
+            types.append(std::string(Exiv2::TypeInfo::typeName(
+                Exiv2::IptcDataSets::dataSetType(i->tag(), i->record()))));
+            boost::python::list rawValues;
+            rawValues.append(i->toString());
+            values.append(rawValues);
         }
         else
         {
-            ++dataIterator;
+            boost::python::list rawValues =
+                boost::python::extract<boost::python::list>(values[position->second]);
+            rawValues.append(i->toString());
         }
     }
 }
 
+void Image::deleteIptcTag(std::string key)
+{
+    CHECK_METADATA_READ
+
+    Exiv2::IptcKey iptcKey = Exiv2::IptcKey(key);
+
+    if (_iptcIndex.find(iptcKey.key()).empty())
+    {
+        throw Exiv2::Error(KEY_NOT_FOUND, key);
+    }
+
+    _iptcIndex.erase(iptcKey.key());
+}
+
 boost::python::list Image::xmpKeys()
 {
     CHECK_METADATA_READ
@@ -326,30 +1321,344 @@ const XmpTag Image::getXmpTag(std::string key)
 {
     CHECK_METADATA_READ
 
-    Exiv2::XmpKey xmpKey = Exiv2::XmpKey(key);
-
-    if(_xmpData->findKey(xmpKey) == _xmpData->end())
+    Exiv2::XmpData::iterator datum = _findXmpDatum(key);
+    if(datum == _xmpData->end())
     {
         throw Exiv2::Error(KEY_NOT_FOUND, key);
     }
 
-    return XmpTag(key, &(*_xmpData)[key]);
+    return XmpTag(key, &(*datum));
+}
+
+boost::python::tuple Image::xmpSnapshot()
+{
+    CHECK_METADATA_READ
+
+    boost::python::list keys;
+    boost::python::list types;
+    boost::python::list values;
+    _xmpSnapshot(0, keys, types, values);
+    return boost::python::make_tuple(boost::python::tuple(keys),
+                                     boost::python::tuple(types),
+                                     boost::python::tuple(values));
+}
+
+void Image::_xmpSnapshot(const KeySet* filter,
+                         boost::python::list& keys,
+                         boost::python::list& types,
+                         boost::python::list& values)
+{
+    for(Exiv2::XmpMetadata::iterator i = _xmpData->begin();
+        i != _xmpData->end();
+        ++i)
+    {
+        const std::string key = i->key();
+        if ((filter != 0) && (filter->find(key) == filter->end()))
+        {
+            continue;
+        }
+        keys.append(key);
+
+        types.append(xmpTagInfo(Exiv2::XmpKey(key))->type);
+
+        switch (i->typeId())
+        {
+            case Exiv2::xmpText:
+                values.append(xmpTextValue(*i));
+                break;
+            case Exiv2::xmpAlt:
+            case Exiv2::xmpBag:
+            case Exiv2::xmpSeq:
+                values.append(xmpArrayValue(*i));
+                break;
+            case Exiv2::langAlt:
+                values.append(xmpLangAltValue(*i));
+                break;
+            default:
+                values.append(boost::python::object());
+        }
+    }
+}
+
+boost::python::tuple Image::tagsSnapshot(const boost::python::list& keys)
+{
+    CHECK_METADATA_READ
+
+    KeySet exifFilter;
+    KeySet iptcFilter;
+    KeySet xmpFilter;
+    for(boost::python::stl_input_iterator<std::string> iterator(keys);
+        iterator != boost::python::stl_input_iterator<std::string>();
+        ++iterator)
+    {
+        const std::string key = *iterator;
+        const std::string family = key.substr(0, key.find('.'));
+        if (family == "Exif")
+        {
+            exifFilter.insert(key);
+        }
+        else if (family == "Iptc")
+        {
+            iptcFilter.insert(key);
+        }
+        else if (family == "Xmp")
+        {
+            xmpFilter.insert(key);
+        }
+    }
+
+    boost::python::list rkeys;
+    boost::python::list types;
+    boost::python::list values;
+    if (!exifFilter.empty())
+    {
+        _exifSnapshot(&exifFilter, rkeys, types, values);
+    }
+    if (!iptcFilter.empty())
+    {
+        _iptcSnapshot(&iptcFilter, rkeys, types, values);
+    }
+    if (!xmpFilter.empty())
+    {
+        _xmpSnapshot(&xmpFilter, rkeys, types, values);
+    }
+    return boost::python::make_tuple(boost::python::tuple(rkeys),
+                                     boost::python::tuple(types),
+                                     boost::python::tuple(values),
+                                     int(_image->byteOrder()));
+}
+
+void Image::setTags(const boost::python::list& exifTags,
+                    const boost::python::list& iptcTags,
+                    const boost::python::list& xmpTags)
+{
+    CHECK_METADATA_READ
+
+    // Convert all the values first, so that no tag is set if one of them is
+    // invalid, then copy them into the data of the image.
+    std::vector<Exiv2::Exifdatum> exifData;
+    for(boost::python::stl_input_iterator<boost::python::tuple>
+            iterator(exifTags);
+        iterator != boost::python::stl_input_iterator<boost::python::tuple>();
+        ++iterator)
+    {
+        const boost::python::tuple tag = *iterator;
+        const std::string key = boost::python::extract<std::string>(tag[0]);
+        const std::string type = boost::python::extract<std::string>(tag[1]);
+        const std::string raw = boost::python::extract<std::string>(tag[2]);
+        const bool binary = boost::python::extract<bool>(tag[3]);
+        // Build the value the way a standalone tag would (see
+        // ExifTag::setRawValue() and ExifTag::setRawBytes()).
+        Exiv2::Value::AutoPtr value;
+        if (binary)
+        {
+            value = Exiv2::Value::create(Exiv2::undefined);
+            value->read(reinterpret_cast<const Exiv2::byte*>(raw.data()),
+                        raw.size(), Exiv2::invalidByteOrder);
+        }
+        else
+        {
+            value = Exiv2::Value::create(Exiv2::TypeInfo::typeId(type));
+            if (value->read(raw) != 0)
+            {
+                throw Exiv2::Error(INVALID_VALUE);
+            }
+        }
+        exifData.push_back(Exiv2::Exifdatum(Exiv2::ExifKey(key), value.get()));
+    }
+
+    std::vector<std::pair<std::string, IptcValues> > iptcData;
+    for(boost::python::stl_input_iterator<boost::python::tuple>
+            iterator(iptcTags);
+        iterator != boost::python::stl_input_iterator<boost::python::tuple>();
+        ++iterator)
+    {
+        const boost::python::tuple tag = *iterator;
+        const std::string key = boost::python::extract<std::string>(tag[0]);
+        const boost::python::list values =
+            boost::python::extract<boost::python::list>(tag[1]);
+        const Exiv2::IptcKey iptcKey(key);
+        iptcData.push_back(std::make_pair(iptcKey.key(),
+            readIptcRawValues(iptcKey, iptcTagInfo(key)->repeatable, values)));
+    }
+
+    std::vector<Exiv2::Xmpdatum> xmpData;
+    for(boost::python::stl_input_iterator<boost::python::tuple>
+            iterator(xmpTags);
+        iterator != boost::python::stl_input_iterator<boost::python::tuple>();
+        ++iterator)
+    {
+        const boost::python::tuple tag = *iterator;
+        const std::string key = boost::python::extract<std::string>(tag[0]);
+        // A new datum, so that the value is created with the type of the
+        // property, as for a standalone tag.
+        Exiv2::Xmpdatum datum((Exiv2::XmpKey(key)));
+        boost::python::extract<boost::python::dict> langAlt(tag[1]);
+        boost::python::extract<boost::python::list> array(tag[1]);
+        if (langAlt.check())
+        {
+            setXmpLangAltValue(datum, langAlt());
+        }
+        else if (array.check())
+        {
+            setXmpArrayValue(datum, array());
+        }
+        else
+        {
+            datum.setValue(boost::python::extract<std::string>(tag[1])());
+        }
+        xmpData.push_back(datum);
+    }
+
+    for (std::vector<Exiv2::Exifdatum>::const_iterator i = exifData.begin();
+         i != exifData.end(); ++i)
+    {
+        exifDatum(i->key()).setValue(&i->value());
+    }
+    for (std::vector<std::pair<std::string, IptcValues> >::const_iterator i =
+            iptcData.begin();
+         i != iptcData.end(); ++i)
+    {
+        setIptcValues(_iptcIndex, i->first, i->second);
+    }
+    for (std::vector<Exiv2::Xmpdatum>::const_iterator i = xmpData.begin();
+         i != xmpData.end(); ++i)
+    {
+        // The value may be empty (e.g. an empty array).
+        Exiv2::Value::AutoPtr value = i->getValue();
+        xmpDatum(i->key()).setValue(value.get());
+    }
 }
 
 void Image::deleteXmpTag(std::string key)
 {
     CHECK_METADATA_READ
 
-    Exiv2::XmpKey xmpKey = Exiv2::XmpKey(key);
-    Exiv2::XmpMetadata::iterator i = _xmpData->findKey(xmpKey);
+    Exiv2::XmpData::iterator i = _findXmpDatum(key);
     if(i != _xmpData->end())
     {
+        const long position = i - _xmpData->begin();
+        if (_xmpDuplicates)
+        {
+            // Another datum may have the same key, the index has to be
+            // rebuilt.
+            _xmpIndexed = false;
+        }
+        else
+        {
+            _xmpIndex.erase(i->key());
+            // Shift the positions of the data that followed the erased one.
+            for(XmpIndex::iterator entry = _xmpIndex.begin();
+                entry != _xmpIndex.end();
+                ++entry)
+            {
+                if (entry->second > position)
+                {
+                    --entry->second;
+                }
+            }
+        }
         _xmpData->erase(i);
     }
     else
         throw Exiv2::Error(KEY_NOT_FOUND, key);
 }
 
+void Image::_invalidateIndexes()
+{
+    _exifIndexed = false;
+    _xmpIndexed = false;
+    _iptcIndex.invalidate();
+}
+
+Exiv2::ExifData::iterator Image::_findExifDatum(const std::string& key)
+{
+    if (!_exifIndexed)
+    {
+        _exifIndex.clear();
+        _exifDuplicates = false;
+        for(Exiv2::ExifData::iterator i = _exifData->begin();
+            i != _exifData->end();
+            ++i)
+        {
+            if (!_exifIndex.insert(std::make_pair(i->key(), i)).second)
+            {
+                _exifDuplicates = true;
+            }
+        }
+        _exifIndexed = true;
+    }
+
+    // Look up the canonical form of the key.
+    ExifIndex::const_iterator i = _exifIndex.find(Exiv2::ExifKey(key).key());
+    if (i == _exifIndex.end())
+    {
+        return _exifData->end();
+    }
+    return i->second;
+}
+
+Exiv2::XmpData::iterator Image::_findXmpDatum(const std::string& key)
+{
+    if (!_xmpIndexed)
+    {
+        _xmpIndex.clear();
+        _xmpDuplicates = false;
+        long position = 0;
+        for(Exiv2::XmpData::iterator i = _xmpData->begin();
+            i != _xmpData->end();
+            ++i, ++position)
+        {
+            if (!_xmpIndex.insert(std::make_pair(i->key(), position)).second)
+            {
+                _xmpDuplicates = true;
+            }
+        }
+        _xmpIndexed = true;
+    }
+
+    // Look up the canonical form of the key.
+    XmpIndex::const_iterator i = _xmpIndex.find(Exiv2::XmpKey(key).key());
+    if (i == _xmpIndex.end())
+    {
+        return _xmpData->end();
+    }
+    return _xmpData->begin() + i->second;
+}
+
+Exiv2::Exifdatum& Image::exifDatum(const std::string& key)
+{
+    CHECK_METADATA_READ
+
+    Exiv2::ExifData::iterator datum = _findExifDatum(key);
+    if (datum == _exifData->end())
+    {
+        // The datum is appended to the data.
+        Exiv2::ExifKey exifKey(key);
+        _exifData->add(Exiv2::Exifdatum(exifKey));
+        datum = _exifData->end();
+        --datum;
+        _exifIndex.insert(std::make_pair(exifKey.key(), datum));
+    }
+    return *datum;
+}
+
+Exiv2::Xmpdatum& Image::xmpDatum(const std::string& key)
+{
+    CHECK_METADATA_READ
+
+    Exiv2::XmpData::iterator datum = _findXmpDatum(key);
+    if (datum == _xmpData->end())
+    {
+        // The datum is appended to the data.
+        Exiv2::XmpKey xmpKey(key);
+        _xmpData->add(Exiv2::Xmpdatum(xmpKey));
+        _xmpIndex.insert(std::make_pair(xmpKey.key(), _xmpData->count() - 1));
+        datum = _xmpData->end() - 1;
+    }
+    return *datum;
+}
+
 const std::string Image::getComment() const
 {
     CHECK_METADATA_READ
@@ -368,22 +1677,48 @@ void Image::clearComment()
     _image->clearComment();
 }
 
-
-boost::python::list Image::previews()
+
+boost::python::list Image::previews()
+{
+    CHECK_METADATA_READ
+
+    boost::python::list previews;
+    Exiv2::PreviewManager pm(*_image);
+    Exiv2::PreviewPropertiesList props = pm.getPreviewProperties();
+    for (Exiv2::PreviewPropertiesList::const_iterator i = props.begin();
+         i != props.end();
+         ++i)
+    {
+        previews.append(Preview(*i));
+    }
+
+    return previews;
+}
+
+boost::python::object Image::getPreviewData(const Preview& preview)
+{
+    CHECK_METADATA_READ
+
+    Exiv2::PreviewManager pm(*_image);
+    Exiv2::PreviewImage previewImage = pm.getPreviewImage(preview._properties);
+    // Copy the data buffer straight into a python string. Since the data
+    // buffer can contain null characters ('\x00'), its size has to be passed
+    // explicitly.
+    return boost::python::object(boost::python::handle<>(
+        PyString_FromStringAndSize((const char*) previewImage.pData(),
+                                   previewImage.size())));
+}
+
+void Image::writePreviewToFile(const Preview& preview, const std::string& path)
 {
     CHECK_METADATA_READ
 
-    boost::python::list previews;
     Exiv2::PreviewManager pm(*_image);
-    Exiv2::PreviewPropertiesList props = pm.getPreviewProperties();
-    for (Exiv2::PreviewPropertiesList::const_iterator i = props.begin();
-         i != props.end();
-         ++i)
-    {
-        previews.append(Preview(pm.getPreviewImage(*i)));
-    }
-
-    return previews;
+    Exiv2::PreviewImage previewImage = pm.getPreviewImage(preview._properties);
+    std::string filename = path + previewImage.extension();
+    std::ofstream fd(filename.c_str(), std::ios::out | std::ios::binary);
+    fd.write((const char*) previewImage.pData(), previewImage.size());
+    fd.close();
 }
 
 void Image::copyMetadata(Image& other, bool exif, bool iptc, bool xmp) const
@@ -397,18 +1732,27 @@ void Image::copyMetadata(Image& other, bool exif, bool iptc, bool xmp) const
         other._image->setIptcData(*_iptcData);
     if (xmp)
         other._image->setXmpData(*_xmpData);
+    other._invalidateIndexes();
 }
 
-std::string Image::getDataBuffer() const
+boost::python::object Image::getDataBuffer() const
 {
-    std::string buffer;
+    Exiv2::BasicIo& io = _image->io();
+    unsigned long size = io.size();
+    long read = 0;
+
+    // Allocate the resulting python string beforehand, so that the image data
+    // can be read straight into it, in one go. This avoids going through an
+    // intermediate std::string, which would be copied again when converted to
+    // a python object.
+    boost::python::object buffer(boost::python::handle<>(
+        PyString_FromStringAndSize(0, size)));
+    Exiv2::byte* data = (Exiv2::byte*) PyString_AS_STRING(buffer.ptr());
 
     // Release the GIL to allow other python threads to run
     // while reading the image data.
     Py_BEGIN_ALLOW_THREADS
 
-    Exiv2::BasicIo& io = _image->io();
-    unsigned long size = io.size();
     long pos = -1;
 
     if (io.isopen())
@@ -423,18 +1767,8 @@ std::string Image::getDataBuffer() const
         io.open();
     }
 
-    // Copy the data buffer in a string. Since the data buffer can contain null
-    // characters ('\x00'), the string cannot be simply constructed like that:
-    //     _data = std::string((char*) previewImage.pData());
-    // because it would be truncated after the first occurence of a null
-    // character. Therefore, it has to be copied character by character.
-    // First allocate the memory for the whole string...
-    buffer.resize(size, ' ');
-    // ... then fill it with the raw data.
-    for (unsigned long i = 0; i < size; ++i)
-    {
-        io.read((Exiv2::byte*) &buffer[i], 1);
-    }
+    // Bulk read of the whole data buffer.
+    read = io.read(data, size);
 
     if (pos == -1)
     {
@@ -450,6 +1784,14 @@ std::string Image::getDataBuffer() const
     // Re-acquire the GIL
     Py_END_ALLOW_THREADS
 
+    _ioError.raise();
+
+    if (read != (long) size)
+    {
+        // Failed to read image data
+        throw Exiv2::Error(14);
+    }
+
     return buffer;
 }
 
@@ -505,17 +1847,20 @@ const std::string Image::getExifThumbnailData()
 void Image::eraseExifThumbnail()
 {
     _getExifThumbnail()->erase();
+    _exifIndexed = false;
 }
 
 void Image::setExifThumbnailFromFile(const std::string& path)
 {
     _getExifThumbnail()->setJpegThumbnail(path);
+    _exifIndexed = false;
 }
 
 void Image::setExifThumbnailFromData(const std::string& data)
 {
     const Exiv2::byte* buffer = (const Exiv2::byte*) data.c_str();
     _getExifThumbnail()->setJpegThumbnail(buffer, data.size());
+    _exifIndexed = false;
 }
 
 const std::string Image::getIptcCharset() const
@@ -549,34 +1894,8 @@ ExifTag::ExifTag(const std::string& key,
         _data = 0;
     }
 
-// Conditional code, exiv2 0.21 changed APIs we need
-// (see https://bugs.launchpad.net/pyexiv2/+bug/684177).
-#if EXIV2_TEST_VERSION(0,21,0)
-    Exiv2::ExifKey exifKey(key);
-    _type = Exiv2::TypeInfo::typeName(exifKey.defaultTypeId());
-    // Where available, extract the type from the metadata, it is more reliable
-    // than static type information. The exception is for user comments, for
-    // which we’d rather keep the 'Comment' type instead of 'Undefined'.
-    if ((_data != 0) && (_type != "Comment"))
-    {
-        const char* typeName = _datum->typeName();
-        if (typeName != 0)
-        {
-            _type = typeName;
-        }
-    }
-    _name = exifKey.tagName();
-    _label = exifKey.tagLabel();
-    _description = exifKey.tagDesc();
-    _sectionName = Exiv2::ExifTags::sectionName(exifKey);
-    // The section description is not exposed in the API any longer
-    // (see http://dev.exiv2.org/issues/744). For want of anything better,
-    // fall back on the section’s name.
-    _sectionDescription = _sectionName;
-#else
-    const uint16_t tag = _datum->tag();
-    const Exiv2::IfdId ifd = _datum->ifdId();
-    _type = Exiv2::TypeInfo::typeName(Exiv2::ExifTags::tagType(tag, ifd));
+    _info = exifTagInfo(*_datum);
+    _type = _info->type;
     // Where available, extract the type from the metadata, it is more reliable
     // than static type information. The exception is for user comments, for
     // which we’d rather keep the 'Comment' type instead of 'Undefined'.
@@ -588,12 +1907,6 @@ ExifTag::ExifTag(const std::string& key,
             _type = typeName;
         }
     }
-    _name = Exiv2::ExifTags::tagName(tag, ifd);
-    _label = Exiv2::ExifTags::tagLabel(tag, ifd);
-    _description = Exiv2::ExifTags::tagDesc(tag, ifd);
-    _sectionName = Exiv2::ExifTags::sectionName(tag, ifd);
-    _sectionDescription = Exiv2::ExifTags::sectionDesc(tag, ifd);
-#endif
 }
 
 ExifTag::~ExifTag()
@@ -626,7 +1939,7 @@ void ExifTag::setParentImage(Image& image)
     _data = data;
     Exiv2::Value::AutoPtr value = _datum->getValue();
     delete _datum;
-    _datum = &(*_data)[_key.key()];
+    _datum = &image.exifDatum(_key.key());
     _datum->setValue(value.get());
 
     _byteOrder = image.getByteOrder();
@@ -644,27 +1957,27 @@ const std::string ExifTag::getType()
 
 const std::string ExifTag::getName()
 {
-    return _name;
+    return _info->name;
 }
 
 const std::string ExifTag::getLabel()
 {
-    return _label;
+    return _info->label;
 }
 
 const std::string ExifTag::getDescription()
 {
-    return _description;
+    return _info->description;
 }
 
 const std::string ExifTag::getSectionName()
 {
-    return _sectionName;
+    return _info->sectionName;
 }
 
 const std::string ExifTag::getSectionDescription()
 {
-    return _sectionDescription;
+    return _info->sectionDescription;
 }
 
 const std::string ExifTag::getRawValue()
@@ -682,128 +1995,227 @@ int ExifTag::getByteOrder()
     return _byteOrder;
 }
 
+const boost::python::object ExifTag::getRawBytes()
+{
+    if (_datum->count() == 0)
+    {
+        return boost::python::object();
+    }
+    switch (_datum->typeId())
+    {
+        case Exiv2::undefined:
+        case Exiv2::unsignedByte:
+        case Exiv2::signedByte:
+            break;
+        default:
+            return boost::python::object();
+    }
+
+    const long size = _datum->size();
+    boost::python::object bytes(boost::python::handle<>(
+        PyString_FromStringAndSize(0, size)));
+    if (size > 0)
+    {
+        _datum->copy(reinterpret_cast<Exiv2::byte*>(
+                         PyString_AS_STRING(bytes.ptr())),
+                     Exiv2::ByteOrder(_byteOrder));
+    }
+    return bytes;
+}
 
-IptcTag::IptcTag(const std::string& key, Exiv2::IptcData* data): _key(key)
+void ExifTag::setRawBytes(const std::string& bytes)
 {
-    _from_data = (data != 0);
+    Exiv2::Value::AutoPtr value = Exiv2::Value::create(Exiv2::undefined);
+    value->read(reinterpret_cast<const Exiv2::byte*>(bytes.data()),
+                bytes.size(), Exiv2::invalidByteOrder);
+    _datum->setValue(value.get());
+}
 
-    if (_from_data)
+const boost::python::object ExifTag::getNumericValues()
+{
+    if (_datum->count() == 0)
     {
-        _data = data;
+        return boost::python::object();
     }
-    else
+
+    const Exiv2::Value& value = _datum->value();
+    boost::python::list components;
+    bool decoded = false;
+    switch (value.typeId())
     {
-        _data = new Exiv2::IptcData();
-        _data->add(Exiv2::Iptcdatum(_key));
+        case Exiv2::unsignedShort:
+            decoded = appendIntegers<uint16_t>(value, components);
+            break;
+        case Exiv2::signedShort:
+            decoded = appendIntegers<int16_t>(value, components);
+            break;
+        case Exiv2::unsignedLong:
+            decoded = appendIntegers<uint32_t>(value, components);
+            break;
+        case Exiv2::signedLong:
+            decoded = appendIntegers<int32_t>(value, components);
+            break;
+        case Exiv2::unsignedRational:
+            decoded = appendRationals<Exiv2::URational>(value, components);
+            break;
+        case Exiv2::signedRational:
+            decoded = appendRationals<Exiv2::Rational>(value, components);
+            break;
+        default:
+            break;
+    }
+    if (!decoded)
+    {
+        return boost::python::object();
     }
+    return components;
+}
 
-    Exiv2::IptcMetadata::iterator iterator = _data->findKey(_key);
-    const uint16_t tag = iterator->tag();
-    const uint16_t record = iterator->record();
-    _type = Exiv2::TypeInfo::typeName(Exiv2::IptcDataSets::dataSetType(tag, record));
-    _name = Exiv2::IptcDataSets::dataSetName(tag, record);
-    _title = Exiv2::IptcDataSets::dataSetTitle(tag, record);
-    _description = Exiv2::IptcDataSets::dataSetDesc(tag, record);
-    // What is the photoshop name anyway? Where is it used?
-    _photoshopName = Exiv2::IptcDataSets::dataSetPsName(tag, record);
-    _repeatable = Exiv2::IptcDataSets::dataSetRepeatable(tag, record);
-    _recordName = Exiv2::IptcDataSets::recordName(record);
-    _recordDescription = Exiv2::IptcDataSets::recordDesc(record);
 
-    if (_from_data)
+IptcIndex::IptcIndex(Exiv2::IptcData* data): _data(data), _built(false)
+{
+}
+
+void IptcIndex::reset(Exiv2::IptcData* data)
+{
+    _data = data;
+    invalidate();
+}
+
+void IptcIndex::invalidate()
+{
+    _built = false;
+    _positions.clear();
+}
+
+void IptcIndex::_build()
+{
+    if (_built)
     {
-        // Check that we are not trying to assign multiple values to a tag that
-        // is not repeatable.
-        unsigned int nb_values = 0;
-        for(Exiv2::IptcMetadata::iterator iterator = _data->begin();
-            iterator != _data->end(); ++iterator)
-        {
-            if (iterator->key() == key)
-            {
-                ++nb_values;
-                if (!_repeatable && (nb_values > 1))
-                {
-                    throw Exiv2::Error(NON_REPEATABLE);
-                }
-            }
-        }
+        return;
+    }
+    long position = 0;
+    for(Exiv2::IptcMetadata::iterator i = _data->begin();
+        i != _data->end();
+        ++i, ++position)
+    {
+        _positions[i->key()].push_back(position);
     }
+    _built = true;
 }
 
-IptcTag::~IptcTag()
+const IptcIndex::Positions& IptcIndex::find(const std::string& key)
 {
-    if (!_from_data)
+    static const Positions none;
+    _build();
+    PositionMap::const_iterator i = _positions.find(key);
+    if (i == _positions.end())
     {
-        delete _data;
+        return none;
     }
+    return i->second;
 }
 
-void IptcTag::setRawValues(const boost::python::list& values)
+int IptcIndex::add(const Exiv2::Iptcdatum& datum)
 {
-    if (!_repeatable && (boost::python::len(values) > 1))
+    _build();
+    int state = _data->add(datum);
+    if (state == 0)
     {
-        // The tag is not repeatable but we are trying to assign it more than
-        // one value.
-        throw Exiv2::Error(NON_REPEATABLE);
+        // The datum is appended to the data.
+        _positions[datum.key()].push_back(_data->count() - 1);
     }
+    return state;
+}
 
-    unsigned int index = 0;
-    unsigned int max = boost::python::len(values);
-    Exiv2::IptcMetadata::iterator iterator = _data->findKey(_key);
-    while (index < max)
+void IptcIndex::erase(const std::string& key, unsigned int from)
+{
+    _build();
+    PositionMap::iterator entry = _positions.find(key);
+    if ((entry == _positions.end()) || (entry->second.size() <= from))
     {
-        std::string value = boost::python::extract<std::string>(values[index++]);
-        if (iterator != _data->end())
-        {
-            // Override an existing value
-            int result = iterator->setValue(value);
-            if (result != 0)
-            {
-                throw Exiv2::Error(INVALID_VALUE);
-            }
-            // Jump to the next datum matching the key
-            ++iterator;
-            while ((iterator != _data->end()) && (iterator->key() != _key.key()))
-            {
-                ++iterator;
-            }
-        }
-        else
-        {
-            // Append a new value
-            Exiv2::Iptcdatum datum(_key);
-            int result = datum.setValue(value);
-            if (result != 0)
-            {
-                throw Exiv2::Error(INVALID_VALUE);
-            }
-            int state = _data->add(datum);
-            if (state == 6)
-            {
-                throw Exiv2::Error(NON_REPEATABLE);
-            }
-            // Reset iterator that has been invalidated by appending a datum
-            iterator = _data->end();
-        }
+        return;
     }
-    // Erase the remaining values if any
-    while (iterator != _data->end())
+
+    const Positions erased(entry->second.begin() + from, entry->second.end());
+    if (from == 0)
     {
-        if (iterator->key() == _key.key())
-        {
-            iterator = _data->erase(iterator);
-        }
-        else
+        _positions.erase(entry);
+    }
+    else
+    {
+        entry->second.resize(from);
+    }
+
+    // Erase the last data first, the positions of the others stay valid.
+    for(Positions::const_reverse_iterator i = erased.rbegin();
+        i != erased.rend();
+        ++i)
+    {
+        _data->erase(_data->begin() + *i);
+    }
+
+    // Shift the positions of the data that followed the erased ones.
+    for(PositionMap::iterator i = _positions.begin();
+        i != _positions.end();
+        ++i)
+    {
+        for(Positions::iterator position = i->second.begin();
+            position != i->second.end();
+            ++position)
         {
-            ++iterator;
+            *position -= std::lower_bound(erased.begin(), erased.end(),
+                                          *position) - erased.begin();
         }
     }
 }
 
+
+IptcTag::IptcTag(const std::string& key, IptcIndex* index): _key(key)
+{
+    _from_data = (index != 0);
+
+    if (_from_data)
+    {
+        _index = index;
+        _data = &index->data();
+    }
+    else
+    {
+        _data = new Exiv2::IptcData();
+        _data->add(Exiv2::Iptcdatum(_key));
+        _index = new IptcIndex(_data);
+    }
+
+    const IptcIndex::Positions& positions = _index->find(_key.key());
+    _info = iptcTagInfo(_index->datum(positions.front()));
+
+    // Check that we are not trying to assign multiple values to a tag that
+    // is not repeatable.
+    if (!_info->repeatable && (positions.size() > 1))
+    {
+        throw Exiv2::Error(NON_REPEATABLE);
+    }
+}
+
+IptcTag::~IptcTag()
+{
+    if (!_from_data)
+    {
+        delete _index;
+        delete _data;
+    }
+}
+
+void IptcTag::setRawValues(const boost::python::list& values)
+{
+    setIptcRawValues(*_index, _key, _info->repeatable, values);
+}
+
 void IptcTag::setParentImage(Image& image)
 {
-    Exiv2::IptcData* data = image.getIptcData();
-    if (data == _data)
+    IptcIndex* index = image.getIptcIndex();
+    if (index == _index)
     {
         // The parent image is already the one passed as a parameter.
         // This happens when replacing a tag by itself. In this case, don’t do
@@ -811,9 +2223,14 @@ void IptcTag::setParentImage(Image& image)
         return;
     }
     const boost::python::list values = getRawValues();
-    delete _data;
+    if (!_from_data)
+    {
+        delete _index;
+        delete _data;
+    }
     _from_data = true;
-    _data = data;
+    _index = index;
+    _data = &index->data();
     setRawValues(values);
 }
 
@@ -824,54 +2241,52 @@ const std::string IptcTag::getKey()
 
 const std::string IptcTag::getType()
 {
-    return _type;
+    return _info->type;
 }
 
 const std::string IptcTag::getName()
 {
-    return _name;
+    return _info->name;
 }
 
 const std::string IptcTag::getTitle()
 {
-    return _title;
+    return _info->title;
 }
 
 const std::string IptcTag::getDescription()
 {
-    return _description;
+    return _info->description;
 }
 
 const std::string IptcTag::getPhotoshopName()
 {
-    return _photoshopName;
+    return _info->photoshopName;
 }
 
 const bool IptcTag::isRepeatable()
 {
-    return _repeatable;
+    return _info->repeatable;
 }
 
 const std::string IptcTag::getRecordName()
 {
-    return _recordName;
+    return _info->recordName;
 }
 
 const std::string IptcTag::getRecordDescription()
 {
-    return _recordDescription;
+    return _info->recordDescription;
 }
 
 const boost::python::list IptcTag::getRawValues()
 {
     boost::python::list values;
-    for(Exiv2::IptcMetadata::iterator iterator = _data->begin();
-        iterator != _data->end(); ++iterator)
+    const IptcIndex::Positions& positions = _index->find(_key.key());
+    for(IptcIndex::Positions::const_iterator i = positions.begin();
+        i != positions.end(); ++i)
     {
-        if (iterator->key() == _key.key())
-        {
-            values.append(iterator->toString());
-        }
+        values.append(_index->datum(*i).toString());
     }
     return values;
 }
@@ -880,6 +2295,7 @@ const boost::python::list IptcTag::getRawValues()
 XmpTag::XmpTag(const std::string& key, Exiv2::Xmpdatum* datum): _key(key)
 {
     _from_datum = (datum != 0);
+    _info = xmpTagInfo(_key);
 
     if (_from_datum)
     {
@@ -889,26 +2305,7 @@ XmpTag::XmpTag(const std::string& key, Exiv2::Xmpdatum* datum): _key(key)
     else
     {
         _datum = new Exiv2::Xmpdatum(_key);
-        _exiv2_type = Exiv2::TypeInfo::typeName(Exiv2::XmpProperties::propertyType(_key));
-    }
-
-    const char* title = Exiv2::XmpProperties::propertyTitle(_key);
-    if (title != 0)
-    {
-        _title = title;
-    }
-
-    const char* description = Exiv2::XmpProperties::propertyDesc(_key);
-    if (description != 0)
-    {
-        _description = description;
-    }
-
-    const Exiv2::XmpPropertyInfo* info = Exiv2::XmpProperties::propertyInfo(_key);
-    if (info != 0)
-    {
-        _name = info->name_;
-        _type = info->xmpValueType_;
+        _exiv2_type = _info->exiv2Type;
     }
 }
 
@@ -927,35 +2324,17 @@ void XmpTag::setTextValue(const std::string& value)
 
 void XmpTag::setArrayValue(const boost::python::list& values)
 {
-    // Reset the value
-    _datum->setValue(0);
-
-    for(boost::python::stl_input_iterator<std::string> iterator(values);
-        iterator != boost::python::stl_input_iterator<std::string>();
-        ++iterator)
-    {
-        _datum->setValue(*iterator);
-    }
+    setXmpArrayValue(*_datum, values);
 }
 
 void XmpTag::setLangAltValue(const boost::python::dict& values)
 {
-    // Reset the value
-    _datum->setValue(0);
-
-    for(boost::python::stl_input_iterator<std::string> iterator(values);
-        iterator != boost::python::stl_input_iterator<std::string>();
-        ++iterator)
-    {
-        std::string key = *iterator;
-        std::string value = boost::python::extract<std::string>(values.get(key));
-        _datum->setValue("lang=\"" + key + "\" " + value);
-    }
+    setXmpLangAltValue(*_datum, values);
 }
 
 void XmpTag::setParentImage(Image& image)
 {
-    Exiv2::Xmpdatum* datum = &(*image.getXmpData())[_key.key()];
+    Exiv2::Xmpdatum* datum = &image.xmpDatum(_key.key());
     if (datum == _datum)
     {
         // The parent image is already the one passed as a parameter.
@@ -966,7 +2345,7 @@ void XmpTag::setParentImage(Image& image)
     Exiv2::Value::AutoPtr value = _datum->getValue();
     delete _datum;
     _from_datum = true;
-    _datum = &(*image.getXmpData())[_key.key()];
+    _datum = datum;
     _datum->setValue(value.get());
 }
 
@@ -982,84 +2361,82 @@ const std::string XmpTag::getExiv2Type()
 
 const std::string XmpTag::getType()
 {
-    return _type;
+    return _info->type;
 }
 
 const std::string XmpTag::getName()
 {
-    return _name;
+    return _info->name;
 }
 
 const std::string XmpTag::getTitle()
 {
-    return _title;
+    return _info->title;
 }
 
 const std::string XmpTag::getDescription()
 {
-    return _description;
+    return _info->description;
 }
 
 const std::string XmpTag::getTextValue()
 {
-    return dynamic_cast<const Exiv2::XmpTextValue*>(&_datum->value())->value_;
+    return xmpTextValue(*_datum);
 }
 
 const boost::python::list XmpTag::getArrayValue()
 {
-    std::vector<std::string> value =
-        dynamic_cast<const Exiv2::XmpArrayValue*>(&_datum->value())->value_;
-    boost::python::list rvalue;
-    for(std::vector<std::string>::const_iterator i = value.begin();
-        i != value.end(); ++i)
-    {
-        rvalue.append(*i);
-    }
-    return rvalue;
+    return xmpArrayValue(*_datum);
 }
 
 const boost::python::dict XmpTag::getLangAltValue()
 {
-    Exiv2::LangAltValue::ValueType value =
-        dynamic_cast<const Exiv2::LangAltValue*>(&_datum->value())->value_;
-    boost::python::dict rvalue;
-    for (Exiv2::LangAltValue::ValueType::const_iterator i = value.begin();
-         i != value.end(); ++i)
-    {
-        rvalue[i->first] = i->second;
-    }
-    return rvalue;
+    return xmpLangAltValue(*_datum);
 }
 
 
-Preview::Preview(const Exiv2::PreviewImage& previewImage)
+Preview::Preview(const Exiv2::PreviewProperties& properties):
+    _properties(properties)
 {
-    _mimeType = previewImage.mimeType();
-    _extension = previewImage.extension();
-    _size = previewImage.size();
-    _dimensions = boost::python::make_tuple(previewImage.width(),
-                                            previewImage.height());
-    // Copy the data buffer in a string. Since the data buffer can contain null
-    // characters ('\x00'), the string cannot be simply constructed like that:
-    //     _data = std::string((char*) previewImage.pData());
-    // because it would be truncated after the first occurence of a null
-    // character. Therefore, it has to be copied character by character.
-    const Exiv2::byte* pData = previewImage.pData();
-    // First allocate the memory for the whole string...
-    _data = std::string(_size, ' ');
-    // ... then fill it with the raw data.
-    for(unsigned int i = 0; i < _size; ++i)
-    {
-        _data[i] = pData[i];
-    }
+    _mimeType = properties.mimeType_;
+    _extension = properties.extension_;
+    _size = properties.size_;
+    _dimensions = boost::python::make_tuple(properties.width_,
+                                            properties.height_);
 }
 
-void Preview::writeToFile(const std::string& path) const
+
+boost::python::list tagTypes(const boost::python::list& keys)
 {
-    std::string filename = path + _extension;
-    std::ofstream fd(filename.c_str(), std::ios::out | std::ios::binary);
-    fd << _data;
-    fd.close();
+    boost::python::list types;
+    for(boost::python::stl_input_iterator<std::string> iterator(keys);
+        iterator != boost::python::stl_input_iterator<std::string>();
+        ++iterator)
+    {
+        const std::string key = *iterator;
+        const std::string family = key.substr(0, key.find('.'));
+        if (family == "Exif")
+        {
+            const std::string type = exifTagInfo(key)->type;
+            types.append(boost::python::make_tuple(type, type));
+        }
+        else if (family == "Iptc")
+        {
+            const std::string type = iptcTagInfo(key)->type;
+            types.append(boost::python::make_tuple(type, type));
+        }
+        else if (family == "Xmp")
+        {
+            XmpTagInfoPointer info = xmpTagInfo(Exiv2::XmpKey(key));
+            types.append(boost::python::make_tuple(info->type,
+                                                   info->exiv2Type));
+        }
+        else
+        {
+            throw Exiv2::Error(KEY_NOT_FOUND, key);
+        }
+    }
+    return types;
 }
 
 
@@ -1346,6 +2723,7 @@ void registerXmpNs(const std::string& name, const std::string& prefix)
         // No namespace exists with the requested prefix, it is safe to
         // register a new one.
         Exiv2::XmpProperties::registerNs(name, prefix);
+        xmpTagInfos().clear();
         return;
     }
     throw Exiv2::Error(EXISTING_PREFIX, prefix);
@@ -1357,6 +2735,7 @@ void unregisterXmpNs(const std::string& name)
     if (prefix != "")
     {
         Exiv2::XmpProperties::unregisterNs(name);
+        xmpTagInfos().clear();
         try
         {
             const Exiv2::XmpNsInfo* info = Exiv2::XmpProperties::nsInfo(prefix);
@@ -1379,6 +2758,7 @@ void unregisterAllXmpNs()
 {
     // Unregister all custom namespaces.
     Exiv2::XmpProperties::unregisterNs();
+    xmpTagInfos().clear();
 }
 
 } // End of namespace exiv2wrapper
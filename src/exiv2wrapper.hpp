@@ -26,18 +26,64 @@
 #ifndef __exiv2wrapper__
 #define __exiv2wrapper__
 
+#include <map>
+#include <set>
 #include <string>
+#include <vector>
 
 #include "exiv2/image.hpp"
 #include "exiv2/preview.hpp"
 
 #include "boost/python.hpp"
+#include "boost/shared_ptr.hpp"
+#include "boost/unordered_map.hpp"
 
 namespace exiv2wrapper
 {
 
 class Image;
 
+// The static description of a tag, as found in libexiv2's tables. It is the
+// same for all the images, so it is computed only once for a given key and
+// shared by all the tags with this key (see exiv2wrapper.cpp).
+struct ExifTagInfo
+{
+    std::string type;
+    std::string name;
+    std::string label;
+    std::string description;
+    std::string sectionName;
+    std::string sectionDescription;
+};
+
+struct IptcTagInfo
+{
+    std::string type;
+    std::string name;
+    std::string title;
+    std::string description;
+    std::string photoshopName;
+    bool repeatable;
+    std::string recordName;
+    std::string recordDescription;
+};
+
+struct XmpTagInfo
+{
+    std::string exiv2Type;
+    std::string type;
+    std::string name;
+    std::string title;
+    std::string description;
+};
+
+// The descriptions are shared: a tag keeps its description alive even if it
+// is dropped from the cache (see xmpTagInfos()).
+typedef boost::shared_ptr<const ExifTagInfo> ExifTagInfoPointer;
+typedef boost::shared_ptr<const IptcTagInfo> IptcTagInfoPointer;
+typedef boost::shared_ptr<const XmpTagInfo> XmpTagInfoPointer;
+
+
 class ExifTag
 {
 public:
@@ -61,26 +107,71 @@ public:
     const std::string getRawValue();
     const std::string getHumanValue();
     int getByteOrder();
+    // Return the components of a Short, SShort, Long, SLong, Rational or
+    // SRational value as a list of integers (or of (numerator, denominator)
+    // tuples for rationals), without formatting them to a string.
+    // Return None for other types or if the tag has no value.
+    const boost::python::object getNumericValues();
+    // Return the bytes of an Undefined, Byte or SByte value as a string,
+    // without formatting them to their decimal representation.
+    // Return None for other types or if the tag has no value.
+    const boost::python::object getRawBytes();
+    // Set an Undefined value from its bytes.
+    void setRawBytes(const std::string& bytes);
 
 private:
     Exiv2::ExifKey _key;
     Exiv2::Exifdatum* _datum;
     Exiv2::ExifData* _data;
+    ExifTagInfoPointer _info;
     std::string _type;
-    std::string _name;
-    std::string _label;
-    std::string _description;
-    std::string _sectionName;
-    std::string _sectionDescription;
     int _byteOrder;
 };
 
 
+// A grouped view of IPTC data: the positions in the data of the repetitions
+// of each tag, in order. It is built in one pass on first use, and kept up to
+// date by the modifications made through it.
+class IptcIndex
+{
+public:
+    typedef std::vector<long> Positions;
+
+    IptcIndex(Exiv2::IptcData* data=0);
+
+    // Use other data, the view will be rebuilt on next use.
+    void reset(Exiv2::IptcData* data);
+    // Drop the view, to be rebuilt on next use (when the data have been
+    // modified behind its back).
+    void invalidate();
+
+    Exiv2::IptcData& data() { return *_data; };
+    Exiv2::Iptcdatum& datum(long position) { return *(_data->begin() + position); };
+
+    // Return the positions of the data of the tag with the given (canonical)
+    // key, empty if the tag is not set.
+    const Positions& find(const std::string& key);
+    // Append a datum to the data, return the state returned by
+    // Exiv2::IptcData::add().
+    int add(const Exiv2::Iptcdatum& datum);
+    // Erase the repetitions of the tag with the given key, from the nth one.
+    void erase(const std::string& key, unsigned int from=0);
+
+private:
+    typedef boost::unordered_map<std::string, Positions> PositionMap;
+    Exiv2::IptcData* _data;
+    PositionMap _positions;
+    bool _built;
+
+    void _build();
+};
+
+
 class IptcTag
 {
 public:
     // Constructor
-    IptcTag(const std::string& key, Exiv2::IptcData* data=0);
+    IptcTag(const std::string& key, IptcIndex* index=0);
 
     ~IptcTag();
 
@@ -102,14 +193,8 @@ private:
     Exiv2::IptcKey _key;
     bool _from_data; // whether the tag is built from an existing IptcData
     Exiv2::IptcData* _data;
-    std::string _type;
-    std::string _name;
-    std::string _title;
-    std::string _description;
-    std::string _photoshopName;
-    bool _repeatable;
-    std::string _recordName;
-    std::string _recordDescription;
+    IptcIndex* _index;
+    IptcTagInfoPointer _info;
 };
 
 
@@ -140,26 +225,119 @@ private:
     Exiv2::XmpKey _key;
     bool _from_datum; // whether the tag is built from an existing Xmpdatum
     Exiv2::Xmpdatum* _datum;
+    XmpTagInfoPointer _info;
     std::string _exiv2_type;
-    std::string _type;
-    std::string _name;
-    std::string _title;
-    std::string _description;
 };
 
 
+// The properties of a preview image embedded in an image.
+// The data of the preview is not extracted until explicitly requested
+// through the parent image (see Image::getPreviewData()).
 class Preview
 {
 public:
-    Preview(const Exiv2::PreviewImage& previewImage);
-
-    void writeToFile(const std::string& path) const;
+    Preview(const Exiv2::PreviewProperties& properties);
 
     std::string _mimeType;
     std::string _extension;
     unsigned int _size;
     boost::python::tuple _dimensions;
-    std::string _data;
+    Exiv2::PreviewProperties _properties;
+};
+
+
+// A python exception raised while libexiv2 was calling back into python.
+// It cannot propagate through libexiv2, so it is kept until control returns
+// to the wrapper, which raises it again.
+class PendingError
+{
+public:
+    PendingError();
+    ~PendingError();
+
+    // Take over the current python exception, unless one is already pending
+    // (the first one is the most relevant). The GIL must be held.
+    void fetch();
+
+    // If an exception is pending, restore it as the current python exception
+    // and throw boost::python::error_already_set. The GIL must be held.
+    void raise();
+
+private:
+    PyObject* _type;
+    PyObject* _value;
+    PyObject* _traceback;
+
+    // Not copyable
+    PendingError(const PendingError&);
+    PendingError& operator=(const PendingError&);
+};
+
+
+// An implementation of libexiv2's BasicIo that reads the image data on demand
+// from a python file object (any object with read(), seek() and tell()
+// methods). Only the ranges accessed by libexiv2 are read, through a small
+// buffer so that reading one byte at a time does not call back into python
+// every time. The GIL is acquired for the duration of each callback only.
+// The file object is never written to: mapping the data in memory (which
+// libexiv2 does for TIFF-based formats) or writing to it loads the whole
+// image data in memory, where it is read from and written to from then on.
+class FileObjectIo : public Exiv2::BasicIo
+{
+public:
+    // The GIL must be held.
+    FileObjectIo(boost::python::object fileobj, PendingError& error);
+    ~FileObjectIo();
+
+    int open();
+    int close();
+    long write(const Exiv2::byte* data, long wcount);
+    long write(Exiv2::BasicIo& src);
+    int putb(Exiv2::byte data);
+    Exiv2::DataBuf read(long rcount);
+    long read(Exiv2::byte* buf, long rcount);
+    int getb();
+    void transfer(Exiv2::BasicIo& src);
+    int seek(long offset, Exiv2::BasicIo::Position pos);
+    Exiv2::byte* mmap(bool isWriteable=false);
+    int munmap();
+    long tell() const;
+    long size() const;
+    bool isopen() const;
+    int error() const;
+    bool eof() const;
+    std::string path() const;
+#ifdef EXV_UNICODE_PATH
+    std::wstring wpath() const;
+#endif
+    Exiv2::BasicIo::AutoPtr temporary() const;
+
+private:
+    PyObject* _fileobj;
+    PendingError& _pendingError;
+    std::string _path;
+    long _size;
+    long _position;
+    bool _open;
+    bool _eof;
+    int _error;
+    // The buffer of data read ahead, and its offset in the file.
+    std::vector<Exiv2::byte> _chunk;
+    long _chunkOffset;
+    long _chunkSize;
+    // The whole image data, once loaded in memory.
+    Exiv2::BasicIo::AutoPtr _memory;
+
+    // Read count bytes at offset from the file object into buf.
+    // Return the number of bytes read, or -1 if an exception was raised.
+    long _readAt(long offset, Exiv2::byte* buf, long count);
+    // Load the whole image data in memory, if not already done.
+    // Return false if it could not be read.
+    bool _load();
+
+    // Not copyable
+    FileObjectIo(const FileObjectIo&);
+    FileObjectIo& operator=(const FileObjectIo&);
 };
 
 
@@ -168,9 +346,25 @@ class Image
 public:
     // Constructors
     Image(const std::string& filename);
-    Image(const std::string& buffer, unsigned long size);
+    // Instantiate an image from any python object that exposes the buffer
+    // interface. If copy is false, the data is borrowed from the object
+    // (a reference to which is kept, along with a view on it) instead of
+    // being copied. Objects that only expose the old-style buffer interface
+    // are always copied, as no view can be held on them.
+    Image(boost::python::object buffer, bool copy=true);
     Image(const Image& image);
 
+    // Instantiate an image that reads its data on demand from a python file
+    // object (see FileObjectIo). The file object must stay open for as long
+    // as the image is alive.
+    static Image* fromFileObject(boost::python::object fileobj);
+
+    // Instantiate an image that borrows the data of a memory mapping, even
+    // through the old-style buffer interface. The mapping must not be closed
+    // for as long as the image refers to it (until the metadata is written
+    // back).
+    static Image* fromMapping(boost::python::object mapping);
+
     ~Image();
 
     void readMetadata();
@@ -195,6 +389,11 @@ public:
     // Throw an exception if the tag is not set.
     const ExifTag getExifTag(std::string key);
 
+    // Return a snapshot of all the EXIF tags set in the image, as a tuple
+    // (keys, types, raw values, byte order) where the first three items are
+    // tuples of the same length.
+    boost::python::tuple exifSnapshot();
+
     // Delete the required EXIF tag.
     // Throw an exception if the tag was not set.
     void deleteExifTag(std::string key);
@@ -208,10 +407,20 @@ public:
     // even if a tag is present more than once.
     boost::python::list iptcKeys();
 
+    // Returns a list of (key, count) tuples, one for each IPTC tag set in the
+    // image, in the same order as iptcKeys(). count is the number of
+    // repetitions of the tag.
+    boost::python::list iptcKeyCounts();
+
     // Return the required IPTC tag.
     // Throw an exception if the tag is not set.
     const IptcTag getIptcTag(std::string key);
 
+    // Return a snapshot of all the IPTC tags set in the image, as a tuple
+    // (keys, types, raw values) of tuples of the same length. The keys are
+    // unique, the raw values of a repeated tag are grouped in a list.
+    boost::python::tuple iptcSnapshot();
+
     // Delete (all the repetitions of) the required IPTC tag.
     // Throw an exception if the tag was not set.
     void deleteIptcTag(std::string key);
@@ -222,10 +431,34 @@ public:
     // Throw an exception if the tag is not set.
     const XmpTag getXmpTag(std::string key);
 
+    // Return a snapshot of all the XMP tags set in the image, as a tuple
+    // (keys, types, raw values) of tuples of the same length. A raw value is
+    // a string, a list of strings or a dictionary depending on the type of
+    // the XMP value.
+    boost::python::tuple xmpSnapshot();
+
+    // Return a snapshot of the tags with the given keys, in any family, as a
+    // tuple (keys, types, raw values, byte order) similar to the snapshots
+    // above. Keys of tags that are not set are ignored.
+    boost::python::tuple tagsSnapshot(const boost::python::list& keys);
+
     // Delete the required XMP tag.
     // Throw an exception if the tag was not set.
     void deleteXmpTag(std::string key);
 
+    // Set several tags at once, in the same way as standalone tags attached
+    // to the image would. The tags are given as lists of tuples:
+    // (key, type, raw value, binary) for EXIF tags, where binary tells
+    // whether the raw value holds the bytes of an Undefined value,
+    // (key, list of raw values) for IPTC tags, and (key, raw value) for XMP
+    // tags, where the raw value is a string, a list of strings or a
+    // dictionary depending on the type of the XMP value.
+    // All the values are converted before any tag is set: if one of them is
+    // invalid, an exception is thrown and the metadata is left untouched.
+    void setTags(const boost::python::list& exifTags,
+                 const boost::python::list& iptcTags,
+                 const boost::python::list& xmpTags);
+
     // Comment
     const std::string getComment() const;
     void setComment(const std::string& comment);
@@ -234,6 +467,10 @@ public:
     // Read access to the thumbnail embedded in the image.
     boost::python::list previews();
 
+    // Extract the data of a preview image.
+    boost::python::object getPreviewData(const Preview& preview);
+    void writePreviewToFile(const Preview& preview, const std::string& path);
+
     // Manipulate the JPEG/TIFF thumbnail embedded in the EXIF data.
     const std::string getExifThumbnailMimeType();
     const std::string getExifThumbnailExtension();
@@ -246,14 +483,21 @@ public:
     // Copy the metadata to another image.
     void copyMetadata(Image& other, bool exif=true, bool iptc=true, bool xmp=true) const;
 
-    // Return the image data buffer.
-    std::string getDataBuffer() const;
+    // Return the image data buffer, as a python string.
+    boost::python::object getDataBuffer() const;
 
     // Accessors
     Exiv2::ExifData* getExifData() { return _exifData; };
     Exiv2::IptcData* getIptcData() { return _iptcData; };
+    IptcIndex* getIptcIndex() { return &_iptcIndex; };
     Exiv2::XmpData* getXmpData() { return _xmpData; };
 
+    // Return the datum of the EXIF (XMP) tag with the given key, adding an
+    // empty one to the image if the tag is not set. Tags are looked up in the
+    // index of the image, which they have to be added through.
+    Exiv2::Exifdatum& exifDatum(const std::string& key);
+    Exiv2::Xmpdatum& xmpDatum(const std::string& key);
+
     Exiv2::ByteOrder getByteOrder() const;
 
     const std::string getIptcCharset() const;
@@ -262,6 +506,15 @@ private:
     std::string _filename;
     Exiv2::byte* _data;
     long _size;
+    // true if _data is a private copy that has to be freed,
+    // false if it is borrowed from _buffer
+    bool _ownData;
+    boost::python::object _buffer;
+    Py_buffer _view;
+    // The io reading from a python file object, owned by _image, or 0.
+    FileObjectIo* _fileIo;
+    // An exception raised by the file object while libexiv2 was reading it.
+    mutable PendingError _ioError;
     Exiv2::Image::AutoPtr _image;
     Exiv2::ExifData* _exifData;
     Exiv2::IptcData* _iptcData;
@@ -273,10 +526,69 @@ private:
     // false otherwise
     bool _dataRead;
 
+    // Hashed indexes of the EXIF and XMP data by key, built on first use,
+    // for constant time lookups instead of the linear findKey(). The index of
+    // the EXIF data (a list) holds iterators, which stay valid when other
+    // data are added or erased. The index of the XMP data (a vector) holds
+    // positions, which are shifted when a datum is erased. Like findKey(), the
+    // indexes refer to the first datum with a given key: when several data
+    // have the same key, erasing one of them drops the index. An index is also
+    // dropped whenever the data are modified behind its back (reading or
+    // writing the metadata, copying metadata to the image, modifying the EXIF
+    // thumbnail).
+    typedef boost::unordered_map<std::string, Exiv2::ExifData::iterator>
+        ExifIndex;
+    typedef boost::unordered_map<std::string, long> XmpIndex;
+    ExifIndex _exifIndex;
+    bool _exifIndexed;
+    // Whether several EXIF data have the same key
+    bool _exifDuplicates;
+    XmpIndex _xmpIndex;
+    bool _xmpIndexed;
+    // Whether several XMP data have the same key
+    bool _xmpDuplicates;
+    // The grouped view of the IPTC data
+    IptcIndex _iptcIndex;
+
+    void _invalidateIndexes();
+    // Return an iterator to the datum with the given key, or to the end of
+    // the data if the tag is not set.
+    Exiv2::ExifData::iterator _findExifDatum(const std::string& key);
+    Exiv2::XmpData::iterator _findXmpDatum(const std::string& key);
+
+    // Used by fromFileObject() and fromMapping()
+    Image();
+
+    // Set the data of the image from a python buffer (see the constructors).
+    void _initFromBuffer(boost::python::object buffer, bool copy,
+                         bool borrowOldStyle);
+
     void _instantiate_image();
+    void _releaseBuffer();
+
+    // Fill keys with the unique keys of the IPTC tags, in order, and counts
+    // with the number of repetitions of each tag, in one pass.
+    void _iptcKeyCounts(std::vector<std::string>& keys,
+                        std::map<std::string, long>& counts);
+
+    // Append the keys, types and raw values of the tags of a family to the
+    // given lists, optionally restricted to a set of keys.
+    typedef std::set<std::string> KeySet;
+    void _exifSnapshot(const KeySet* filter, boost::python::list& keys,
+                       boost::python::list& types, boost::python::list& values);
+    void _iptcSnapshot(const KeySet* filter, boost::python::list& keys,
+                       boost::python::list& types, boost::python::list& values);
+    void _xmpSnapshot(const KeySet* filter, boost::python::list& keys,
+                      boost::python::list& types, boost::python::list& values);
 };
 
 
+// Return the (type, libexiv2 type) tuples of the tags with the given keys, as
+// standalone tags would have them. The libexiv2 type differs from the type
+// only for XMP tags.
+boost::python::list tagTypes(const boost::python::list& keys);
+
+
 // Translate an Exiv2 generic exception into a Python exception
 void translateExiv2Error(Exiv2::Error const& error);
 
@@ -63,6 +63,9 @@ BOOST_PYTHON_MODULE(libexiv2python)
         .def("_getRawValue", &ExifTag::getRawValue)
         .def("_getHumanValue", &ExifTag::getHumanValue)
         .def("_getByteOrder", &ExifTag::getByteOrder)
+        .def("_getNumericValues", &ExifTag::getNumericValues)
+        .def("_getRawBytes", &ExifTag::getRawBytes)
+        .def("_setRawBytes", &ExifTag::setRawBytes)
     ;
 
     class_<IptcTag>("_IptcTag", init<std::string>())
@@ -100,19 +103,22 @@ BOOST_PYTHON_MODULE(libexiv2python)
         .def("_getLangAltValue", &XmpTag::getLangAltValue)
     ;
 
-    class_<Preview>("_Preview", init<Exiv2::PreviewImage>())
+    class_<Preview>("_Preview", no_init)
 
         .def_readonly("mime_type", &Preview::_mimeType)
         .def_readonly("extension", &Preview::_extension)
         .def_readonly("size", &Preview::_size)
         .def_readonly("dimensions", &Preview::_dimensions)
-        .def_readonly("data", &Preview::_data)
-
-        .def("write_to_file", &Preview::writeToFile)
     ;
 
     class_<Image>("_Image", init<std::string>())
-        .def(init<std::string, long>())
+        .def(init<object, bool>())
+        .def("_fromFileObject", &Image::fromFileObject,
+             return_value_policy<manage_new_object>())
+        .staticmethod("_fromFileObject")
+        .def("_fromMapping", &Image::fromMapping,
+             return_value_policy<manage_new_object>())
+        .staticmethod("_fromMapping")
 
         .def("_readMetadata", &Image::readMetadata)
         .def("_writeMetadata", &Image::writeMetadata)
@@ -124,21 +130,29 @@ BOOST_PYTHON_MODULE(libexiv2python)
 
         .def("_exifKeys", &Image::exifKeys)
         .def("_getExifTag", &Image::getExifTag)
+        .def("_exifSnapshot", &Image::exifSnapshot)
         .def("_deleteExifTag", &Image::deleteExifTag)
 
         .def("_iptcKeys", &Image::iptcKeys)
+        .def("_iptcKeyCounts", &Image::iptcKeyCounts)
         .def("_getIptcTag", &Image::getIptcTag)
+        .def("_iptcSnapshot", &Image::iptcSnapshot)
         .def("_deleteIptcTag", &Image::deleteIptcTag)
 
         .def("_xmpKeys", &Image::xmpKeys)
         .def("_getXmpTag", &Image::getXmpTag)
+        .def("_xmpSnapshot", &Image::xmpSnapshot)
+        .def("_tagsSnapshot", &Image::tagsSnapshot)
         .def("_deleteXmpTag", &Image::deleteXmpTag)
+        .def("_setTags", &Image::setTags)
 
         .def("_getComment", &Image::getComment)
         .def("_setComment", &Image::setComment)
         .def("_clearComment", &Image::clearComment)
 
         .def("_previews", &Image::previews)
+        .def("_getPreviewData", &Image::getPreviewData)
+        .def("_writePreviewToFile", &Image::writePreviewToFile)
 
         .def("_copyMetadata", &Image::copyMetadata)
 
@@ -155,6 +169,8 @@ BOOST_PYTHON_MODULE(libexiv2python)
         .def("_getIptcCharset", &Image::getIptcCharset)
     ;
 
+    def("_tagTypes", tagTypes, args("keys"));
+
     def("_registerXmpNs", registerXmpNs, args("name", "prefix"));
     def("_unregisterXmpNs", unregisterXmpNs, args("name"));
     def("_unregisterAllXmpNs", unregisterAllXmpNs);
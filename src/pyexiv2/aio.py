@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+
+# ******************************************************************************
+#
+# Copyright (C) 2012 Olivier Tilloy <olivier@tilloy.net>
+#
+# This file is part of the pyexiv2 distribution.
+#
+# pyexiv2 is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# pyexiv2 is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyexiv2; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, 5th Floor, Boston, MA 02110-1301 USA.
+#
+# Author: Olivier Tilloy <olivier@tilloy.net>
+#
+# ******************************************************************************
+
+"""
+Asynchronous reading and writing of metadata.
+
+The reads and writes run in a bounded pool of threads, which does not block
+the calling thread (e.g. the thread of an event loop): libexiv2python releases
+the GIL while it opens, reads and writes images. Each call returns a
+:class:`Future`, that can be polled, cancelled before it starts, or given a
+callback (e.g. to hand the result over to an event loop). Submitting a call
+never blocks either: when too many calls are waiting for a thread, it fails
+right away.
+"""
+
+import sys
+import threading
+import time
+import Queue
+
+from pyexiv2.metadata import ImageMetadata, FAMILIES
+
+
+# The states of a future
+_PENDING, _RUNNING, _CANCELLED, _FINISHED = range(4)
+
+# Sentinel stopping a worker
+_DONE = object()
+
+
+class CallCancelledError(Exception):
+
+    """
+    Exception raised when getting the result of a cancelled call.
+    """
+
+
+class Future(object):
+
+    """
+    The result of a call run by an :class:`Executor`, available once the call
+    has finished.
+
+    :attribute name: a description of the call
+    :type name: string
+    :attribute queue_time: the time the call waited for a thread, in seconds,
+                           or ``None`` if it has not started
+    :type queue_time: float
+    :attribute run_time: the time the call ran, in seconds, or ``None`` if it
+                         has not finished
+    :type run_time: float
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.queue_time = None
+        self.run_time = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._state = _PENDING
+        self._result = None
+        self._exc_info = None
+        self._callbacks = []
+        self._submitted = time.time()
+
+    def cancel(self):
+        """
+        Cancel the call, if it has not started yet.
+
+        :return: whether the call is cancelled
+        :rtype: boolean
+        """
+        if not self._set_state(_CANCELLED, (_PENDING, _CANCELLED)):
+            return False
+        self._complete()
+        return True
+
+    def cancelled(self):
+        """Whether the call was cancelled."""
+        return self._state == _CANCELLED
+
+    def done(self):
+        """Whether the call was cancelled or has finished."""
+        return self._done.isSet()
+
+    def result(self):
+        """
+        Wait for the call to finish and return its result.
+
+        :return: the value returned by the call
+
+        :raise CallCancelledError: if the call was cancelled
+        :raise Exception: the exception raised by the call, if any
+        """
+        if self.exception() is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+    def exception(self):
+        """
+        Wait for the call to finish and return the exception it raised.
+
+        :return: the exception raised by the call, or ``None``
+        :rtype: :class:`Exception`
+
+        :raise CallCancelledError: if the call was cancelled
+        """
+        self._done.wait()
+        if self._state == _CANCELLED:
+            raise CallCancelledError(self.name)
+        if self._exc_info is not None:
+            return self._exc_info[1]
+        return None
+
+    def add_done_callback(self, callback):
+        """
+        Call a function with the future as its only argument when the call
+        is cancelled or finishes, or right away if it is already done.
+
+        The callback runs in the thread that ran the call (or cancelled it):
+        to resume code running in an event loop, hand the future over to the
+        loop with its thread-safe scheduling function. Exceptions raised by
+        the callback are ignored.
+
+        :param callback: the function to call
+        :type callback: callable
+        """
+        self._lock.acquire()
+        try:
+            if not self.done():
+                self._callbacks.append(callback)
+                return
+        finally:
+            self._lock.release()
+        self._call(callback)
+
+    def _call(self, callback):
+        try:
+            callback(self)
+        except Exception:
+            # A failing callback must not prevent the others from running,
+            # nor stop the worker thread.
+            pass
+
+    def _set_state(self, state, expected):
+        # Change the state of the future if it is one of those expected.
+        self._lock.acquire()
+        try:
+            if self._state not in expected:
+                return False
+            self._state = state
+            return True
+        finally:
+            self._lock.release()
+
+    def _complete(self):
+        self._lock.acquire()
+        try:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        finally:
+            self._lock.release()
+        for callback in callbacks:
+            self._call(callback)
+
+    def _run(self, function, args, kwargs):
+        # Run the call, unless it was cancelled.
+        if not self._set_state(_RUNNING, (_PENDING,)):
+            return
+        start = time.time()
+        self.queue_time = start - self._submitted
+        try:
+            self._result = function(*args, **kwargs)
+        except Exception:
+            self._exc_info = sys.exc_info()
+        self.run_time = time.time() - start
+        self._state = _FINISHED
+        self._complete()
+
+
+class Executor(object):
+
+    """
+    A bounded pool of threads running calls.
+
+    Calls are queued until a thread is available. At most *max_pending* calls
+    wait in the queue: beyond that, submitting a call raises
+    :exc:`Queue.Full` instead of blocking, and it is up to the caller to shed
+    the load or to try again later.
+
+    :param workers: the number of threads
+    :type workers: int
+    :param max_pending: the maximum number of calls waiting for a thread
+                        (by default, four per thread)
+    :type max_pending: int
+    :param on_latency: a function called with the :class:`Future` of each call
+                       when it finishes, e.g. to report its
+                       :attr:`Future.queue_time` and :attr:`Future.run_time`
+    :type on_latency: callable
+
+    :raise ValueError: if the number of workers or the maximum number of
+                       pending calls is not strictly positive
+    """
+
+    def __init__(self, workers=4, max_pending=None, on_latency=None):
+        if workers < 1:
+            raise ValueError('Invalid number of workers: %d' % workers)
+        if max_pending is None:
+            max_pending = workers * 4
+        elif max_pending < 1:
+            raise ValueError('Invalid number of pending calls: %d' %
+                             max_pending)
+        self.max_pending = max_pending
+        self._calls = Queue.Queue()
+        self._on_latency = on_latency
+        self._lock = threading.Lock()
+        # The number of calls in the queue
+        self._pending = 0
+        self._shutdown = False
+        self._threads = [threading.Thread(target=self._work)
+                         for i in xrange(workers)]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def _work(self):
+        while True:
+            call = self._calls.get()
+            if call is _DONE:
+                break
+            self._lock.acquire()
+            self._pending -= 1
+            self._lock.release()
+            future, function, args, kwargs = call
+            future._run(function, args, kwargs)
+
+    def _submit(self, name, function, args, kwargs):
+        future = Future(name)
+        if self._on_latency is not None:
+            future.add_done_callback(self._report)
+        self._lock.acquire()
+        try:
+            if self._shutdown:
+                raise RuntimeError('Cannot submit calls after shutdown')
+            if self._pending >= self.max_pending:
+                raise Queue.Full('%d calls are waiting' % self._pending)
+            self._pending += 1
+            self._calls.put((future, function, args, kwargs))
+        finally:
+            self._lock.release()
+        return future
+
+    def _report(self, future):
+        if not future.cancelled():
+            self._on_latency(future)
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Run a function with the given arguments in one of the threads.
+
+        :param function: the function to run
+        :type function: callable
+
+        :return: the future result of the call
+        :rtype: :class:`Future`
+
+        :raise Queue.Full: if *max_pending* calls are already waiting
+        :raise RuntimeError: if the executor was shut down
+        """
+        return self._submit(getattr(function, '__name__', repr(function)),
+                            function, args, kwargs)
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        """
+        Stop the threads once they have run the calls already submitted.
+        No calls can be submitted afterwards.
+
+        :param wait: whether to wait for the threads to stop
+        :type wait: boolean
+        :param cancel_pending: whether to cancel the calls that have not
+                               started yet
+        :type cancel_pending: boolean
+        """
+        self._lock.acquire()
+        try:
+            if self._shutdown:
+                return
+            self._shutdown = True
+        finally:
+            self._lock.release()
+        if cancel_pending:
+            while True:
+                try:
+                    call = self._calls.get_nowait()
+                except Queue.Empty:
+                    break
+                call[0].cancel()
+        for thread in self._threads:
+            self._calls.put(_DONE)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+
+def default_executor():
+    """
+    The executor that runs the calls for which no executor is given, created
+    with the default parameters on first use.
+
+    :rtype: :class:`Executor`
+    """
+    global _default_executor
+    _default_executor_lock.acquire()
+    try:
+        if _default_executor is None:
+            _default_executor = Executor()
+        return _default_executor
+    finally:
+        _default_executor_lock.release()
+
+
+def read_async(path, families=FAMILIES, mmap=False, executor=None):
+    """
+    Read the metadata of an image in the background.
+
+    :param path: path to an image file
+    :type path: string
+    :param families: the families of metadata to make available (see
+                     :meth:`pyexiv2.metadata.ImageMetadata.read`)
+    :type families: tuple of strings
+    :param mmap: whether to map the file in memory (see
+                 :meth:`pyexiv2.metadata.ImageMetadata.read`)
+    :type mmap: boolean
+    :param executor: the executor that runs the read (by default, the one
+                     returned by :func:`default_executor`)
+    :type executor: :class:`Executor`
+
+    :return: the future metadata, read
+    :rtype: :class:`Future` of :class:`pyexiv2.metadata.ImageMetadata`
+
+    :raise Queue.Full: if too many calls are waiting for the executor
+    """
+    def read():
+        metadata = ImageMetadata(path)
+        metadata.read(families, mmap=mmap)
+        return metadata
+    if executor is None:
+        executor = default_executor()
+    return executor._submit('read %s' % path, read, (), {})
+
+
+def write_async(metadata, preserve_timestamps=False, executor=None):
+    """
+    Write the metadata of an image back to it in the background.
+
+    The metadata must not be modified until the write has finished.
+
+    :param metadata: the metadata to write
+    :type metadata: :class:`pyexiv2.metadata.ImageMetadata`
+    :param preserve_timestamps: whether to preserve the file's original
+                                timestamps (see
+                                :meth:`pyexiv2.metadata.ImageMetadata.write`)
+    :type preserve_timestamps: boolean
+    :param executor: the executor that runs the write (by default, the one
+                     returned by :func:`default_executor`)
+    :type executor: :class:`Executor`
+
+    :return: the future completion of the write, whose result is ``None``
+    :rtype: :class:`Future`
+
+    :raise Queue.Full: if too many calls are waiting for the executor
+    """
+    if executor is None:
+        executor = default_executor()
+    name = 'write %s' % (metadata.filename or '<buffer>')
+    return executor._submit(name, metadata.write, (preserve_timestamps,), {})
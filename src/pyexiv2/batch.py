@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+
+# ******************************************************************************
+#
+# Copyright (C) 2012 Olivier Tilloy <olivier@tilloy.net>
+#
+# This file is part of the pyexiv2 distribution.
+#
+# pyexiv2 is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# pyexiv2 is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyexiv2; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, 5th Floor, Boston, MA 02110-1301 USA.
+#
+# Author: Olivier Tilloy <olivier@tilloy.net>
+#
+# ******************************************************************************
+
+"""
+Batch reading of the metadata of many images.
+
+libexiv2python releases the GIL while opening images and parsing their
+metadata, so reading several images from different threads actually runs in
+parallel. The conversion of the values to python types still holds the GIL
+though, so images can also be read in a pool of processes.
+"""
+
+import threading
+import Queue
+import multiprocessing
+import pickle
+
+from pyexiv2.metadata import ImageMetadata, FAMILIES
+
+
+# Sentinel marking the end of the input (for the workers) and the end of the
+# output of a worker (for the consumer).
+_DONE = object()
+
+
+class ReadResult(object):
+
+    """
+    The result of reading the metadata of one image.
+
+    :attribute path: the path to the image
+    :type path: string
+    :attribute values: a dictionary mapping keys to values (see
+                       :meth:`pyexiv2.metadata.ImageMetadata.snapshot`), or
+                       ``None`` if reading failed
+    :type values: dict
+    :attribute error: the exception raised when reading failed, or ``None``
+    :type error: :class:`Exception`
+    """
+
+    def __init__(self, path, values=None, error=None):
+        self.path = path
+        self.values = values
+        self.error = error
+
+    @property
+    def ok(self):
+        """Whether the metadata was successfully read."""
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return '<ReadResult %s: %d tags>' % (self.path, len(self.values))
+        else:
+            return '<ReadResult %s: %r>' % (self.path, self.error)
+
+
+def _families_of(keys):
+    # The families of metadata needed to read the given keys.
+    families = set(key.split('.')[0].lower() for key in keys)
+    return tuple(family for family in FAMILIES if family in families)
+
+
+def read(path, families=FAMILIES, keys=None):
+    """
+    Read the metadata of one image.
+
+    :param path: path to an image file
+    :type path: string
+    :param families: the families of metadata to return (libexiv2 parses
+                     all of them regardless, only the tags of those families
+                     are converted to python types)
+    :type families: tuple of strings
+    :param keys: if not ``None``, read only the tags with those keys
+                 (*families* is then ignored)
+    :type keys: iterable of strings
+
+    :return: a dictionary mapping keys to values
+    :rtype: dict
+    """
+    if keys is not None:
+        keys = list(keys)
+        families = _families_of(keys)
+    metadata = ImageMetadata(path)
+    metadata.read(families)
+    return metadata.snapshot(keys=keys)
+
+
+def _read_result(path, families, keys):
+    try:
+        values = read(path, families, keys)
+    except Exception, error:
+        return ReadResult(path, error=error)
+    else:
+        return ReadResult(path, values)
+
+
+# The parameters of the reads in a worker process (see _init_process).
+_process_parameters = (FAMILIES, None)
+
+
+def _init_process(families, keys):
+    global _process_parameters
+    _process_parameters = (families, keys)
+
+
+def _picklable(error):
+    # Not all exceptions survive a round trip through pickle (e.g. those with
+    # a custom constructor), fall back on a generic exception if needed.
+    try:
+        pickle.loads(pickle.dumps(error, pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return RuntimeError('%s: %s' % (error.__class__.__name__, error))
+    else:
+        return error
+
+
+def _read_in_process(path):
+    # Read the metadata of one image in a worker process. Only the converted
+    # values are sent back to the parent process, as a plain tuple.
+    families, keys = _process_parameters
+    try:
+        values = read(path, families, keys)
+    except Exception, error:
+        return (path, None, _picklable(error))
+    else:
+        return (path, values, None)
+
+
+def _wait_for_token(tokens, stop):
+    # Take a token, waiting for one to be released unless the run is stopped.
+    # Return whether a token was taken.
+    while not stop.is_set():
+        try:
+            tokens.put(None, timeout=0.1)
+        except Queue.Full:
+            continue
+        else:
+            return True
+    return False
+
+
+def _read_many_processes(paths, workers, families, keys, ordered, chunksize):
+    pool = multiprocessing.Pool(workers, _init_process, (families, keys))
+    if ordered:
+        imap = pool.imap
+    else:
+        imap = pool.imap_unordered
+    # One token per image being read or waiting to be consumed. Pool.imap()
+    # consumes its input as fast as it can (in a thread of the pool), so a
+    # single imap() is fed from a generator that takes a token before each
+    # path: the memory usage is bounded, and a worker that is done with its
+    # chunk is sent the next one right away.
+    tokens = Queue.Queue(maxsize=workers * chunksize * 4)
+    stop = threading.Event()
+    feeder_errors = []
+
+    def feed():
+        try:
+            for path in paths:
+                if not _wait_for_token(tokens, stop):
+                    break
+                yield path
+        except Exception, error:
+            feeder_errors.append(error)
+
+    try:
+        for path, values, error in imap(_read_in_process, feed(), chunksize):
+            tokens.get()
+            yield ReadResult(path, values, error)
+        if feeder_errors:
+            raise feeder_errors[0]
+        pool.close()
+    finally:
+        # Unblock the feeder before terminating the pool, which waits for it.
+        stop.set()
+        pool.terminate()
+        pool.join()
+
+
+def read_many(paths, workers=4, families=FAMILIES, keys=None, ordered=False,
+              processes=False, chunksize=16):
+    """
+    Read the metadata of many images in parallel, using a pool of threads or
+    a pool of processes.
+
+    The results are generated as soon as they are available (*ordered* is
+    ``False``) or in the order of *paths* (*ordered* is ``True``). A failure
+    to read one image does not stop the run: it is reported in the
+    corresponding result.
+
+    *paths* is consumed lazily, and the number of images being read or
+    waiting to be consumed is bounded, so that *paths* may be a very long
+    iterable. Closing the generator before it is exhausted stops the reads.
+
+    Threads are lighter, but the conversion of the values to python types
+    runs one thread at a time. With *processes*, this conversion runs in
+    parallel too. The worker processes are reused for all the images, they
+    are sent paths in chunks of *chunksize* and send back the values only
+    (no tag objects).
+
+    :param paths: paths to image files
+    :type paths: iterable of strings
+    :param workers: the number of threads or processes reading images
+    :type workers: int
+    :param families: the families of metadata to return (libexiv2 parses
+                     all of them regardless, only the tags of those families
+                     are converted to python types)
+    :type families: tuple of strings
+    :param keys: if not ``None``, read only the tags with those keys
+                 (*families* is then ignored)
+    :type keys: iterable of strings
+    :param ordered: whether to generate the results in the order of *paths*
+    :type ordered: boolean
+    :param processes: whether to use a pool of processes instead of threads
+    :type processes: boolean
+    :param chunksize: the number of paths sent at once to a worker process
+    :type chunksize: int
+
+    :return: a generator of results, one per image
+    :rtype: generator of :class:`ReadResult`
+
+    :raise ValueError: if the number of workers or the chunk size is not
+                       strictly positive
+    """
+    if workers < 1:
+        raise ValueError('Invalid number of workers: %d' % workers)
+    if chunksize < 1:
+        raise ValueError('Invalid chunk size: %d' % chunksize)
+    if keys is not None:
+        keys = list(keys)
+    if processes:
+        return _read_many_processes(paths, workers, families, keys, ordered,
+                                    chunksize)
+    else:
+        return _read_many_threads(paths, workers, families, keys, ordered)
+
+
+def _read_many_threads(paths, workers, families, keys, ordered):
+
+    inputs = Queue.Queue()
+    outputs = Queue.Queue()
+    # One token per image being read or waiting to be consumed.
+    tokens = Queue.Queue(maxsize=workers * 4)
+    stop = threading.Event()
+    feeder_errors = []
+
+    def feed():
+        try:
+            for index, path in enumerate(paths):
+                if not _wait_for_token(tokens, stop):
+                    break
+                inputs.put((index, path))
+        except Exception, error:
+            feeder_errors.append(error)
+        finally:
+            for i in xrange(workers):
+                inputs.put(_DONE)
+
+    def work():
+        while True:
+            item = inputs.get()
+            if item is _DONE:
+                outputs.put(_DONE)
+                break
+            index, path = item
+            if stop.is_set():
+                continue
+            outputs.put((index, _read_result(path, families, keys)))
+
+    threads = [threading.Thread(target=feed)]
+    threads.extend(threading.Thread(target=work) for i in xrange(workers))
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    pending = {}
+    next_index = 0
+    running = workers
+    try:
+        while running > 0:
+            item = outputs.get()
+            if item is _DONE:
+                running -= 1
+                continue
+            index, result = item
+            if not ordered:
+                tokens.get()
+                yield result
+                continue
+            pending[index] = result
+            while next_index in pending:
+                tokens.get()
+                yield pending.pop(next_index)
+                next_index += 1
+        if feeder_errors:
+            raise feeder_errors[0]
+    finally:
+        stop.set()
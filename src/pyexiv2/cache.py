@@ -0,0 +1,547 @@
+# -*- coding: utf-8 -*-
+
+# ******************************************************************************
+#
+# Copyright (C) 2012 Olivier Tilloy <olivier@tilloy.net>
+#
+# This file is part of the pyexiv2 distribution.
+#
+# pyexiv2 is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# pyexiv2 is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyexiv2; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, 5th Floor, Boston, MA 02110-1301 USA.
+#
+# Author: Olivier Tilloy <olivier@tilloy.net>
+#
+# ******************************************************************************
+
+"""
+Caches of the metadata of image files.
+
+The caches are opt-in: :meth:`pyexiv2.metadata.ImageMetadata.read` never
+uses them, the metadata of a file is cached only when it is read through the
+``read`` method of a cache.
+"""
+
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from pyexiv2.metadata import ImageMetadata, FrozenMetadata, FAMILIES, \
+                             _FrozenDict
+from pyexiv2.utils import FixedOffset, Rational, GPSCoordinate, Fraction, \
+                          make_fraction
+
+
+def _stat(path):
+    # The identity of a file (device and inode) and the state of its contents.
+    # The change time is part of the state: unlike the modification time, it
+    # cannot be reverted (e.g. by ImageMetadata.write(preserve_timestamps=True)).
+    stat = os.stat(path)
+    identity = '%d:%d' % (stat.st_dev, stat.st_ino)
+    return identity, (stat.st_size, stat.st_mtime, stat.st_ctime)
+
+
+def _read(path, families):
+    # Read the metadata of an image file.
+    metadata = ImageMetadata(path)
+    metadata.read(families)
+    return metadata.freeze()
+
+
+def _encode_tzinfo(tzinfo):
+    if tzinfo is None:
+        return None
+    if isinstance(tzinfo, FixedOffset):
+        return [tzinfo.sign, tzinfo.hours, tzinfo.minutes]
+    raise TypeError('Cannot cache time zones of type %s' %
+                    tzinfo.__class__.__name__)
+
+
+def _decode_tzinfo(data):
+    if data is None:
+        return None
+    sign, hours, minutes = data
+    return FixedOffset(str(sign), hours, minutes)
+
+
+def _encode(value):
+    # A JSON-compatible form of a frozen value. Values other than numbers,
+    # booleans and None are tagged with their type. Only the types of the
+    # values of tags can be encoded.
+    if value is None or isinstance(value, (bool, int, long, float)):
+        return value
+    elif isinstance(value, str):
+        return ['s', value.decode('latin-1')]
+    elif isinstance(value, unicode):
+        return ['u', value]
+    elif isinstance(value, tuple):
+        return ['t', [_encode(item) for item in value]]
+    elif isinstance(value, dict):
+        return ['d', [[_encode(k), _encode(v)] for k, v in value.iteritems()]]
+    elif isinstance(value, Rational):
+        return ['r', value.numerator, value.denominator]
+    elif Fraction is not None and isinstance(value, Fraction):
+        return ['f', value.numerator, value.denominator]
+    elif isinstance(value, datetime.datetime):
+        return ['dt', value.year, value.month, value.day, value.hour,
+                value.minute, value.second, value.microsecond,
+                _encode_tzinfo(value.tzinfo)]
+    elif isinstance(value, datetime.date):
+        return ['da', value.year, value.month, value.day]
+    elif isinstance(value, datetime.time):
+        return ['ti', value.hour, value.minute, value.second,
+                value.microsecond, _encode_tzinfo(value.tzinfo)]
+    elif isinstance(value, GPSCoordinate):
+        return ['g', value.degrees, value.minutes, value.seconds,
+                value.direction]
+    raise TypeError('Cannot cache values of type %s' %
+                    value.__class__.__name__)
+
+
+_DECODERS = {
+    's': lambda text: text.encode('latin-1'),
+    'u': lambda text: text,
+    't': lambda items: tuple(_decode(item) for item in items),
+    'd': lambda items: _FrozenDict((_decode(k), _decode(v)) for k, v in items),
+    'r': Rational,
+    'f': make_fraction,
+    'dt': lambda year, month, day, hour, minute, second, microsecond, tz:
+        datetime.datetime(year, month, day, hour, minute, second,
+                          microsecond, _decode_tzinfo(tz)),
+    'da': datetime.date,
+    'ti': lambda hour, minute, second, microsecond, tz:
+        datetime.time(hour, minute, second, microsecond, _decode_tzinfo(tz)),
+    'g': lambda degrees, minutes, seconds, direction:
+        GPSCoordinate(degrees, minutes, seconds, str(direction)),
+}
+
+
+def _decode(data):
+    # The value encoded by _encode().
+    if data is None or isinstance(data, (bool, int, long, float)):
+        return data
+    return _DECODERS[data[0]](*data[1:])
+
+
+def _dumps(frozen):
+    # Serialize a FrozenMetadata.
+    # raise TypeError if one of its values cannot be serialized.
+    keys = dict((family, list(frozen._get_keys(family)))
+                for family in frozen.families)
+    values = [[key, _encode(value)] for key, value in frozen._values.iteritems()]
+    return json.dumps({'keys': keys, 'values': values,
+                       'mime_type': _encode(frozen.mime_type),
+                       'dimensions': _encode(frozen.dimensions),
+                       'comment': _encode(frozen.comment)})
+
+
+def _loads(data):
+    # Deserialize a FrozenMetadata.
+    # raise ValueError if the data is not a serialized FrozenMetadata.
+    try:
+        data = json.loads(data)
+        keys = dict((str(family), [str(key) for key in data['keys'][family]])
+                    for family in data['keys'])
+        values = dict((str(key), _decode(value))
+                      for key, value in data['values'])
+        return FrozenMetadata(keys, values, _decode(data['mime_type']),
+                              _decode(data['dimensions']),
+                              _decode(data['comment']))
+    except (TypeError, KeyError, IndexError, AttributeError,
+            ZeroDivisionError), error:
+        raise ValueError('Invalid cache entry: %s' % error)
+
+
+def _sizeof(value):
+    # An estimate of the memory used by a frozen value.
+    size = sys.getsizeof(value)
+    if isinstance(value, tuple):
+        size += sum(_sizeof(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(_sizeof(item) for item in value.iteritems())
+    return size
+
+
+def _footprint(frozen):
+    # An estimate of the memory used by a FrozenMetadata.
+    return sys.getsizeof(frozen) + _sizeof(tuple(frozen.iteritems()))
+
+
+class DiskCache(object):
+
+    """
+    A persistent cache of the metadata of image files, stored in an SQLite
+    database.
+
+    The metadata of a file is cached as a :class:`pyexiv2.metadata.FrozenMetadata`,
+    keyed by the device and inode of the file, and invalidated when its size,
+    modification time or change time differ. Reading the metadata of an
+    unchanged file from the cache does not open the file.
+
+    Only the values of the tags are stored, in JSON, never python objects:
+    the database may be shared without granting its writers the ability to
+    run code in the readers. An entry that cannot be decoded is treated as
+    missing. The metadata of a file whose values cannot be stored (an
+    unknown type) is read but not cached.
+
+    When the cache exceeds its limits, the least recently used entries are
+    evicted. A cache may be used from several threads, and several processes
+    may share the same directory.
+    """
+
+    #: The name of the database file in the directory of the cache.
+    FILENAME = 'pyexiv2-metadata.sqlite'
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, max_items=None):
+        """
+        :param directory: the directory of the cache, created if needed
+        :type directory: string
+        :param max_bytes: the maximum size of the cached metadata in bytes,
+                          or ``None`` for no limit
+        :type max_bytes: int
+        :param max_items: the maximum number of files cached, or ``None`` for
+                          no limit
+        :type max_items: int
+        """
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.filename = os.path.join(directory, self.FILENAME)
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.filename, timeout=30,
+                                           check_same_thread=False)
+        self._connection.text_factory = str
+        with self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS metadata ('
+                                     'file TEXT PRIMARY KEY, '
+                                     'size INTEGER, mtime REAL, ctime REAL, '
+                                     'families TEXT, data BLOB, '
+                                     'bytes INTEGER, access REAL)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS '
+                                     'metadata_access ON metadata (access)')
+
+    def read(self, path, families=FAMILIES):
+        """
+        Read the metadata of an image file, from the cache if the file did
+        not change since it was cached, from the file otherwise (and cache
+        it).
+
+        :param path: path to an image file
+        :type path: string
+        :param families: the families of metadata to read
+        :type families: tuple of strings
+
+        :return: the metadata of the file
+        :rtype: :class:`pyexiv2.metadata.FrozenMetadata`
+
+        :raise IOError: if the file cannot be read
+        :raise ValueError: if a family is unknown
+        """
+        # The state of the file is captured before reading it, so that a
+        # modification while reading it invalidates the entry.
+        identity, state = _stat(path)
+        frozen = self._lookup(identity, state, families)
+        if frozen is None:
+            frozen = _read(path, families)
+            self._store(identity, state, frozen)
+        return frozen
+
+    def get(self, path, families=FAMILIES):
+        """
+        Get the cached metadata of an image file, without ever reading the
+        file.
+
+        :param path: path to an image file
+        :type path: string
+        :param families: the families of metadata needed
+        :type families: tuple of strings
+
+        :return: the metadata of the file, or ``None`` if it is not cached,
+                 the cached families do not include *families*, or the file
+                 changed since it was cached
+        :rtype: :class:`pyexiv2.metadata.FrozenMetadata`
+
+        :raise OSError: if the file does not exist
+        """
+        identity, state = _stat(path)
+        return self._lookup(identity, state, families)
+
+    def invalidate(self, path):
+        """
+        Remove the metadata of an image file from the cache.
+
+        Modifications of the file are detected, so this is never needed for
+        correctness.
+
+        :param path: path to an image file
+        :type path: string
+        """
+        try:
+            identity, state = _stat(path)
+        except OSError:
+            # The file does not exist any longer, its entry will be evicted.
+            return
+        with self._lock:
+            with self._connection:
+                self._connection.execute('DELETE FROM metadata WHERE file = ?',
+                                         (identity,))
+
+    def clear(self):
+        """Remove all the entries of the cache."""
+        with self._lock:
+            with self._connection:
+                self._connection.execute('DELETE FROM metadata')
+
+    def close(self):
+        """Close the database of the cache."""
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM metadata').fetchone()[0]
+
+    def _lookup(self, identity, state, families):
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT size, mtime, ctime, families, data FROM metadata '
+                'WHERE file = ?', (identity,)).fetchone()
+            if row is None or tuple(row[:3]) != state or \
+                not set(families).issubset(row[3].split(',')):
+                return None
+            with self._connection:
+                self._connection.execute(
+                    'UPDATE metadata SET access = ? WHERE file = ?',
+                    (time.time(), identity))
+        try:
+            frozen = _loads(str(row[4]))
+        except ValueError:
+            return None
+        return frozen._select(families)
+
+    def _store(self, identity, state, frozen):
+        try:
+            data = _dumps(frozen)
+        except TypeError:
+            return
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?, '
+                    '?, ?)', (identity,) + state +
+                    (','.join(frozen.families), sqlite3.Binary(data),
+                     len(data), time.time()))
+                self._evict()
+
+    def _evict(self):
+        # Evict the least recently used entries until the cache fits within
+        # its limits.
+        count, total = self._connection.execute(
+            'SELECT COUNT(*), TOTAL(bytes) FROM metadata').fetchone()
+        excess_items = excess_bytes = 0
+        if self.max_items is not None:
+            excess_items = count - self.max_items
+        if self.max_bytes is not None:
+            excess_bytes = total - self.max_bytes
+        while excess_items > 0 or excess_bytes > 0:
+            rows = self._connection.execute(
+                'SELECT file, bytes FROM metadata ORDER BY access '
+                'LIMIT 100').fetchall()
+            if not rows:
+                break
+            for identity, size in rows:
+                if excess_items <= 0 and excess_bytes <= 0:
+                    break
+                self._connection.execute('DELETE FROM metadata WHERE file = ?',
+                                         (identity,))
+                excess_items -= 1
+                excess_bytes -= size
+
+
+class _PendingRead(object):
+
+    # A read in progress in one thread, that other threads wait for.
+
+    def __init__(self, signature, families):
+        self.signature = signature
+        self.families = families
+        self.done = threading.Event()
+        self.frozen = None
+        self.error = None
+
+
+# The fields of an entry of a MetadataCache, which is also a link of the
+# circular list of entries ordered from the least to the most recently used.
+_PREVIOUS, _NEXT, _PATH, _SIGNATURE, _FROZEN, _SIZE = range(6)
+
+
+class MetadataCache(object):
+
+    """
+    An in-memory cache of the metadata of image files, shared by threads.
+
+    The metadata of a file is cached as a :class:`pyexiv2.metadata.FrozenMetadata`,
+    which is immutable and can be handed out to several threads at once. It
+    is keyed by the path of the file, and read again if the file changed
+    (see :class:`DiskCache`). Concurrent reads of the same file are
+    coalesced: only one thread reads it, the others wait for the result.
+
+    When the estimated memory footprint or the number of cached files
+    exceeds the limits of the cache, the least recently used entries are
+    evicted.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, max_items=None):
+        """
+        :param max_bytes: the maximum estimated memory footprint of the
+                          cached metadata in bytes, or ``None`` for no limit
+        :type max_bytes: int
+        :param max_items: the maximum number of files cached, or ``None`` for
+                          no limit
+        :type max_items: int
+        """
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._root = []
+        self._root[:] = [self._root, self._root, None, None, None, 0]
+        self._size = 0
+        self._pending = {}
+
+    def read(self, path, families=FAMILIES):
+        """
+        Read the metadata of an image file, from the cache if the file did
+        not change since it was cached, from the file otherwise (and cache
+        it).
+
+        :param path: path to an image file
+        :type path: string
+        :param families: the families of metadata to read
+        :type families: tuple of strings
+
+        :return: the metadata of the file
+        :rtype: :class:`pyexiv2.metadata.FrozenMetadata`
+
+        :raise IOError: if the file cannot be read
+        :raise ValueError: if a family is unknown
+        """
+        path = os.path.abspath(path)
+        signature = _stat(path)
+        while True:
+            with self._lock:
+                entry = self._entries.get(path)
+                if entry is not None and entry[_SIGNATURE] == signature and \
+                    set(families).issubset(entry[_FROZEN].families):
+                    self._move_to_end(entry)
+                    return entry[_FROZEN]._select(families)
+                pending = self._pending.get(path)
+                reader = pending is None
+                if reader:
+                    pending = _PendingRead(signature, families)
+                    self._pending[path] = pending
+
+            if reader:
+                return self._read(path, pending)
+
+            pending.done.wait()
+            if pending.signature == signature and \
+                set(families).issubset(pending.families):
+                if pending.error is not None:
+                    raise pending.error
+                return pending.frozen._select(families)
+            # The concurrent read does not match this one, try again.
+
+    def invalidate(self, path):
+        """
+        Remove the metadata of an image file from the cache.
+
+        Modifications of the file are detected, so this is never needed for
+        correctness.
+
+        :param path: path to an image file
+        :type path: string
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                self._remove(entry)
+
+    def clear(self):
+        """Remove all the entries of the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._root[:] = [self._root, self._root, None, None, None, 0]
+            self._size = 0
+
+    @property
+    def size(self):
+        """The estimated memory footprint of the cached metadata, in bytes."""
+        return self._size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _read(self, path, pending):
+        # Read a file on behalf of all the threads waiting for it, and cache
+        # its metadata.
+        try:
+            pending.frozen = _read(path, pending.families)
+        except BaseException, error:
+            # Even a KeyboardInterrupt or a SystemExit: the waiting threads
+            # must not be left with no metadata and no error.
+            pending.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._pending[path]
+                if pending.error is None:
+                    self._store(path, pending.signature, pending.frozen)
+            pending.done.set()
+        return pending.frozen
+
+    def _store(self, path, signature, frozen):
+        entry = self._entries.get(path)
+        if entry is not None:
+            self._remove(entry)
+        last = self._root[_PREVIOUS]
+        entry = [last, self._root, path, signature, frozen, _footprint(frozen)]
+        last[_NEXT] = self._root[_PREVIOUS] = self._entries[path] = entry
+        self._size += entry[_SIZE]
+        # Evict the least recently used entries.
+        while self._entries and \
+            ((self.max_items is not None and
+              len(self._entries) > self.max_items) or
+             (self.max_bytes is not None and self._size > self.max_bytes)):
+            self._remove(self._root[_NEXT])
+
+    def _remove(self, entry):
+        entry[_PREVIOUS][_NEXT] = entry[_NEXT]
+        entry[_NEXT][_PREVIOUS] = entry[_PREVIOUS]
+        del self._entries[entry[_PATH]]
+        self._size -= entry[_SIZE]
+
+    def _move_to_end(self, entry):
+        entry[_PREVIOUS][_NEXT] = entry[_NEXT]
+        entry[_NEXT][_PREVIOUS] = entry[_PREVIOUS]
+        last = self._root[_PREVIOUS]
+        entry[_PREVIOUS] = last
+        entry[_NEXT] = self._root
+        last[_NEXT] = self._root[_PREVIOUS] = entry
@@ -87,6 +87,9 @@ class ExifTag(ListenerInterface):
 
     _date_formats = ('%Y:%m:%d',)
 
+    __slots__ = ('_tag', '_raw_value', '_raw_value_cookie', '_value',
+                 '_value_cookie', '_converter')
+
     def __init__(self, key, value=None, _tag=None):
         """
         The tag can be initialized with an optional value which expected type
@@ -102,8 +105,10 @@ class ExifTag(ListenerInterface):
         else:
             self._tag = libexiv2python._ExifTag(key)
         self._raw_value = None
+        self._raw_value_cookie = False
         self._value = None
         self._value_cookie = False
+        self._converter = None
         if value is not None:
             self._set_value(value)
 
@@ -114,9 +119,16 @@ class ExifTag(ListenerInterface):
     def _from_existing_tag(_tag):
         # Build a tag from an already existing libexiv2python._ExifTag.
         tag = ExifTag(_tag._getKey(), _tag=_tag)
-        # Do not set the raw_value property, as it would call _tag._setRawValue
-        # (see https://bugs.launchpad.net/pyexiv2/+bug/582445).
-        tag._raw_value = _tag._getRawValue()
+        converter = tag._get_converter()
+        if converter.binary or converter.multiple:
+            # The value is read from the bytes or the numeric components, the
+            # raw value (formatted by libexiv2) is fetched only if needed.
+            tag._raw_value_cookie = True
+        else:
+            # Do not set the raw_value property, as it would call
+            # _tag._setRawValue
+            # (see https://bugs.launchpad.net/pyexiv2/+bug/582445).
+            tag._raw_value = _tag._getRawValue()
         tag._value_cookie = True
         return tag
 
@@ -158,11 +170,15 @@ class ExifTag(ListenerInterface):
         return self._tag._getSectionDescription()
 
     def _get_raw_value(self):
+        if self._raw_value_cookie:
+            self._raw_value = self._tag._getRawValue()
+            self._raw_value_cookie = False
         return self._raw_value
 
     def _set_raw_value(self, value):
         self._tag._setRawValue(value)
         self._raw_value = value
+        self._raw_value_cookie = False
         self._value_cookie = True
 
     raw_value = property(fget=_get_raw_value, fset=_set_raw_value,
@@ -170,19 +186,43 @@ class ExifTag(ListenerInterface):
 
     def _compute_value(self):
         # Lazy computation of the value from the raw value.
-        if self.type in \
-            ('Short', 'SShort', 'Long', 'SLong', 'Rational', 'SRational'):
-            # May contain multiple values
-            values = self._raw_value.split()
-            if len(values) > 1:
-                # Make values a notifying list
-                values = map(self._convert_to_python, values)
-                self._value = NotifyingList(values)
-                self._value.register_listener(self)
+        converter = self._get_converter()
+        if converter.binary:
+            data = self._tag._getRawBytes()
+            if data is not None:
+                self._value = data
                 self._value_cookie = False
                 return
+        if converter.multiple and self._raw_value_cookie:
+            # The raw value was not fetched: decode the components natively,
+            # without formatting the value to a string and parsing it back.
+            numbers = self._tag._getNumericValues()
+            if numbers:
+                self._set_computed_values(converter.from_numbers(self, numbers))
+                return
+        raw_value = self.raw_value
+        if converter.multiple and ' ' in raw_value:
+            # May contain multiple values, decode them natively where possible
+            numbers = self._tag._getNumericValues()
+            if numbers is not None:
+                values = converter.from_numbers(self, numbers)
+            else:
+                values = converter.to_python_list(self, raw_value.split())
+            if len(values) > 1:
+                self._set_computed_values(values)
+                return
 
-        self._value = self._convert_to_python(self._raw_value)
+        self._value = converter.to_python(self, raw_value)
+        self._value_cookie = False
+
+    def _set_computed_values(self, values):
+        # Set the value computed from several components.
+        if len(values) > 1:
+            # Make values a notifying list
+            self._value = NotifyingList(values)
+            self._value.register_listener(self)
+        else:
+            self._value = values[0]
         self._value_cookie = False
 
     def _get_value(self):
@@ -191,9 +231,15 @@ class ExifTag(ListenerInterface):
         return self._value
 
     def _set_value(self, value):
+        converter = self._get_converter()
         if isinstance(value, (list, tuple)):
-            raw_values = map(self._convert_to_string, value)
+            raw_values = converter.to_string_list(self, value)
             self.raw_value = ' '.join(raw_values)
+        elif converter.binary:
+            # Pass the bytes as is, the raw value is fetched only if needed.
+            self._tag._setRawBytes(converter.to_bytes(self, value))
+            self._raw_value = None
+            self._raw_value_cookie = True
         else:
             self.raw_value = self._convert_to_string(value)
 
@@ -230,29 +276,17 @@ class ExifTag(ListenerInterface):
         self._set_value(self._value)
 
     def _match_encoding(self, charset):
-        encoding = sys.getdefaultencoding()
-        if charset == 'Ascii':
-            encoding = 'ascii'
-        elif charset == 'Jis':
-            encoding = 'shift_jis'
-        elif charset == 'Unicode':
-            # Starting from 0.20, exiv2 converts unicode comments to UTF-8
-            from pyexiv2 import __exiv2_version__
-            if __exiv2_version__ >= '0.20':
-                encoding = 'utf-8'
-            else:
-                byte_order = self._tag._getByteOrder()
-                if byte_order == 1:
-                    # little endian (II)
-                    encoding = 'utf-16le'
-                elif byte_order == 2:
-                    # big endian (MM)
-                    encoding = 'utf-16be'
-        elif charset == 'Undefined':
-            pass
-        elif charset == 'InvalidCharsetId':
-            pass
-        return encoding
+        byte_order = 0
+        if charset == 'Unicode':
+            byte_order = self._tag._getByteOrder()
+        return _match_encoding(charset, byte_order)
+
+    def _get_converter(self):
+        # The converter for the type of the tag, resolved once.
+        if self._converter is None:
+            type = self.type
+            self._converter = _converters.get(type) or _ExifConverter(type)
+        return self._converter
 
     def _convert_to_python(self, value):
         """
@@ -265,74 +299,7 @@ class ExifTag(ListenerInterface):
 
         :raise ExifValueError: if the conversion fails
         """
-        if self.type == 'Ascii':
-            # The value may contain a Datetime
-            for format in self._datetime_formats:
-                try:
-                    t = time.strptime(value, format)
-                except ValueError:
-                    continue
-                else:
-                    return datetime.datetime(*t[:6])
-            # Or a Date (e.g. Exif.GPSInfo.GPSDateStamp)
-            for format in self._date_formats:
-                try:
-                    t = time.strptime(value, format)
-                except ValueError:
-                    continue
-                else:
-                    return datetime.date(*t[:3])
-            # Default to string.
-            # There is currently no charset conversion.
-            # TODO: guess the encoding and decode accordingly into unicode
-            # where relevant.
-            return value
-
-        elif self.type in ('Byte', 'SByte'):
-            return value
-
-        elif self.type == 'Comment':
-            if value.startswith('charset='):
-                charset, val = value.split(' ', 1)
-                charset = charset.split('=')[1].strip('"')
-                encoding = self._match_encoding(charset)
-                return val.decode(encoding, 'replace')
-            else:
-                # No encoding defined.
-                try:
-                    return value.decode('utf-8')
-                except UnicodeError:
-                    return value
-
-        elif self.type in ('Short', 'SShort'):
-            try:
-                return int(value)
-            except ValueError:
-                raise ExifValueError(value, self.type)
-
-        elif self.type in ('Long', 'SLong'):
-            try:
-                return long(value)
-            except ValueError:
-                raise ExifValueError(value, self.type)
-
-        elif self.type in ('Rational', 'SRational'):
-            try:
-                r = make_fraction(value)
-            except (ValueError, ZeroDivisionError):
-                raise ExifValueError(value, self.type)
-            else:
-                if self.type == 'Rational' and r.numerator < 0:
-                    raise ExifValueError(value, self.type)
-                return r
-
-        elif self.type == 'Undefined':
-            # There is currently no charset conversion.
-            # TODO: guess the encoding and decode accordingly into unicode
-            # where relevant.
-            return undefined_to_string(value)
-
-        raise ExifValueError(value, self.type)
+        return self._get_converter().to_python(self, value)
 
     def _convert_to_string(self, value):
         """
@@ -346,109 +313,7 @@ class ExifTag(ListenerInterface):
 
         :raise ExifValueError: if the conversion fails
         """
-        if self.type == 'Ascii':
-            if isinstance(value, datetime.datetime):
-                return DateTimeFormatter.exif(value)
-            elif isinstance(value, datetime.date):
-                if self.key == 'Exif.GPSInfo.GPSDateStamp':
-                    # Special case
-                    return DateTimeFormatter.exif(value)
-                else:
-                    return '%s 00:00:00' % DateTimeFormatter.exif(value)
-            elif isinstance(value, unicode):
-                try:
-                    return value.encode('utf-8')
-                except UnicodeEncodeError:
-                    raise ExifValueError(value, self.type)
-            elif isinstance(value, str):
-                return value
-            else:
-                raise ExifValueError(value, self.type)
-
-        elif self.type in ('Byte', 'SByte'):
-            if isinstance(value, unicode):
-                try:
-                    return value.encode('utf-8')
-                except UnicodeEncodeError:
-                    raise ExifValueError(value, self.type)
-            elif isinstance(value, str):
-                return value
-            else:
-                raise ExifValueError(value, self.type)
-
-        elif self.type == 'Comment':
-            if value is not None and self.raw_value is not None and \
-                self.raw_value.startswith('charset='):
-                charset, val = self.raw_value.split(' ', 1)
-                charset = charset.split('=')[1].strip('"')
-                encoding = self._match_encoding(charset)
-                try:
-                    val = value.encode(encoding)
-                except UnicodeError:
-                    # Best effort, do not fail just because the original
-                    # encoding of the tag cannot encode the new value.
-                    pass
-                else:
-                    return 'charset="%s" %s' % (charset, val)
-
-            if isinstance(value, unicode):
-                try:
-                    return value.encode('utf-8')
-                except UnicodeEncodeError:
-                    raise ExifValueError(value, self.type)
-            elif isinstance(value, str):
-                return value
-            else:
-                raise ExifValueError(value, self.type)
-
-        elif self.type == 'Short':
-            if isinstance(value, int) and value >= 0:
-                return str(value)
-            else:
-                raise ExifValueError(value, self.type)
-
-        elif self.type == 'SShort':
-            if isinstance(value, int):
-                return str(value)
-            else:
-                raise ExifValueError(value, self.type)
-
-        elif self.type == 'Long':
-            if isinstance(value, (int, long)) and value >= 0:
-                return str(value)
-            else:
-                raise ExifValueError(value, self.type)
-
-        elif self.type == 'SLong':
-            if isinstance(value, (int, long)):
-                return str(value)
-            else:
-                raise ExifValueError(value, self.type)
-
-        elif self.type == 'Rational':
-            if is_fraction(value) and value.numerator >= 0:
-                return fraction_to_string(value)
-            else:
-                raise ExifValueError(value, self.type)
-
-        elif self.type == 'SRational':
-            if is_fraction(value):
-                return fraction_to_string(value)
-            else:
-                raise ExifValueError(value, self.type)
-
-        elif self.type == 'Undefined':
-            if isinstance(value, unicode):
-                try:
-                    return string_to_undefined(value.encode('utf-8'))
-                except UnicodeEncodeError:
-                    raise ExifValueError(value, self.type)
-            elif isinstance(value, str):
-                return string_to_undefined(value)
-            else:
-                raise ExifValueError(value, self.type)
-
-        raise ExifValueError(value, self.type)
+        return self._get_converter().to_string(self, value)
 
     def __str__(self):
         """
@@ -456,12 +321,13 @@ class ExifTag(ListenerInterface):
         :rtype: string
         """
         left = '%s [%s]' % (self.key, self.type)
-        if self._raw_value is None:
+        raw_value = self.raw_value
+        if raw_value is None:
             right = '(No value)'
-        elif self.type == 'Undefined' and len(self._raw_value) > 100:
+        elif self.type == 'Undefined' and len(raw_value) > 100:
             right = '(Binary value suppressed)'
         else:
-             right = self._raw_value
+             right = raw_value
         return '<%s = %s>' % (left, right)
 
     # Support for pickling.
@@ -471,9 +337,303 @@ class ExifTag(ListenerInterface):
     def __setstate__(self, state):
         key, raw_value = state
         self._tag = libexiv2python._ExifTag(key)
+        self._converter = None
+        self._raw_value_cookie = False
+        self._value = None
         self.raw_value = raw_value
 
 
+def _match_encoding(charset, byte_order):
+    # The encoding of a comment with the given charset, in an image of the
+    # given byte order.
+    encoding = sys.getdefaultencoding()
+    if charset == 'Ascii':
+        encoding = 'ascii'
+    elif charset == 'Jis':
+        encoding = 'shift_jis'
+    elif charset == 'Unicode':
+        # Starting from 0.20, exiv2 converts unicode comments to UTF-8
+        from pyexiv2 import __exiv2_version__
+        if __exiv2_version__ >= '0.20':
+            encoding = 'utf-8'
+        elif byte_order == 1:
+            # little endian (II)
+            encoding = 'utf-16le'
+        elif byte_order == 2:
+            # big endian (MM)
+            encoding = 'utf-16be'
+    elif charset == 'Undefined':
+        pass
+    elif charset == 'InvalidCharsetId':
+        pass
+    return encoding
+
+
+class _ExifConverter(object):
+
+    """
+    The conversion of the values of one EXIF type between their raw string
+    representation and python types.
+
+    Converters are stateless and shared by all the tags of a given type (see
+    ExifTag._get_converter()), the tag is passed to the conversion methods
+    for the few types that need it. The default implementation rejects all
+    values.
+    """
+
+    # Whether values are read and written as bytes (see
+    # libexiv2python._ExifTag._getRawBytes() and _setRawBytes()) rather than
+    # through their raw value. If so, the converter also implements
+    # to_bytes(tag, value).
+    binary = False
+
+    # Whether a raw value may contain several space-separated values. If so,
+    # the converter also implements from_numbers(tag, numbers) to convert the
+    # components returned by libexiv2python._ExifTag._getNumericValues().
+    multiple = False
+
+    def __init__(self, type):
+        self.type = type
+
+    def to_python(self, tag, value):
+        raise ExifValueError(value, self.type)
+
+    def to_string(self, tag, value):
+        raise ExifValueError(value, self.type)
+
+    def to_python_list(self, tag, values):
+        return [self.to_python(tag, value) for value in values]
+
+    def to_string_list(self, tag, values):
+        return [self.to_string(tag, value) for value in values]
+
+
+def _encode_string(value, type):
+    # Common conversion of a string value to its raw form.
+    if isinstance(value, unicode):
+        try:
+            return value.encode('utf-8')
+        except UnicodeEncodeError:
+            raise ExifValueError(value, type)
+    elif isinstance(value, str):
+        return value
+    else:
+        raise ExifValueError(value, type)
+
+
+class _AsciiConverter(_ExifConverter):
+
+    def to_python(self, tag, value):
+        # The value may contain a Datetime
+        for format in ExifTag._datetime_formats:
+            try:
+                t = time.strptime(value, format)
+            except ValueError:
+                continue
+            else:
+                return datetime.datetime(*t[:6])
+        # Or a Date (e.g. Exif.GPSInfo.GPSDateStamp)
+        for format in ExifTag._date_formats:
+            try:
+                t = time.strptime(value, format)
+            except ValueError:
+                continue
+            else:
+                return datetime.date(*t[:3])
+        # Default to string.
+        # There is currently no charset conversion.
+        # TODO: guess the encoding and decode accordingly into unicode
+        # where relevant.
+        return value
+
+    def to_string(self, tag, value):
+        if isinstance(value, datetime.datetime):
+            return DateTimeFormatter.exif(value)
+        elif isinstance(value, datetime.date):
+            if tag.key == 'Exif.GPSInfo.GPSDateStamp':
+                # Special case
+                return DateTimeFormatter.exif(value)
+            else:
+                return '%s 00:00:00' % DateTimeFormatter.exif(value)
+        else:
+            return _encode_string(value, self.type)
+
+
+class _ByteConverter(_ExifConverter):
+
+    def to_python(self, tag, value):
+        return value
+
+    def to_string(self, tag, value):
+        return _encode_string(value, self.type)
+
+
+class _CommentConverter(_ExifConverter):
+
+    def to_python(self, tag, value):
+        if value.startswith('charset='):
+            charset, val = value.split(' ', 1)
+            charset = charset.split('=')[1].strip('"')
+            encoding = tag._match_encoding(charset)
+            return val.decode(encoding, 'replace')
+        else:
+            # No encoding defined.
+            try:
+                return value.decode('utf-8')
+            except UnicodeError:
+                return value
+
+    def to_string(self, tag, value):
+        if value is not None and tag.raw_value is not None and \
+            tag.raw_value.startswith('charset='):
+            charset, val = tag.raw_value.split(' ', 1)
+            charset = charset.split('=')[1].strip('"')
+            encoding = tag._match_encoding(charset)
+            try:
+                val = value.encode(encoding)
+            except UnicodeError:
+                # Best effort, do not fail just because the original
+                # encoding of the tag cannot encode the new value.
+                pass
+            else:
+                return 'charset="%s" %s' % (charset, val)
+
+        return _encode_string(value, self.type)
+
+
+class _IntegerConverter(_ExifConverter):
+
+    multiple = True
+
+    def __init__(self, type, python_type, accepted_types, signed):
+        super(_IntegerConverter, self).__init__(type)
+        self.python_type = python_type
+        self.accepted_types = accepted_types
+        self.signed = signed
+
+    def to_python(self, tag, value):
+        try:
+            return self.python_type(value)
+        except ValueError:
+            raise ExifValueError(value, self.type)
+
+    def to_string(self, tag, value):
+        if isinstance(value, self.accepted_types) and \
+            (self.signed or value >= 0):
+            return str(value)
+        else:
+            raise ExifValueError(value, self.type)
+
+    def to_python_list(self, tag, values):
+        try:
+            return map(self.python_type, values)
+        except ValueError:
+            # Report the faulty value.
+            return super(_IntegerConverter, self).to_python_list(tag, values)
+
+    def from_numbers(self, tag, numbers):
+        return map(self.python_type, numbers)
+
+
+class _RationalConverter(_ExifConverter):
+
+    multiple = True
+
+    def __init__(self, type, signed):
+        super(_RationalConverter, self).__init__(type)
+        self.signed = signed
+
+    def to_python(self, tag, value):
+        try:
+            r = make_fraction(value)
+        except (ValueError, ZeroDivisionError):
+            raise ExifValueError(value, self.type)
+        else:
+            if not self.signed and r.numerator < 0:
+                raise ExifValueError(value, self.type)
+            return r
+
+    def to_string(self, tag, value):
+        if is_fraction(value) and (self.signed or value.numerator >= 0):
+            return fraction_to_string(value)
+        else:
+            raise ExifValueError(value, self.type)
+
+    def from_numbers(self, tag, numbers):
+        values = []
+        for numerator, denominator in numbers:
+            try:
+                values.append(make_fraction(numerator, denominator))
+            except ZeroDivisionError:
+                raise ExifValueError('%d/%d' % (numerator, denominator),
+                                     self.type)
+        return values
+
+
+class _UndefinedConverter(_ExifConverter):
+
+    binary = True
+
+    def to_bytes(self, tag, value):
+        return _encode_string(value, self.type)
+
+    def to_python(self, tag, value):
+        # There is currently no charset conversion.
+        # TODO: guess the encoding and decode accordingly into unicode
+        # where relevant.
+        return undefined_to_string(value)
+
+    def to_string(self, tag, value):
+        return string_to_undefined(_encode_string(value, self.type))
+
+
+# The converters of the supported EXIF types
+_converters = {
+    'Ascii': _AsciiConverter('Ascii'),
+    'Byte': _ByteConverter('Byte'),
+    'SByte': _ByteConverter('SByte'),
+    'Comment': _CommentConverter('Comment'),
+    'Short': _IntegerConverter('Short', int, int, False),
+    'SShort': _IntegerConverter('SShort', int, int, True),
+    'Long': _IntegerConverter('Long', long, (int, long), False),
+    'SLong': _IntegerConverter('SLong', long, (int, long), True),
+    'Rational': _RationalConverter('Rational', False),
+    'SRational': _RationalConverter('SRational', True),
+    'Undefined': _UndefinedConverter('Undefined'),
+    }
+
+
+class _RawValueConverter(object):
+
+    """
+    The conversion of raw values of EXIF tags to python types outside of any
+    tag, for the values of a snapshot of the metadata of an image (see
+    pyexiv2.metadata.ImageMetadata.snapshot()).
+
+    It stands for the tag in the calls to the converters, for the few types
+    that need it.
+    """
+
+    __slots__ = ('_byte_order',)
+
+    def __init__(self, byte_order):
+        self._byte_order = byte_order
+
+    def _match_encoding(self, charset):
+        return _match_encoding(charset, self._byte_order)
+
+    def __call__(self, type, raw_value):
+        # Same as ExifTag._compute_value() from the raw value alone.
+        converter = _converters.get(type)
+        if converter is None:
+            raise ExifValueError(raw_value, type)
+        if converter.multiple and ' ' in raw_value:
+            values = converter.to_python_list(self, raw_value.split())
+            if len(values) > 1:
+                return values
+        return converter.to_python(self, raw_value)
+
+
 class ExifThumbnail(object):
 
     """
@@ -508,8 +668,8 @@ class ExifThumbnail(object):
 
     def _update_exif_tags_cache(self):
         # Update the cache of EXIF tags
-        keys = self._metadata._image._exifKeys()
-        self._metadata._keys['exif'] = keys
+        keys = set(self._metadata._image._exifKeys())
+        self._metadata._keys['exif'] = None
         cached = self._metadata._tags['exif'].keys()
         for key in cached:
             if key not in keys:
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+# ******************************************************************************
+#
+# Copyright (C) 2012 Olivier Tilloy <olivier@tilloy.net>
+#
+# This file is part of the pyexiv2 distribution.
+#
+# pyexiv2 is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# pyexiv2 is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyexiv2; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, 5th Floor, Boston, MA 02110-1301 USA.
+#
+# Author: Olivier Tilloy <olivier@tilloy.net>
+#
+# ******************************************************************************
+
+"""
+Probing of the format and dimensions of an image from its header.
+"""
+
+import struct
+
+from pyexiv2.metadata import ImageMetadata
+
+
+# The maximum number of JPEG segments or TIFF entries examined while looking
+# for the dimensions of an image, which bounds the I/O of a probe.
+_MAX_SEGMENTS = 64
+_MAX_ENTRIES = 256
+
+# The TIFF tags that mark a RAW image or an image whose IFD0 may not be the
+# primary image (SubIFDs, MakerNote, DNGVersion, DNGPrivateData). For those,
+# the mime type and dimensions reported by libexiv2 may differ from those
+# found in IFD0.
+_RAW_TIFF_TAGS = frozenset((0x14a, 0x927c, 0xc612, 0xc634))
+
+# The compressions of the RAW formats that libexiv2 identifies by the
+# compression of their primary image (Sony ARW, Samsung SRW, Nikon NEF and
+# Pentax PEF), and reports with their own mime type.
+_RAW_COMPRESSIONS = frozenset((32767, 32770, 34713, 65535))
+
+# The JPEG markers of the start of a frame (SOF0 to SOF15, except DHT, JPG and
+# DAC), where the dimensions of the image are.
+_SOF_MARKERS = frozenset(range(0xc0, 0xd0)) - frozenset((0xc4, 0xc8, 0xcc))
+
+
+class _FileReader(object):
+
+    # Random access to the contents of a file.
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+
+    def read(self, offset, size):
+        self._file.seek(offset)
+        return self._file.read(size)
+
+    def close(self):
+        self._file.close()
+
+
+class _BufferReader(object):
+
+    # Random access to the contents of a buffer.
+
+    def __init__(self, data):
+        try:
+            self._data = memoryview(data)
+            self._view = True
+        except (NameError, TypeError):
+            # Python 2.6, or an object that only supports the old-style
+            # buffer interface (e.g. mmap)
+            self._data = buffer(data)
+            self._view = False
+
+    def read(self, offset, size):
+        data = self._data[offset:offset + size]
+        if self._view:
+            return data.tobytes()
+        return data
+
+    def close(self):
+        pass
+
+
+def _unpack(format, reader, offset):
+    # Unpack a structure read at a given offset, or return None if the data
+    # is truncated.
+    data = reader.read(offset, struct.calcsize(format))
+    if len(data) < struct.calcsize(format):
+        return None
+    return struct.unpack(format, data)
+
+
+def _probe_jpeg(reader):
+    offset = 2
+    for i in xrange(_MAX_SEGMENTS):
+        header = _unpack('>BBH', reader, offset)
+        if header is None or header[0] != 0xff:
+            return None
+        marker, length = header[1:]
+        if marker == 0xff:
+            # Fill byte
+            offset += 1
+            continue
+        if marker in _SOF_MARKERS:
+            frame = _unpack('>BHH', reader, offset + 4)
+            if frame is None:
+                return None
+            precision, height, width = frame
+            return ('image/jpeg', width, height)
+        if marker in (0xd9, 0xda):
+            # End of image or start of scan, there is no frame header.
+            return None
+        offset += 2 + length
+    return None
+
+
+def _probe_png(reader):
+    ihdr = _unpack('>I4sII', reader, 8)
+    if ihdr is None or ihdr[1] != 'IHDR':
+        return None
+    return ('image/png', ihdr[2], ihdr[3])
+
+
+def _probe_gif(reader):
+    screen = _unpack('<HH', reader, 6)
+    if screen is None:
+        return None
+    return ('image/gif', screen[0], screen[1])
+
+
+def _probe_bmp(reader):
+    dimensions = _unpack('<ii', reader, 18)
+    if dimensions is None:
+        return None
+    return ('image/x-ms-bmp', dimensions[0], abs(dimensions[1]))
+
+
+def _probe_tiff(reader):
+    header = reader.read(0, 4)
+    if header == 'II*\x00':
+        order = '<'
+    else:
+        order = '>'
+    ifd0 = _unpack(order + 'I', reader, 4)
+    count = ifd0 and _unpack(order + 'H', reader, ifd0[0])
+    if count is None or count[0] > _MAX_ENTRIES:
+        return None
+    data = reader.read(ifd0[0] + 2, 12 * count[0])
+    if len(data) < 12 * count[0]:
+        return None
+    width = height = None
+    for offset in xrange(0, len(data) - 11, 12):
+        tag, type = struct.unpack(order + 'HH', data[offset:offset + 4])
+        if tag in _RAW_TIFF_TAGS:
+            # Leave it to libexiv2
+            return None
+        if tag not in (0xfe, 0x100, 0x101, 0x103):
+            continue
+        if type == 3:
+            # SHORT
+            value = struct.unpack(order + 'H', data[offset + 8:offset + 10])[0]
+        elif type == 4:
+            # LONG
+            value = struct.unpack(order + 'I', data[offset + 8:offset + 12])[0]
+        else:
+            return None
+        if tag == 0xfe:
+            # NewSubfileType, IFD0 is not the primary image unless it is 0.
+            if value != 0:
+                return None
+        elif tag == 0x103:
+            # Compression
+            if value in _RAW_COMPRESSIONS:
+                return None
+        elif tag == 0x100:
+            width = value
+        else:
+            height = value
+    if width is None or height is None:
+        return None
+    return ('image/tiff', width, height)
+
+
+def _prober(header):
+    # The function probing the format identified by the header of an image, if
+    # any.
+    if header.startswith('\xff\xd8'):
+        return _probe_jpeg
+    elif header.startswith('\x89PNG\r\n\x1a\n'):
+        return _probe_png
+    elif header.startswith(('GIF87a', 'GIF89a')):
+        return _probe_gif
+    elif header.startswith('BM'):
+        return _probe_bmp
+    elif header.startswith(('II*\x00', 'MM\x00*')) and header[8:10] != 'CR':
+        # TIFF, but not CR2, which libexiv2 identifies by its header (ORF and
+        # RW2 have a magic number of their own). Other RAW formats (NEF, DNG,
+        # ARW, PEF, etc.) are recognized by the tags of their IFD0.
+        return _probe_tiff
+    return None
+
+
+def probe(path_or_buffer):
+    """
+    Identify the format of an image and read its dimensions, without reading
+    its metadata.
+
+    For JPEG, PNG, GIF, BMP and TIFF images, only the headers needed are read
+    (for a JPEG image, the headers of the segments that precede the frame
+    header). Other formats, including the RAW formats based on TIFF, are
+    handed over to libexiv2, which reads all the metadata of the image.
+
+    :param path_or_buffer: path to an image file, or a buffer containing
+                           image data (to probe image data held in a string,
+                           wrap it in a :func:`buffer`)
+    :type path_or_buffer: string, or any object that supports the buffer
+                          interface
+
+    :return: the mime type, width and height of the image
+    :rtype: tuple (string, int, int)
+
+    :raise IOError: if the file cannot be read, or the format of the image is
+                    unknown
+    """
+    if isinstance(path_or_buffer, basestring):
+        reader = _FileReader(path_or_buffer)
+    else:
+        reader = _BufferReader(path_or_buffer)
+    try:
+        prober = _prober(reader.read(0, 16))
+        result = prober and prober(reader)
+    finally:
+        reader.close()
+    if result is not None:
+        return result
+
+    if isinstance(path_or_buffer, basestring):
+        metadata = ImageMetadata(path_or_buffer)
+    else:
+        metadata = ImageMetadata.from_buffer(path_or_buffer, copy=False)
+    metadata.read()
+    width, height = metadata.dimensions
+    return (metadata.mime_type, width, height)
@@ -81,6 +81,8 @@ class IptcTag(ListenerInterface):
     _time_zone_re = r'(?P<sign>\+|-)(?P<ohours>\d{2}):(?P<ominutes>\d{2})'
     _time_re = re.compile(r'(?P<hours>\d{2}):(?P<minutes>\d{2}):(?P<seconds>\d{2})(?P<tzd>%s)' % _time_zone_re)
 
+    __slots__ = ('_tag', '_raw_values', '_values', '_values_cookie')
+
     def __init__(self, key, values=None, _tag=None):
         """
         The tag can be initialized with an optional list of values which
@@ -255,55 +257,7 @@ class IptcTag(ListenerInterface):
 
         :raise IptcValueError: if the conversion fails
         """
-        if self.type == 'Short':
-            try:
-                return int(value)
-            except ValueError:
-                raise IptcValueError(value, self.type)
-
-        elif self.type == 'String':
-            # There is currently no charset conversion.
-            # TODO: guess the encoding and decode accordingly into unicode
-            # where relevant.
-            return value
-
-        elif self.type == 'Date':
-            # According to the IPTC specification, the format for a string field
-            # representing a date is '%Y%m%d'. However, the string returned by
-            # exiv2 using method DateValue::toString() is formatted using
-            # pattern '%Y-%m-%d'.
-            format = '%Y-%m-%d'
-            try:
-                t = time.strptime(value, format)
-                return datetime.date(*t[:3])
-            except ValueError:
-                raise IptcValueError(value, self.type)
-
-        elif self.type == 'Time':
-            # According to the IPTC specification, the format for a string field
-            # representing a time is '%H%M%S±%H%M'. However, the string returned
-            # by exiv2 using method TimeValue::toString() is formatted using
-            # pattern '%H:%M:%S±%H:%M'.
-            match = IptcTag._time_re.match(value)
-            if match is None:
-                raise IptcValueError(value, self.type)
-            gd = match.groupdict()
-            try:
-                tzinfo = FixedOffset(gd['sign'], int(gd['ohours']),
-                                     int(gd['ominutes']))
-            except TypeError:
-                raise IptcValueError(value, self.type)
-            try:
-                return datetime.time(int(gd['hours']), int(gd['minutes']),
-                                     int(gd['seconds']), tzinfo=tzinfo)
-            except (TypeError, ValueError):
-                raise IptcValueError(value, self.type)
-
-        elif self.type == 'Undefined':
-            # Binary data, return it unmodified
-            return value
-
-        raise IptcValueError(value, self.type)
+        return _convert_to_python(value, self.type)
 
     def _convert_to_string(self, value):
         """
@@ -373,5 +327,66 @@ class IptcTag(ListenerInterface):
     def __setstate__(self, state):
         key, raw_value = state
         self._tag = libexiv2python._IptcTag(key)
+        self._values = None
         self.raw_value = raw_value
 
+
+def _convert_to_python(value, type):
+    # Convert one raw value of the given IPTC type to its python type (see
+    # IptcTag._convert_to_python()).
+    if type == 'Short':
+        try:
+            return int(value)
+        except ValueError:
+            raise IptcValueError(value, type)
+
+    elif type == 'String':
+        # There is currently no charset conversion.
+        # TODO: guess the encoding and decode accordingly into unicode
+        # where relevant.
+        return value
+
+    elif type == 'Date':
+        # According to the IPTC specification, the format for a string field
+        # representing a date is '%Y%m%d'. However, the string returned by
+        # exiv2 using method DateValue::toString() is formatted using
+        # pattern '%Y-%m-%d'.
+        format = '%Y-%m-%d'
+        try:
+            t = time.strptime(value, format)
+            return datetime.date(*t[:3])
+        except ValueError:
+            raise IptcValueError(value, type)
+
+    elif type == 'Time':
+        # According to the IPTC specification, the format for a string field
+        # representing a time is '%H%M%S±%H%M'. However, the string returned
+        # by exiv2 using method TimeValue::toString() is formatted using
+        # pattern '%H:%M:%S±%H:%M'.
+        match = IptcTag._time_re.match(value)
+        if match is None:
+            raise IptcValueError(value, type)
+        gd = match.groupdict()
+        try:
+            tzinfo = FixedOffset(gd['sign'], int(gd['ohours']),
+                                 int(gd['ominutes']))
+        except TypeError:
+            raise IptcValueError(value, type)
+        try:
+            return datetime.time(int(gd['hours']), int(gd['minutes']),
+                                 int(gd['seconds']), tzinfo=tzinfo)
+        except (TypeError, ValueError):
+            raise IptcValueError(value, type)
+
+    elif type == 'Undefined':
+        # Binary data, return it unmodified
+        return value
+
+    raise IptcValueError(value, type)
+
+
+def _values_from_raw(type, raw_values):
+    # Convert the raw values of a tag to python types outside of any tag, for
+    # the values of a snapshot of the metadata of an image (see
+    # pyexiv2.metadata.ImageMetadata.snapshot()).
+    return [_convert_to_python(value, type) for value in raw_values]
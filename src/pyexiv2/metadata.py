@@ -30,19 +30,131 @@ Provide the ImageMetadata class.
 
 import os
 import sys
+import mmap
+import shutil
+import tempfile
 from errno import ENOENT
-from collections import MutableMapping
+from collections import Mapping, MutableMapping
 from itertools import chain
 import codecs
 
 import libexiv2python
 
-from pyexiv2.exif import ExifTag, ExifThumbnail
-from pyexiv2.iptc import IptcTag
-from pyexiv2.xmp import XmpTag
+from pyexiv2.exif import ExifTag, ExifThumbnail, _RawValueConverter
+from pyexiv2.iptc import IptcTag, _values_from_raw as _iptc_values
+from pyexiv2.xmp import XmpTag, _value_from_raw as _xmp_value
 from pyexiv2.preview import Preview
 
 
+#: The families of metadata, in the order they are iterated over.
+FAMILIES = ('exif', 'iptc', 'xmp')
+
+
+def _snapshot_value(convert, type, raw_value):
+    # Compute the python value of a tag from snapshot data with the given
+    # conversion function of its family, without building a tag.
+    if raw_value is None:
+        return None
+    try:
+        return convert(type, raw_value)
+    except (ValueError, NotImplementedError):
+        return raw_value
+
+
+# A deleted slot in a _KeyIndex
+_DELETED = object()
+
+
+class _KeyIndex(object):
+
+    """
+    An insertion-ordered set of the keys of a family of tags, with constant
+    time membership, insertion and deletion.
+
+    Deleted keys leave a hole in the order, the holes are compacted once they
+    outnumber the keys. The keys are materialized as a list only when
+    requested, and that list is kept until the index changes.
+    """
+
+    __slots__ = ('_order', '_positions', '_list')
+
+    def __init__(self, keys=()):
+        self._order = []
+        self._positions = {}
+        self._list = None
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def add(self, key):
+        if key not in self._positions:
+            self._positions[key] = len(self._order)
+            self._order.append(key)
+            self._list = None
+
+    def remove(self, key):
+        # Raise a KeyError if the key is not in the index.
+        self._order[self._positions.pop(key)] = _DELETED
+        self._list = None
+        if len(self._order) > 2 * len(self._positions) + 16:
+            self._order = list(self.tolist())
+            self._positions = dict((k, i) for i, k in enumerate(self._order))
+
+    def tolist(self):
+        if self._list is None:
+            self._list = [key for key in self._order if key is not _DELETED]
+        return self._list
+
+
+class _PendingTag(object):
+
+    """
+    A minimal stand-in for a native tag that records the raw value it is
+    given, so that the python tag classes can convert a value without a
+    native tag being allocated (see ImageMetadata.update()).
+    """
+
+    __slots__ = ('_key', '_type', '_exiv2_type', 'raw', 'binary')
+
+    def __init__(self, key, type, exiv2_type):
+        self._key = key
+        self._type = type
+        self._exiv2_type = exiv2_type
+        self.raw = None
+        self.binary = False
+
+    def _getKey(self):
+        return self._key
+
+    def _getType(self):
+        return self._type
+
+    def _getExiv2Type(self):
+        return self._exiv2_type
+
+    def _getByteOrder(self):
+        return 0
+
+    def _setRawValue(self, value):
+        self.raw = value
+        self.binary = False
+
+    def _setRawBytes(self, data):
+        self.raw = data
+        self.binary = True
+
+    _setRawValues = _setTextValue = _setArrayValue = _setLangAltValue = \
+        _setRawValue
+
+
 class ImageMetadata(MutableMapping):
 
     """
@@ -63,11 +175,21 @@ class ImageMetadata(MutableMapping):
         if filename is not None and isinstance(filename, unicode):
             self.filename = filename.encode(sys.getfilesystemencoding())
         self.__image = None
+        self._families = FAMILIES
         self._keys = {'exif': None, 'iptc': None, 'xmp': None}
         self._tags = {'exif': {}, 'iptc': {}, 'xmp': {}}
         self._exif_thumbnail = None
+        # The memory mapping of the image file, in mmap mode, until the
+        # metadata is written back
+        self._mapping = None
+        # Whether the image data is held in memory (mapped or written back)
+        # instead of being read from and written to the file by libexiv2
+        self._in_memory = False
+        # Incremented whenever the metadata is read or written, to tell the
+        # previews extracted before apart (see Preview.data)
+        self._generation = 0
 
-    def _instantiate_image(self, filename):
+    def _instantiate_image(self, filename, use_mmap=False):
         # This method is meant to be overridden in unit tests to easily replace
         # the internal image reference by a mock.
         if not os.path.exists(filename) or not os.path.isfile(filename):
@@ -76,18 +198,63 @@ class ImageMetadata(MutableMapping):
         stat = os.stat(filename)
         self._atime = stat.st_atime
         self._mtime = stat.st_mtime
-        return libexiv2python._Image(filename)
+        self._mapping = None
+        self._in_memory = use_mmap and stat.st_size > 0
+        if not self._in_memory:
+            return libexiv2python._Image(filename)
+        fd = open(filename, 'rb')
+        try:
+            self._mapping = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            fd.close()
+        # The image borrows the mapped data, it keeps a reference to the
+        # mapping for as long as it needs it. The mapping is never closed.
+        return libexiv2python._Image._fromMapping(self._mapping)
 
     @classmethod
-    def from_buffer(cls, buffer):
+    def from_buffer(cls, buffer, copy=True):
         """
         Instantiate an image container from an image buffer.
 
+        If *copy* is ``False``, the image data is not copied: the container
+        keeps a reference to the buffer and reads directly from it. In this
+        case the contents of the buffer must not be modified for as long as
+        the container is alive. Writing the metadata back never modifies the
+        original buffer: the data is copied first, and the updated image data
+        is stored in a new memory block (see :attr:`buffer`). Objects that
+        only support the old-style buffer interface (e.g. :class:`mmap.mmap`
+        and :func:`buffer` objects in Python 2) are always copied, as nothing
+        would prevent them from being closed while the container reads from
+        them.
+
         :param buffer: a buffer containing image data
-        :type buffer: string
+        :type buffer: string, bytearray, memoryview, mmap or any object that
+                      supports the buffer interface
+        :param copy: whether to make a private copy of the image data
+        :type copy: boolean
+        """
+        obj = cls(None)
+        obj.__image = libexiv2python._Image(buffer, copy)
+        return obj
+
+    @classmethod
+    def from_fileobj(cls, fileobj):
+        """
+        Instantiate an image container from a file object.
+
+        The image data is read on demand: only the parts of it that libexiv2
+        accesses are read from the file object (for a JPEG image, the segments
+        that precede the image data). libexiv2 parses TIFF-based images from
+        memory, so the whole image data is read for them. The file object must
+        not be closed for as long as the container is alive. It is never
+        written to, the updated image data is stored in a new memory block
+        when writing the metadata back (see :attr:`buffer`).
+
+        :param fileobj: a file object opened in binary mode
+        :type fileobj: any object with ``read``, ``seek`` and ``tell`` methods
         """
         obj = cls(None)
-        obj.__image = libexiv2python._Image(buffer, len(buffer))
+        obj.__image = libexiv2python._Image._fromFileObject(fileobj)
         return obj
 
     @property
@@ -96,29 +263,82 @@ class ImageMetadata(MutableMapping):
             raise IOError('Image metadata has not been read yet')
         return self.__image
 
-    def read(self):
+    def read(self, families=FAMILIES, mmap=False):
         """
         Read the metadata embedded in the associated image.
         It is necessary to call this method once before attempting to access
         the metadata (an exception will be raised if trying to access metadata
         before calling this method).
+
+        In mmap mode, the image file is mapped in memory and libexiv2 parses
+        the metadata straight from the mapping instead of reading the file
+        through buffered I/O, and :attr:`buffer` returns a read-only view of
+        the mapping. This is faster for large files, TIFF-based ones in
+        particular. Each read in mmap mode maps the current contents of the
+        file, and the tags previously read are discarded. The mode has no
+        effect on an image instantiated from a buffer. Previews are still
+        extracted as copies: libexiv2 does not tell where their data is in
+        the file.
+
+        Writing the metadata of an image read in mmap mode replaces the file
+        (see :meth:`write`).
+
+        Accessing a family of metadata that was not requested raises an
+        :exc:`IOError`, as if the metadata had not been read. Restricting the
+        families does not make reading faster: libexiv2 always parses all the
+        metadata embedded in the image (so that writing it back never loses
+        any of it), only the families accessed are converted to python types.
+
+        :param families: the families of metadata to make available (all
+                         of them are parsed regardless)
+        :type families: tuple of strings (``exif``, ``iptc``, ``xmp``)
+        :param mmap: whether to map the image file in memory
+        :type mmap: boolean
+
+        :raise ValueError: if a family is unknown
         """
-        if self.__image is None:
-            self.__image = self._instantiate_image(self.filename)
+        for family in families:
+            if family not in FAMILIES:
+                raise ValueError('Unknown metadata family: %s' % family)
+        if self.__image is None or \
+            (self.filename is not None and (mmap or self._in_memory)):
+            # The image data held in memory is re-read from the file.
+            if self.__image is not None:
+                self._keys = {'exif': None, 'iptc': None, 'xmp': None}
+                self._tags = {'exif': {}, 'iptc': {}, 'xmp': {}}
+                self._exif_thumbnail = None
+            self.__image = self._instantiate_image(self.filename, mmap)
         self.__image._readMetadata()
+        self._generation += 1
+        self._families = tuple(f for f in FAMILIES if f in families)
+
+    def _check_family(self, family):
+        # Raise an IOError if the given family of metadata was not read.
+        if family not in self._families:
+            raise IOError('%s metadata has not been read' % family.upper())
 
     def write(self, preserve_timestamps=False):
         """
         Write the metadata back to the image.
 
+        If the metadata was read in mmap mode, libexiv2 writes the updated
+        image to memory, and the file is replaced by a new one containing it
+        (if the path is a symbolic link, the file it points to is replaced).
+        The file therefore gets a new inode: it keeps its permissions, but not
+        its owner, extended attributes or other hard links, and a process that
+        has it open keeps seeing the former contents.
+
         :param preserve_timestamps: whether to preserve the file's original
                                     timestamps (access time and modification
                                     time)
         :type preserve_timestamps: boolean
         """
         self._image._writeMetadata()
+        self._generation += 1
         if self.filename is None:
             return
+        if self._in_memory:
+            self._write_mapped()
         if preserve_timestamps:
             # Revert to the original timestamps
             os.utime(self.filename, (self._atime, self._mtime))
@@ -128,6 +348,28 @@ class ImageMetadata(MutableMapping):
             self._atime = stat.st_atime
             self._mtime = stat.st_mtime
 
+    def _write_mapped(self):
+        # In mmap mode, the image copies the mapped data before libexiv2 writes
+        # the updated image to memory (TIFF-based images are patched in
+        # place), it no longer borrows the read-only mapping. Replace the file
+        # with the updated data, without truncating the file under the
+        # mapping. This happens on every write, the image data stays in
+        # memory.
+        filename = os.path.realpath(self.filename)
+        fd, path = tempfile.mkstemp(dir=os.path.dirname(filename))
+        try:
+            fileobj = os.fdopen(fd, 'wb')
+            try:
+                fileobj.write(self._image._getDataBuffer())
+            finally:
+                fileobj.close()
+            shutil.copymode(filename, path)
+            os.rename(path, filename)
+        except:
+            os.remove(path)
+            raise
+        self._mapping = None
+
     @property
     def dimensions(self):
         """A tuple containing the width and height of the image, expressed in
@@ -139,30 +381,148 @@ class ImageMetadata(MutableMapping):
         """The mime type of the image, as a string."""
         return self._image._getMimeType()
 
+    def _key_index(self, family):
+        # The index of the keys of a family of tags, loaded on first access.
+        self._check_family(family)
+        index = self._keys[family]
+        if index is None:
+            index = _KeyIndex(getattr(self._image, '_%sKeys' % family)())
+            self._keys[family] = index
+        return index
+
     @property
     def exif_keys(self):
         """List of the keys of the available EXIF tags."""
-        if self._keys['exif'] is None:
-            self._keys['exif'] = self._image._exifKeys()
-        return self._keys['exif']
+        return self._key_index('exif').tolist()
 
     @property
     def iptc_keys(self):
         """List of the keys of the available IPTC tags."""
+        return self._key_index('iptc').tolist()
+
+    @property
+    def iptc_key_counts(self):
+        """Dictionary mapping the keys of the available IPTC tags to their
+        number of repetitions."""
+        self._check_family('iptc')
+        key_counts = self._image._iptcKeyCounts()
         if self._keys['iptc'] is None:
-            self._keys['iptc'] = self._image._iptcKeys()
-        return self._keys['iptc']
+            self._keys['iptc'] = _KeyIndex(key for key, count in key_counts)
+        return dict(key_counts)
 
     @property
     def xmp_keys(self):
         """List of the keys of the available XMP tags."""
-        if self._keys['xmp'] is None:
-            self._keys['xmp'] = self._image._xmpKeys()
-        return self._keys['xmp']
+        return self._key_index('xmp').tolist()
+
+    def snapshot(self, families=None, keys=None):
+        """
+        Read the values of all the tags of the given families at once.
+
+        This costs only one call to libexiv2 per family, which is
+        significantly faster than iterating over the keys and accessing each
+        tag. The values are copies, modifying them does not modify the
+        metadata. A value that cannot be converted to a python type is
+        returned in its raw form.
+
+        If *keys* is given, only the values of those tags are read, in one
+        single call to libexiv2, and only them are converted to python types.
+        Keys of tags that are not set are absent from the result.
+
+        :param families: the families of metadata to read (by default, all
+                         the families passed to :meth:`.read`), ignored if
+                         *keys* is given
+        :type families: tuple of strings (``exif``, ``iptc``, ``xmp``)
+        :param keys: if not ``None``, read only the tags with those keys
+        :type keys: iterable of strings
+
+        :return: a dictionary mapping keys to values (of the same types as
+                 the ``value`` property of the corresponding tags)
+        :rtype: dict
+
+        :raise ValueError: if a family is unknown
+        :raise IOError: if a family was not read
+        """
+        if keys is not None:
+            return self._snapshot_keys(keys)
+        if families is None:
+            families = self._families
+        return dict((key, value) for family, key, value
+                    in self._snapshot_items(families))
+
+    def _snapshot_items(self, families):
+        # Generate the (family, key, value) triplets of all the tags of the
+        # given families, in order.
+        for family in families:
+            if family in FAMILIES:
+                self._check_family(family)
+            if family == 'exif':
+                keys, types, raw_values, byte_order = \
+                    self._image._exifSnapshot()
+                convert = _RawValueConverter(byte_order)
+            elif family == 'iptc':
+                keys, types, raw_values = self._image._iptcSnapshot()
+                convert = _iptc_values
+            elif family == 'xmp':
+                keys, types, raw_values = self._image._xmpSnapshot()
+                convert = _xmp_value
+            else:
+                raise ValueError('Unknown metadata family: %s' % family)
+            for key, type, raw_value in zip(keys, types, raw_values):
+                yield family, key, _snapshot_value(convert, type, raw_value)
+
+    def freeze(self, families=None):
+        """
+        Take an immutable copy of the values of all the tags of the given
+        families (see :class:`FrozenMetadata`).
+
+        The values are read the same way as with :meth:`.snapshot`.
+
+        :param families: the families of metadata to copy (by default, all
+                         the families passed to :meth:`.read`)
+        :type families: tuple of strings (``exif``, ``iptc``, ``xmp``)
+
+        :return: an immutable view of the metadata
+        :rtype: :class:`FrozenMetadata`
+
+        :raise ValueError: if a family is unknown
+        :raise IOError: if a family was not read
+        """
+        if families is None:
+            families = self._families
+        keys = dict((family, []) for family in families)
+        values = {}
+        for family, key, value in self._snapshot_items(families):
+            keys[family].append(key)
+            values[key] = _freeze(value)
+        return FrozenMetadata(keys, values, self.mime_type, self.dimensions,
+                              self.comment)
+
+    _tag_classes = {'exif': ExifTag, 'iptc': IptcTag, 'xmp': XmpTag}
+
+    def _snapshot_keys(self, keys):
+        # Read the values of the given tags in one call to libexiv2.
+        keys = list(keys)
+        for family in set(key.split('.')[0].lower() for key in keys):
+            if family not in FAMILIES:
+                raise ValueError('Unknown metadata family: %s' % family)
+            self._check_family(family)
+        snapshot = {}
+        if not keys:
+            return snapshot
+        keys, types, raw_values, byte_order = self._image._tagsSnapshot(keys)
+        converters = {'exif': _RawValueConverter(byte_order),
+                      'iptc': _iptc_values,
+                      'xmp': _xmp_value}
+        for key, type, raw_value in zip(keys, types, raw_values):
+            convert = converters[key.split('.')[0].lower()]
+            snapshot[key] = _snapshot_value(convert, type, raw_value)
+        return snapshot
 
     def _get_exif_tag(self, key):
         # Return the EXIF tag for the given key.
         # Throw a KeyError if the tag doesn't exist.
+        self._check_family('exif')
         try:
             return self._tags['exif'][key]
         except KeyError:
@@ -174,6 +534,7 @@ class ImageMetadata(MutableMapping):
     def _get_iptc_tag(self, key):
         # Return the IPTC tag for the given key.
         # Throw a KeyError if the tag doesn't exist.
+        self._check_family('iptc')
         try:
             return self._tags['iptc'][key]
         except KeyError:
@@ -185,6 +546,7 @@ class ImageMetadata(MutableMapping):
     def _get_xmp_tag(self, key):
         # Return the XMP tag for the given key.
         # Throw a KeyError if the tag doesn't exist.
+        self._check_family('xmp')
         try:
             return self._tags['xmp'][key]
         except KeyError:
@@ -212,6 +574,7 @@ class ImageMetadata(MutableMapping):
 
     def _set_exif_tag(self, key, tag_or_value):
         # Set an EXIF tag. If the tag already exists, its value is overwritten.
+        self._check_family('exif')
         if isinstance(tag_or_value, ExifTag):
             tag = tag_or_value
         else:
@@ -219,12 +582,12 @@ class ImageMetadata(MutableMapping):
             tag = ExifTag(key, tag_or_value)
         tag._set_owner(self)
         self._tags['exif'][tag.key] = tag
-        if tag.key not in self.exif_keys:
-            self._keys['exif'].append(tag.key)
+        self._key_index('exif').add(tag.key)
 
     def _set_iptc_tag(self, key, tag_or_values):
         # Set an IPTC tag. If the tag already exists, its values are
         # overwritten.
+        self._check_family('iptc')
         if isinstance(tag_or_values, IptcTag):
             tag = tag_or_values
         else:
@@ -232,11 +595,11 @@ class ImageMetadata(MutableMapping):
             tag = IptcTag(key, tag_or_values)
         tag._set_owner(self)
         self._tags['iptc'][tag.key] = tag
-        if tag.key not in self.iptc_keys:
-            self._keys['iptc'].append(tag.key)
+        self._key_index('iptc').add(tag.key)
 
     def _set_xmp_tag(self, key, tag_or_value):
         # Set an XMP tag. If the tag already exists, its value is overwritten.
+        self._check_family('xmp')
         if isinstance(tag_or_value, XmpTag):
             tag = tag_or_value
         else:
@@ -244,8 +607,7 @@ class ImageMetadata(MutableMapping):
             tag = XmpTag(key, tag_or_value)
         tag._set_owner(self)
         self._tags['xmp'][tag.key] = tag
-        if tag.key not in self.xmp_keys:
-            self._keys['xmp'].append(tag.key)
+        self._key_index('xmp').add(tag.key)
 
     def __setitem__(self, key, tag_or_value):
         """
@@ -272,10 +634,88 @@ class ImageMetadata(MutableMapping):
         else:
             raise KeyError(key)
 
+    def update(self, other=(), **kwds):
+        """
+        Set several metadata tags at once.
+        This is equivalent to setting each tag in turn with
+        :meth:`__setitem__`, but values are converted in bulk and written to
+        the image in a single native call, which is much faster when setting
+        many tags. Tags passed as tag objects rather than values are set one
+        at a time.
+
+        All the values are converted before any tag is set: if one of them is
+        invalid, an exception is raised and the metadata is left untouched.
+        Tags passed as tag objects are set in turn though, so if one of them
+        cannot be set, the tags that precede it remain set.
+
+        As with :meth:`dict.update`, tags may also be passed as keyword
+        arguments (e.g. ``update(**{'Exif.Image.Make': 'Canon'})``), they are
+        set after the ones in *other*, in the same batch.
+
+        :param other: a mapping of keys to tags or values, or an iterable of
+                      (key, tag or value) pairs
+        :type other: dict or iterable
+
+        :raise KeyError: if a key is invalid
+        """
+        if hasattr(other, 'keys'):
+            other = [(key, other[key]) for key in other.keys()]
+        other = chain(other, kwds.iteritems())
+        # The values between two tag objects, to preserve the order of the
+        # assignments.
+        batches = [[]]
+        assignments = []
+        for key, tag_or_value in other:
+            family = key.split('.')[0].lower()
+            if family not in FAMILIES:
+                raise KeyError(key)
+            self._check_family(family)
+            if tag_or_value is None or \
+                isinstance(tag_or_value, self._tag_classes[family]):
+                assignments.append((key, tag_or_value))
+                batches.append([])
+            else:
+                batches[-1].append((family, key, tag_or_value))
+        batches = [(items, self._convert_tags(items)) for items in batches]
+        self._set_tags(*batches[0])
+        for (key, tag), (items, tags) in zip(assignments, batches[1:]):
+            self[key] = tag
+            self._set_tags(items, tags)
+
+    def _convert_tags(self, items):
+        # Convert the values of (family, key, value) items to the raw values
+        # expected by Image::setTags(), without modifying the metadata.
+        tags = {'exif': [], 'iptc': [], 'xmp': []}
+        if not items:
+            return tags
+        types = libexiv2python._tagTypes([key for family, key, value in items])
+        for (family, key, value), (type, exiv2_type) in zip(items, types):
+            _tag = _PendingTag(key, type, exiv2_type)
+            # Let the tag class convert the value, through the stand-in.
+            self._tag_classes[family](key, value, _tag=_tag)
+            if family == 'exif':
+                tags[family].append((key, type, _tag.raw, _tag.binary))
+            else:
+                tags[family].append((key, _tag.raw))
+        return tags
+
+    def _set_tags(self, items, tags):
+        # Set the values of (family, key, value) items, converted by
+        # _convert_tags(), in one native call. Either all of them are set, or
+        # none of them is.
+        if not items:
+            return
+        self._image._setTags(tags['exif'], tags['iptc'], tags['xmp'])
+        for family, key, value in items:
+            # The tags are fetched from the image the next time they are
+            # accessed.
+            self._tags[family].pop(key, None)
+            self._key_index(family).add(key)
+
     def _delete_exif_tag(self, key):
         # Delete an EXIF tag.
         # Throw a KeyError if the tag doesn't exist.
-        if key not in self.exif_keys:
+        if key not in self._key_index('exif'):
             raise KeyError('Cannot delete an inexistent tag')
         self._image._deleteExifTag(key)
         try:
@@ -283,13 +723,12 @@ class ImageMetadata(MutableMapping):
         except KeyError:
             # The tag was not cached.
             pass
-        if self._keys['exif'] is not None:
-            self._keys['exif'].remove(key)
+        self._keys['exif'].remove(key)
 
     def _delete_iptc_tag(self, key):
         # Delete an IPTC tag.
         # Throw a KeyError if the tag doesn't exist.
-        if key not in self.iptc_keys:
+        if key not in self._key_index('iptc'):
             raise KeyError('Cannot delete an inexistent tag')
         self._image._deleteIptcTag(key)
         try:
@@ -297,13 +736,12 @@ class ImageMetadata(MutableMapping):
         except KeyError:
             # The tag was not cached.
             pass
-        if self._keys['iptc'] is not None:
-            self._keys['iptc'].remove(key)
+        self._keys['iptc'].remove(key)
 
     def _delete_xmp_tag(self, key):
         # Delete an XMP tag.
         # Throw a KeyError if the tag doesn't exist.
-        if key not in self.xmp_keys:
+        if key not in self._key_index('xmp'):
             raise KeyError('Cannot delete an inexistent tag')
         self._image._deleteXmpTag(key)
         try:
@@ -311,8 +749,7 @@ class ImageMetadata(MutableMapping):
         except KeyError:
             # The tag was not cached.
             pass
-        if self._keys['xmp'] is not None:
-            self._keys['xmp'].remove(key)
+        self._keys['xmp'].remove(key)
 
     def __delitem__(self, key):
         """
@@ -332,10 +769,11 @@ class ImageMetadata(MutableMapping):
             raise KeyError(key)
 
     def __iter__(self):
-        return chain(self.exif_keys, self.iptc_keys, self.xmp_keys)
+        return chain(*[self._key_index(family)
+                       for family in self._families])
 
     def __len__(self):
-        return len( [ x for x in self ] )
+        return sum(len(self._key_index(family)) for family in self._families)
 
     def _get_comment(self):
         return self._image._getComment()
@@ -355,8 +793,9 @@ class ImageMetadata(MutableMapping):
     @property
     def previews(self):
         """List of the previews available in the image, sorted by increasing
-        size."""
-        return [Preview(preview) for preview in self._image._previews()]
+        size. Their data is extracted on first access, which must happen
+        before the metadata is read or written again."""
+        return [Preview(preview, self) for preview in self._image._previews()]
 
     def copy(self, other, exif=True, iptc=True, xmp=True, comment=True):
         """
@@ -397,7 +836,11 @@ class ImageMetadata(MutableMapping):
         The image buffer as a string.
         If metadata has been modified, the data won't be up-to-date until
         :meth:`.write` has been called.
+        In mmap mode, this is a read-only :func:`buffer` over the mapping of
+        the image file instead, until the metadata is written back.
         """
+        if self._mapping is not None:
+            return buffer(self._mapping)
         return self._image._getDataBuffer()
 
     @property
@@ -439,3 +882,147 @@ class ImageMetadata(MutableMapping):
                             fdel=_del_iptc_charset,
                             doc='An optional character set the IPTC data is encoded in.')
 
+
+def _freeze(value):
+    # Return an immutable equivalent of a value.
+    if isinstance(value, (list, tuple)):
+        return tuple(value)
+    elif isinstance(value, dict):
+        return _FrozenDict(value)
+    else:
+        return value
+
+
+class _FrozenDict(dict):
+
+    """
+    A dictionary that cannot be modified, for the values of LangAlt tags in
+    a :class:`FrozenMetadata`.
+    """
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('%s is immutable' % self.__class__.__name__)
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = \
+        _immutable
+
+    def __hash__(self):
+        return hash(frozenset(self.iteritems()))
+
+    def __reduce__(self):
+        # Support for pickling.
+        return (self.__class__, (dict(self),))
+
+
+class FrozenMetadata(Mapping):
+
+    """
+    An immutable view of the metadata of an image, as returned by
+    :meth:`ImageMetadata.freeze`.
+
+    It maps the keys of the tags to their values (not to tag objects). The
+    values are immutable: lists of values are tuples, and the values of
+    LangAlt tags are read-only dictionaries. A frozen view does not hold any
+    reference to the image, it can be pickled, cached, and shared between
+    threads without locking.
+    """
+
+    def __init__(self, keys, values, mime_type=None, dimensions=None,
+                 comment=None):
+        """
+        :param keys: the ordered keys of the tags of each family copied
+        :type keys: dict mapping families to lists of keys
+        :param values: the values of the tags
+        :type values: dict mapping keys to values
+        :param mime_type: the mime type of the image
+        :type mime_type: string
+        :param dimensions: the width and height of the image
+        :type dimensions: tuple
+        :param comment: the image comment
+        :type comment: string
+        """
+        # Duplicate keys (e.g. repeated EXIF tags) map to a single value.
+        self._keys = dict((family, tuple(_KeyIndex(keys[family])))
+                          for family in keys)
+        self._values = values
+        self._mime_type = mime_type
+        self._dimensions = dimensions
+        self._comment = comment
+
+    @property
+    def families(self):
+        """The families of metadata copied, as a tuple."""
+        return tuple(family for family in FAMILIES if family in self._keys)
+
+    def _select(self, families):
+        # A view restricted to some of the families of metadata copied.
+        if set(families) == set(self._keys):
+            return self
+        keys = dict((family, self._get_keys(family)) for family in families)
+        values = dict((key, self._values[key])
+                      for family in keys for key in keys[family])
+        return FrozenMetadata(keys, values, self._mime_type,
+                              self._dimensions, self._comment)
+
+    def _get_keys(self, family):
+        try:
+            return self._keys[family]
+        except KeyError:
+            raise IOError('%s metadata has not been read' % family.upper())
+
+    @property
+    def exif_keys(self):
+        """Tuple of the keys of the available EXIF tags."""
+        return self._get_keys('exif')
+
+    @property
+    def iptc_keys(self):
+        """Tuple of the keys of the available IPTC tags."""
+        return self._get_keys('iptc')
+
+    @property
+    def xmp_keys(self):
+        """Tuple of the keys of the available XMP tags."""
+        return self._get_keys('xmp')
+
+    @property
+    def mime_type(self):
+        """The mime type of the image, as a string."""
+        return self._mime_type
+
+    @property
+    def dimensions(self):
+        """A tuple containing the width and height of the image, expressed in
+        pixels."""
+        return self._dimensions
+
+    @property
+    def comment(self):
+        """The image comment."""
+        return self._comment
+
+    def __getitem__(self, key):
+        """
+        Get the value of a tag.
+
+        :param key: metadata key in the dotted form
+                    ``familyName.groupName.tagName``
+        :type key: string
+
+        :return: the value of the tag
+
+        :raise KeyError: if the tag is not set
+        """
+        return self._values[key]
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __iter__(self):
+        return chain(*[self._keys[family] for family in self.families])
+
+    def __len__(self):
+        return sum(len(self._keys[family]) for family in self._keys)
+
+    def __repr__(self):
+        return '<%s: %d tags>' % (self.__class__.__name__, len(self))
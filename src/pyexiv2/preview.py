@@ -32,10 +32,25 @@ class Preview(object):
 
     """
     A preview image (properties and data buffer) embedded in image metadata.
+
+    Only the properties of the preview are read upfront, its data buffer is
+    extracted from the image on first access and kept afterwards. It has to
+    be extracted before the metadata is read or written again, as the
+    properties of the preview may then no longer match the image.
     """
 
-    def __init__(self, preview):
+    def __init__(self, preview, _metadata=None):
+        """
+        :param preview: the properties of the preview, or a preview that holds
+                        its own data buffer if no metadata is given
+        :param _metadata: the metadata the preview was extracted from
+        :type _metadata: :class:`pyexiv2.metadata.ImageMetadata`
+        """
         self.__preview = preview
+        self._metadata = _metadata
+        if _metadata is not None:
+            self._generation = _metadata._generation
+        self._data = None
 
     @property
     def mime_type(self):
@@ -59,10 +74,29 @@ class Preview(object):
         in pixels."""
         return self.__preview.dimensions
 
+    def _check_current(self):
+        # Raise an IOError if the metadata was read or written since the
+        # preview was extracted.
+        if self._metadata._generation != self._generation:
+            raise IOError('The metadata was read or written since the ' \
+                          'preview was extracted, get the previews again')
+
     @property
     def data(self):
-        """The preview image data buffer."""
-        return self.__preview.data
+        """The preview image data buffer (extracted from the image on first
+        access).
+
+        :raise IOError: if the data was not extracted before the metadata was
+                        read or written again
+        """
+        if self._data is None:
+            if self._metadata is None:
+                self._data = self.__preview.data
+            else:
+                self._check_current()
+                self._data = \
+                    self._metadata._image._getPreviewData(self.__preview)
+        return self._data
 
     def write_to_file(self, path):
         """
@@ -71,6 +105,19 @@ class Preview(object):
 
         :param path: path to write the preview to (without an extension)
         :type path: string
+
+        :raise IOError: if the data was not extracted before the metadata was
+                        read or written again
         """
-        return self.__preview.write_to_file(path)
+        if self._data is not None:
+            fileobj = open(path + self.extension, 'wb')
+            try:
+                fileobj.write(self._data)
+            finally:
+                fileobj.close()
+        elif self._metadata is None:
+            self.__preview.write_to_file(path)
+        else:
+            self._check_current()
+            self._metadata._image._writePreviewToFile(self.__preview, path)
 
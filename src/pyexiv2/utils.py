@@ -150,7 +150,7 @@ def undefined_to_string(undefined):
     """
     if undefined == '':
         return ''
-    return ''.join(map(lambda x: chr(int(x)), undefined.rstrip().split(' ')))
+    return str(bytearray(map(int, undefined.rstrip().split(' '))))
 
 
 def string_to_undefined(sequence):
@@ -166,7 +166,7 @@ def string_to_undefined(sequence):
     :return: the corresponding undefined string
     :rtype: string
     """
-    return ''.join(map(lambda x: '%d ' % ord(x), sequence)).rstrip()
+    return ' '.join(map(str, map(ord, sequence)))
 
 
 class Rational(object):
@@ -347,6 +347,8 @@ class ListenerInterface(object):
     should implement.
     """
 
+    __slots__ = ()
+
     def contents_changed(self):
         """
         React on changes on the object observed.
@@ -368,9 +370,12 @@ class NotifyingList(list):
     # file:///usr/share/doc/python2.5/html/lib/typesseq-mutable.html
     # http://docs.python.org/reference/datamodel.html#additional-methods-for-emulation-of-sequence-types
 
+    # The set of listeners is created only when the first one registers.
+    __slots__ = ('_listeners',)
+
     def __init__(self, items=[]):
         super(NotifyingList, self).__init__(items)
-        self._listeners = set()
+        self._listeners = None
 
     def register_listener(self, listener):
         """
@@ -379,6 +384,8 @@ class NotifyingList(list):
         :param listener: any object that listens for changes
         :type listener: :class:`ListenerInterface`
         """
+        if self._listeners is None:
+            self._listeners = set()
         self._listeners.add(listener)
 
     def unregister_listener(self, listener):
@@ -390,12 +397,20 @@ class NotifyingList(list):
 
         :raise KeyError: if the listener was not previously registered
         """
+        if self._listeners is None:
+            raise KeyError(listener)
         self._listeners.remove(listener)
 
     def _notify_listeners(self, *args):
+        if self._listeners is None:
+            return
         for listener in self._listeners:
             listener.contents_changed(*args)
 
+    def __reduce__(self):
+        # Support for pickling: only the items are pickled, not the listeners.
+        return (self.__class__, (list(self),))
+
     def __setitem__(self, index, item):
         # FIXME: support slice arguments for extended slicing
         super(NotifyingList, self).__setitem__(index, item)
@@ -93,6 +93,8 @@ class XmpTag(object):
     _time_re = r'(?P<hours>\d{2})(:(?P<minutes>\d{2})(:(?P<seconds>\d{2})(.(?P<decimal>\d+))?)?(?P<tzd>%s))?' % _time_zone_re
     _date_re = re.compile(r'(?P<year>\d{4})(-(?P<month>\d{2})(-(?P<day>\d{2})(T(?P<time>%s))?)?)?' % _time_re)
 
+    __slots__ = ('_tag', '_raw_value', '_value', '_value_cookie')
+
     def __init__(self, key, value=None, _tag=None):
         """
         The tag can be initialized with an optional value which expected type
@@ -184,25 +186,7 @@ class XmpTag(object):
 
     def _compute_value(self):
         # Lazy computation of the value from the raw value
-        if self.type.startswith(('seq', 'bag', 'alt')):
-            type = self.type[4:]
-            if type.lower().startswith('closed choice of'):
-                type = type[17:]
-            self._value = map(lambda x: self._convert_to_python(x, type), self._raw_value)
-        elif self.type == 'Lang Alt':
-            self._value = {}
-            for k, v in self._raw_value.iteritems():
-                try:
-                    self._value[unicode(k, 'utf-8')] = unicode(v, 'utf-8')
-                except TypeError:
-                    raise XmpValueError(self._raw_value, type)
-        elif self.type.lower().startswith('closed choice of'):
-            self._value = self._convert_to_python(self._raw_value, self.type[17:])
-        elif self.type == '':
-            self._value = self._raw_value
-        else:
-            self._value = self._convert_to_python(self._raw_value, self.type)
-
+        self._value = _value_from_raw(self.type, self._raw_value)
         self._value_cookie = False
 
     def _get_value(self):
@@ -244,7 +228,8 @@ class XmpTag(object):
                      doc='The value of the tag as a [list of] python ' \
                          'object(s).')
 
-    def _convert_to_python(self, value, type):
+    @staticmethod
+    def _convert_to_python(value, type):
         """
         Convert a raw value to its corresponding python type.
 
@@ -270,7 +255,7 @@ class XmpTag(object):
             raise NotImplementedError('XMP conversion for type [%s]' % type)
 
         elif type == 'Date':
-            match = self._date_re.match(value)
+            match = XmpTag._date_re.match(value)
             if match is None:
                 raise XmpValueError(value, type)
             gd = match.groupdict()
@@ -467,9 +452,35 @@ class XmpTag(object):
     def __setstate__(self, state):
         key, raw_value = state
         self._tag = libexiv2python._XmpTag(key)
+        self._value = None
         self.raw_value = raw_value
 
 
+def _value_from_raw(type, raw_value):
+    # Convert the raw value of a tag of the given XMP type to a python type.
+    # Also used outside of any tag, for the values of a snapshot of the
+    # metadata of an image (see pyexiv2.metadata.ImageMetadata.snapshot()).
+    if type.startswith(('seq', 'bag', 'alt')):
+        type = type[4:]
+        if type.lower().startswith('closed choice of'):
+            type = type[17:]
+        return [XmpTag._convert_to_python(x, type) for x in raw_value]
+    elif type == 'Lang Alt':
+        value = {}
+        for k, v in raw_value.iteritems():
+            try:
+                value[unicode(k, 'utf-8')] = unicode(v, 'utf-8')
+            except TypeError:
+                raise XmpValueError(raw_value, type)
+        return value
+    elif type.lower().startswith('closed choice of'):
+        return XmpTag._convert_to_python(raw_value, type[17:])
+    elif type == '':
+        return raw_value
+    else:
+        return XmpTag._convert_to_python(raw_value, type)
+
+
 def register_namespace(name, prefix):
     """
     Register a custom XMP namespace.
@@ -42,6 +42,10 @@ from utils import TestConversions, TestFractions
 from usercomment import TestUserCommentReadWrite, TestUserCommentAdd
 from pickling import TestPicklingTags
 from datetimeformatter import TestDateTimeFormatter
+from batch import TestBatchRead
+from cache import TestDiskCache, TestMetadataCache
+from header import TestProbe
+from aio import TestExecutor, TestAsyncReadWrite
 
 
 def run_unit_tests():
@@ -64,6 +68,12 @@ def run_unit_tests():
     suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestUserCommentAdd))
     suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestPicklingTags))
     suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestDateTimeFormatter))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestBatchRead))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestDiskCache))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestMetadataCache))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestProbe))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestExecutor))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(TestAsyncReadWrite))
     # Run the test suite
     return unittest.TextTestRunner(verbosity=2).run(suite)
 
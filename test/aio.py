@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+# ******************************************************************************
+#
+# Copyright (C) 2012 Olivier Tilloy <olivier@tilloy.net>
+#
+# This file is part of the pyexiv2 distribution.
+#
+# pyexiv2 is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# pyexiv2 is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyexiv2; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, 5th Floor, Boston, MA 02110-1301 USA.
+#
+# Author: Olivier Tilloy <olivier@tilloy.net>
+#
+# ******************************************************************************
+
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+import time
+import Queue
+
+from pyexiv2 import aio
+from pyexiv2.metadata import ImageMetadata
+
+import testutils
+
+
+class TestExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = aio.Executor(workers=1, max_pending=1)
+        # Blocks the only worker until set
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.executor.shutdown()
+
+    def _block(self):
+        # Block the worker, and wait for it to pick up the call.
+        future = self.executor.submit(self.release.wait)
+        while self.executor._pending > 0:
+            time.sleep(0.001)
+        return future
+
+    def test_submit(self):
+        future = self.executor.submit(pow, 2, 10)
+        self.assertEqual(future.result(), 1024)
+        self.assert_(future.done())
+        self.failIf(future.cancelled())
+        self.assertEqual(future.name, 'pow')
+        self.assert_(future.queue_time >= 0)
+        self.assert_(future.run_time >= 0)
+
+    def test_exception(self):
+        future = self.executor.submit(int, 'not a number')
+        self.assert_(isinstance(future.exception(), ValueError))
+        self.assertRaises(ValueError, future.result)
+
+    def test_cancel(self):
+        running = self._block()
+        pending = self.executor.submit(pow, 2, 10)
+        self.assert_(pending.cancel())
+        self.assert_(pending.cancelled())
+        self.assertRaises(aio.CallCancelledError, pending.result)
+        self.release.set()
+        running.result()
+        self.failIf(running.cancel())
+
+    def test_back_pressure(self):
+        self._block()
+        pending = self.executor.submit(pow, 2, 10)
+        # The queue is full, submitting fails without blocking.
+        self.assertRaises(Queue.Full, self.executor.submit, pow, 2, 10)
+        self.release.set()
+        pending.result()
+        self.assertEqual(self.executor.submit(pow, 2, 10).result(), 1024)
+
+    def test_done_callback(self):
+        done = []
+        future = self.executor.submit(self.release.wait)
+        future.add_done_callback(done.append)
+        self.assertEqual(done, [])
+        self.release.set()
+        future.result()
+        # The callbacks run once the result is available, wait for them.
+        self.executor.shutdown()
+        self.assertEqual(done, [future])
+        future.add_done_callback(done.append)
+        self.assertEqual(done, [future, future])
+
+    def test_on_latency(self):
+        reported = []
+        executor = aio.Executor(workers=2, max_pending=10,
+                                on_latency=reported.append)
+        futures = [executor.submit(pow, 2, i) for i in xrange(10)]
+        executor.shutdown()
+        self.assertEqual(sorted(reported), sorted(futures))
+
+    def test_shutdown(self):
+        running = self._block()
+        pending = self.executor.submit(pow, 2, 10)
+        self.executor.shutdown(wait=False, cancel_pending=True)
+        self.assert_(pending.cancelled())
+        self.release.set()
+        running.result()
+        self.assertRaises(RuntimeError, self.executor.submit, pow, 2, 10)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, aio.Executor, workers=0)
+        self.assertRaises(ValueError, aio.Executor, max_pending=0)
+
+
+class TestAsyncReadWrite(unittest.TestCase):
+
+    def setUp(self):
+        self.path = testutils.get_absolute_file_path(
+            os.path.join('data', 'smiley1.jpg'))
+        self.executor = aio.Executor(workers=2)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_read_async(self):
+        future = aio.read_async(self.path, executor=self.executor)
+        metadata = future.result()
+        self.assert_(isinstance(metadata, ImageMetadata))
+        self.assertEqual(metadata['Exif.Image.Software'].value, 'ImageReady')
+        self.assertEqual(future.name, 'read %s' % self.path)
+
+    def test_read_async_families(self):
+        future = aio.read_async(self.path, families=('xmp',),
+                                executor=self.executor)
+        metadata = future.result()
+        self.assertRaises(IOError, getattr, metadata, 'exif_keys')
+        self.assert_(len(metadata.xmp_keys) > 0)
+
+    def test_read_async_error(self):
+        future = aio.read_async('idontexist', executor=self.executor)
+        self.assertRaises(IOError, future.result)
+
+    def test_write_async(self):
+        fd, path = tempfile.mkstemp(suffix='.jpg')
+        os.close(fd)
+        try:
+            shutil.copy(self.path, path)
+            metadata = aio.read_async(path, executor=self.executor).result()
+            metadata['Exif.Image.Software'] = 'pyexiv2'
+            future = aio.write_async(metadata, executor=self.executor)
+            self.assertEqual(future.result(), None)
+            metadata = ImageMetadata(path)
+            metadata.read()
+            self.assertEqual(metadata['Exif.Image.Software'].value, 'pyexiv2')
+        finally:
+            os.remove(path)
+
+    def test_default_executor(self):
+        self.assert_(aio.default_executor() is aio.default_executor())
+        metadata = aio.read_async(self.path).result()
+        self.assert_('Exif.Image.Software' in metadata.exif_keys)
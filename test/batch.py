@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+# ******************************************************************************
+#
+# Copyright (C) 2012 Olivier Tilloy <olivier@tilloy.net>
+#
+# This file is part of the pyexiv2 distribution.
+#
+# pyexiv2 is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# pyexiv2 is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyexiv2; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, 5th Floor, Boston, MA 02110-1301 USA.
+#
+# Author: Olivier Tilloy <olivier@tilloy.net>
+#
+# ******************************************************************************
+
+import unittest
+import os.path
+
+from pyexiv2 import batch
+
+import testutils
+
+
+class TestBatchRead(unittest.TestCase):
+
+    def setUp(self):
+        filenames = ('smiley1.jpg', 'exiv2-bug540.jpg',
+                     'usercomment-ascii.jpg', 'pentax-makernote.jpg')
+        self.paths = [testutils.get_absolute_file_path(os.path.join('data', f))
+                      for f in filenames]
+
+    def test_read(self):
+        values = batch.read(self.paths[0])
+        self.assertEqual(values['Exif.Image.Software'], 'ImageReady')
+        self.assertEqual(values['Iptc.Application2.City'], ['Seattle'])
+
+    def test_read_keys(self):
+        keys = ['Exif.Image.Software', 'Iptc.Application2.City',
+                'Exif.Photo.Sharpness']
+        values = batch.read(self.paths[0], keys=keys)
+        self.assertEqual(values, {'Exif.Image.Software': 'ImageReady',
+                                  'Iptc.Application2.City': ['Seattle']})
+
+    def test_read_many_ordered(self):
+        paths = self.paths * 5
+        results = list(batch.read_many(paths, workers=3, ordered=True))
+        self.assertEqual([result.path for result in results], paths)
+        for result in results:
+            self.assert_(result.ok)
+            self.assertEqual(result.values, batch.read(result.path))
+
+    def test_read_many_unordered(self):
+        paths = self.paths * 5
+        results = list(batch.read_many(paths, workers=3))
+        self.assertEqual(sorted(result.path for result in results),
+                         sorted(paths))
+
+    def test_read_many_families(self):
+        for result in batch.read_many(self.paths, families=('xmp',)):
+            self.assert_(result.ok)
+            for key in result.values:
+                self.assert_(key.startswith('Xmp.'))
+
+    def test_read_many_errors(self):
+        paths = [self.paths[0], 'idontexist', self.paths[1]]
+        results = list(batch.read_many(paths, workers=2, ordered=True))
+        self.assertEqual(len(results), 3)
+        self.assert_(results[0].ok)
+        self.failIf(results[1].ok)
+        self.assert_(isinstance(results[1].error, IOError))
+        self.assertEqual(results[1].values, None)
+        self.assert_(results[2].ok)
+
+    def test_read_many_lazy_input(self):
+        def paths():
+            while True:
+                yield self.paths[0]
+        results = batch.read_many(paths(), workers=2)
+        for i in xrange(10):
+            self.assert_(results.next().ok)
+        results.close()
+
+    def test_read_many_invalid_parameters(self):
+        self.failUnlessRaises(ValueError, batch.read_many, self.paths,
+                              workers=0)
+        self.failUnlessRaises(ValueError, batch.read_many, self.paths,
+                              processes=True, chunksize=0)
+
+    def test_read_many_processes(self):
+        paths = self.paths * 5 + ['idontexist']
+        results = list(batch.read_many(paths, workers=2, ordered=True,
+                                       processes=True, chunksize=3))
+        self.assertEqual([result.path for result in results], paths)
+        for result in results[:-1]:
+            self.assert_(result.ok)
+            self.assertEqual(result.values, batch.read(result.path))
+        self.failIf(results[-1].ok)
+        self.assert_(isinstance(results[-1].error, IOError))
+
+    def test_read_many_processes_lazy_input(self):
+        consumed = []
+        def paths():
+            while True:
+                consumed.append(None)
+                yield self.paths[0]
+        results = batch.read_many(paths(), workers=2, processes=True,
+                                  chunksize=2)
+        for i in xrange(20):
+            self.assert_(results.next().ok)
+        # The paths are consumed as the results are, within the bound.
+        self.assert_(len(consumed) <= 20 + 2 * 2 * 4 + 1)
+        results.close()
+
+    def test_read_many_processes_keys(self):
+        keys = ['Exif.Image.Software', 'Xmp.dc.creator']
+        results = batch.read_many(self.paths[:2], keys=keys, processes=True)
+        values = {}
+        for result in results:
+            values.update(result.values)
+        self.assertEqual(values, {'Exif.Image.Software': 'ImageReady',
+                                  'Xmp.dc.creator': [u'Ian Britton']})
@@ -26,7 +26,11 @@
 
 import unittest
 import os.path
+import shutil
+import tempfile
 import hashlib
+import mmap
+from StringIO import StringIO
 from datetime import datetime
 
 from pyexiv2.metadata import ImageMetadata
@@ -34,6 +38,26 @@ from pyexiv2.metadata import ImageMetadata
 import testutils
 
 
+class CountingFile(StringIO):
+
+    # A file object that counts the bytes read from it.
+
+    def __init__(self, data):
+        StringIO.__init__(self, data)
+        self.bytes_read = 0
+
+    def read(self, n=-1):
+        data = StringIO.read(self, n)
+        self.bytes_read += len(data)
+        return data
+
+
+class FailingFile(StringIO):
+
+    def read(self, n=-1):
+        raise ZeroDivisionError()
+
+
 class TestBuffer(unittest.TestCase):
 
     def setUp(self):
@@ -42,11 +66,14 @@ class TestBuffer(unittest.TestCase):
         self.md5sum = 'c066958457c685853293058f9bf129c1'
         self.assert_(testutils.CheckFileSum(self.filepath, self.md5sum))
 
-    def _metadata_from_buffer(self):
+    def _read_data(self):
         fd = open(self.filepath, 'rb')
         data = fd.read()
         fd.close()
-        return ImageMetadata.from_buffer(data)
+        return data
+
+    def _metadata_from_buffer(self):
+        return ImageMetadata.from_buffer(self._read_data())
 
     def test_from_file_and_from_buffer(self):
         # from file
@@ -89,3 +116,193 @@ class TestBuffer(unittest.TestCase):
         m2.read()
         self.assertEqual(m2[key].value, value)
 
+
+    def test_from_buffer_no_copy(self):
+        for data in (self._read_data(), bytearray(self._read_data()),
+                     memoryview(self._read_data())):
+            m = ImageMetadata.from_buffer(data, copy=False)
+            m.read()
+            self.assertEqual(hashlib.md5(m.buffer).hexdigest(), self.md5sum)
+            self.assertEqual(m['Exif.Image.Software'].value, 'ImageReady')
+
+    def test_from_invalid_buffer_releases_it(self):
+        for copy in (True, False):
+            data = bytearray('not an image')
+            self.failUnlessRaises(IOError, ImageMetadata.from_buffer, data,
+                                  copy)
+            # The buffer is no longer exported, it can be resized.
+            data.extend(' either')
+            self.assertEqual(data, 'not an image either')
+
+    def test_from_mmap_no_copy(self):
+        fd = open(self.filepath, 'rb')
+        data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        m = ImageMetadata.from_buffer(data, copy=False)
+        # No view can be held on an mmap, the image copies its data, which
+        # can be closed right away.
+        data.close()
+        fd.close()
+        m.read()
+        self.assertEqual(hashlib.md5(m.buffer).hexdigest(), self.md5sum)
+
+    def test_write_does_not_modify_borrowed_buffer(self):
+        data = bytearray(self._read_data())
+        m = ImageMetadata.from_buffer(data, copy=False)
+        m.read()
+        key = 'Exif.Image.ImageDescription'
+        value = 'my kingdom for a semiquaver'
+        m[key] = value
+        m.write()
+        self.assertEqual(hashlib.md5(data).hexdigest(), self.md5sum)
+        self.failIfEqual(hashlib.md5(m.buffer).hexdigest(), self.md5sum)
+
+        m2 = ImageMetadata.from_buffer(m.buffer, copy=False)
+        m2.read()
+        self.assertEqual(m2[key].value, value)
+
+    def test_write_does_not_modify_borrowed_tiff(self):
+        # libexiv2 patches TIFF images in place when the values fit.
+        data = testutils.make_tiff_data('a description')
+        original = str(bytearray(data))
+        m = ImageMetadata.from_buffer(data, copy=False)
+        m.read()
+        key = 'Exif.Image.ImageDescription'
+        m[key] = 'another one!!'
+        m.write()
+        self.assertEqual(data, original)
+        m2 = ImageMetadata.from_buffer(m.buffer)
+        m2.read()
+        self.assertEqual(m2[key].value, 'another one!!')
+
+    def test_from_fileobj(self):
+        fd = open(self.filepath, 'rb')
+        m = ImageMetadata.from_fileobj(fd)
+        m.read()
+        self.assertEqual(m['Exif.Image.Software'].value, 'ImageReady')
+        self.assertEqual(m.mime_type, 'image/jpeg')
+        self.assertEqual(hashlib.md5(m.buffer).hexdigest(), self.md5sum)
+        del m
+        fd.close()
+
+    def test_from_fileobj_reads_headers_only(self):
+        filepath = testutils.get_absolute_file_path(
+            os.path.join('data', 'pentax-makernote.jpg'))
+        data = open(filepath, 'rb').read()
+        fileobj = CountingFile(data)
+        m = ImageMetadata.from_fileobj(fileobj)
+        m.read()
+        reference = ImageMetadata(filepath)
+        reference.read()
+        self.assertEqual(m.exif_keys, reference.exif_keys)
+        self.assert_(fileobj.bytes_read < len(data) / 2)
+
+    def test_from_fileobj_write(self):
+        fileobj = CountingFile(self._read_data())
+        m = ImageMetadata.from_fileobj(fileobj)
+        m.read()
+        key = 'Exif.Image.ImageDescription'
+        value = 'my kingdom for a semiquaver'
+        m[key] = value
+        m.write()
+        self.assertEqual(hashlib.md5(fileobj.getvalue()).hexdigest(),
+                         self.md5sum)
+
+        m2 = ImageMetadata.from_buffer(m.buffer)
+        m2.read()
+        self.assertEqual(m2[key].value, value)
+
+    def test_from_fileobj_error(self):
+        fileobj = FailingFile(self._read_data())
+        self.failUnlessRaises(ZeroDivisionError,
+                              ImageMetadata.from_fileobj, fileobj)
+
+    def test_read_mmap(self):
+        m = ImageMetadata(self.filepath)
+        m.read(mmap=True)
+        self.assertEqual(m['Exif.Image.Software'].value, 'ImageReady')
+        self.assertEqual(hashlib.md5(m.buffer).hexdigest(), self.md5sum)
+
+    def test_read_mmap_write(self):
+        fd, filepath = tempfile.mkstemp(suffix='.jpg')
+        os.close(fd)
+        shutil.copy(self.filepath, filepath)
+        try:
+            m = ImageMetadata(filepath)
+            m.read(mmap=True)
+            key = 'Exif.Image.ImageDescription'
+            value = 'my kingdom for a semiquaver'
+            m[key] = value
+            m.write()
+            self.assertEqual(m.buffer, open(filepath, 'rb').read())
+
+            m2 = ImageMetadata(filepath)
+            m2.read(mmap=True)
+            self.assertEqual(m2[key].value, value)
+        finally:
+            os.remove(filepath)
+
+    def test_read_mmap_write_twice(self):
+        fd, filepath = tempfile.mkstemp(suffix='.jpg')
+        os.close(fd)
+        shutil.copy(self.filepath, filepath)
+        try:
+            m = ImageMetadata(filepath)
+            m.read(mmap=True)
+            key = 'Exif.Image.ImageDescription'
+            m[key] = 'first'
+            m.write()
+            m[key] = 'second'
+            m.write()
+            self.assertEqual(m.buffer, open(filepath, 'rb').read())
+
+            m2 = ImageMetadata(filepath)
+            m2.read()
+            self.assertEqual(m2[key].value, 'second')
+            # Reading again maps the new contents of the file
+            m[key] = 'not written'
+            m.read(mmap=True)
+            self.assertEqual(m[key].value, 'second')
+        finally:
+            os.remove(filepath)
+
+    def test_read_mmap_write_tiff(self):
+        # libexiv2 patches TIFF images in place when the values fit, it must
+        # not write to the read-only mapping.
+        fd, filepath = tempfile.mkstemp(suffix='.tif')
+        os.write(fd, testutils.make_tiff_data('a description'))
+        os.close(fd)
+        try:
+            m = ImageMetadata(filepath)
+            m.read(mmap=True)
+            key = 'Exif.Image.ImageDescription'
+            self.assertEqual(m[key].value, 'a description')
+            m[key] = 'another one!!'
+            m.write()
+            self.assertEqual(m.buffer, open(filepath, 'rb').read())
+            m[key] = 'and a third'
+            m.write()
+
+            m2 = ImageMetadata(filepath)
+            m2.read()
+            self.assertEqual(m2[key].value, 'and a third')
+        finally:
+            os.remove(filepath)
+
+    def test_read_mmap_write_symlink(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filepath = os.path.join(directory, 'image.jpg')
+            linkpath = os.path.join(directory, 'link.jpg')
+            shutil.copy(self.filepath, filepath)
+            os.symlink(filepath, linkpath)
+            m = ImageMetadata(linkpath)
+            m.read(mmap=True)
+            key = 'Exif.Image.ImageDescription'
+            m[key] = 'through a link'
+            m.write()
+            self.assert_(os.path.islink(linkpath))
+            m2 = ImageMetadata(filepath)
+            m2.read()
+            self.assertEqual(m2[key].value, 'through a link')
+        finally:
+            shutil.rmtree(directory)
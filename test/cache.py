@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+
+# ******************************************************************************
+#
+# Copyright (C) 2012 Olivier Tilloy <olivier@tilloy.net>
+#
+# This file is part of the pyexiv2 distribution.
+#
+# pyexiv2 is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# pyexiv2 is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyexiv2; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, 5th Floor, Boston, MA 02110-1301 USA.
+#
+# Author: Olivier Tilloy <olivier@tilloy.net>
+#
+# ******************************************************************************
+
+import unittest
+import datetime
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+from pyexiv2 import cache
+from pyexiv2.cache import DiskCache, MetadataCache
+from pyexiv2.metadata import ImageMetadata, FrozenMetadata, _FrozenDict
+from pyexiv2.utils import FixedOffset, GPSCoordinate, make_fraction
+
+import testutils
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.paths = []
+        for filename in ('smiley1.jpg', 'exiv2-bug540.jpg'):
+            path = os.path.join(self.directory, filename)
+            shutil.copy(testutils.get_absolute_file_path(
+                os.path.join('data', filename)), path)
+            self.paths.append(path)
+        self.cache = DiskCache(os.path.join(self.directory, 'cache'))
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.directory)
+
+    def test_read(self):
+        self.assertEqual(self.cache.get(self.paths[0]), None)
+        frozen = self.cache.read(self.paths[0])
+        self.assertEqual(frozen['Exif.Image.Software'], 'ImageReady')
+        self.assertEqual(len(self.cache), 1)
+        cached = self.cache.get(self.paths[0])
+        self.assertEqual(dict(cached), dict(frozen))
+        self.assertEqual(list(cached), list(frozen))
+        self.assertEqual(cached.comment, frozen.comment)
+
+    def test_persistent(self):
+        self.cache.read(self.paths[0])
+        self.cache.close()
+        self.cache = DiskCache(os.path.join(self.directory, 'cache'))
+        self.failIfEqual(self.cache.get(self.paths[0]), None)
+
+    def test_families(self):
+        self.cache.read(self.paths[0], families=('exif',))
+        self.assertEqual(self.cache.get(self.paths[0], ('iptc',)), None)
+        frozen = self.cache.read(self.paths[0], families=('exif', 'iptc'))
+        self.assertEqual(frozen.families, ('exif', 'iptc'))
+        frozen = self.cache.get(self.paths[0], ('iptc',))
+        self.assertEqual(frozen.families, ('iptc',))
+        self.assertEqual(frozen['Iptc.Application2.City'], ('Seattle',))
+
+    def test_invalidate_on_write(self):
+        self.cache.read(self.paths[0])
+        metadata = ImageMetadata(self.paths[0])
+        metadata.read()
+        metadata['Exif.Image.Software'] = 'pyexiv2'
+        metadata.write(preserve_timestamps=True)
+        self.assertEqual(self.cache.get(self.paths[0]), None)
+        frozen = self.cache.read(self.paths[0])
+        self.assertEqual(frozen['Exif.Image.Software'], 'pyexiv2')
+
+    def test_invalidate(self):
+        self.cache.read(self.paths[0])
+        self.cache.invalidate(self.paths[0])
+        self.assertEqual(self.cache.get(self.paths[0]), None)
+        self.cache.read(self.paths[0])
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+    def test_evict_items(self):
+        self.cache.max_items = 1
+        self.cache.read(self.paths[0])
+        self.cache.read(self.paths[1])
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.get(self.paths[0]), None)
+        self.failIfEqual(self.cache.get(self.paths[1]), None)
+
+    def test_evict_bytes(self):
+        self.cache.max_bytes = 0
+        self.cache.read(self.paths[0])
+        self.assertEqual(len(self.cache), 0)
+
+    def test_read_errors(self):
+        self.failUnlessRaises(OSError, self.cache.read, 'idontexist')
+        self.failUnlessRaises(ValueError, self.cache.read, self.paths[0],
+                              ('bleh',))
+
+    def test_serialization(self):
+        values = {'Exif.Image.Make': 'Canon',
+                  'Exif.Photo.MakerNote': '\x00\xff\x80',
+                  'Exif.Image.XResolution': make_fraction(72, 1),
+                  'Exif.Image.BitsPerSample': (8, 8, 8),
+                  'Exif.Photo.ExposureBiasValue': 0.5,
+                  'Exif.Image.DateTime': datetime.datetime(2009, 2, 9, 13, 33),
+                  'Iptc.Application2.DateCreated': (datetime.date(2004, 7, 13),),
+                  'Iptc.Application2.TimeCreated':
+                      (datetime.time(12, 30, 0, 0, FixedOffset('-', 5, 30)),),
+                  'Xmp.dc.title': _FrozenDict({'x-default': u'Title \xe9'}),
+                  'Xmp.exif.GPSLatitude': GPSCoordinate(48, 51, 30, 'N'),
+                  'Xmp.xmp.Rating': None}
+        keys = {'exif': [key for key in values if key.startswith('Exif')],
+                'iptc': [key for key in values if key.startswith('Iptc')],
+                'xmp': [key for key in values if key.startswith('Xmp')]}
+        frozen = FrozenMetadata(keys, values, 'image/jpeg', (640, 480), u'\xe9')
+        loaded = cache._loads(cache._dumps(frozen))
+        self.assertEqual(dict(loaded), values)
+        self.assertEqual(list(loaded), list(frozen))
+        self.assertEqual(loaded.mime_type, 'image/jpeg')
+        self.assertEqual(loaded.dimensions, (640, 480))
+        self.assertEqual(loaded.comment, u'\xe9')
+        self.assertEqual(loaded['Iptc.Application2.TimeCreated'][0].utcoffset(),
+                         datetime.timedelta(hours=-5, minutes=-30))
+        self.assert_(isinstance(loaded['Xmp.dc.title'], _FrozenDict))
+
+        frozen = FrozenMetadata({'exif': ['Exif.Image.Make']},
+                                {'Exif.Image.Make': object()})
+        self.assertRaises(TypeError, cache._dumps, frozen)
+
+    def test_reject_pickle(self):
+        # Pickled data is never loaded, even when it is in the database.
+        self.cache.read(self.paths[0])
+        connection = sqlite3.connect(self.cache.filename)
+        connection.execute('UPDATE metadata SET data = ?', (sqlite3.Binary(
+            pickle.dumps(FrozenMetadata({}, {}), pickle.HIGHEST_PROTOCOL)),))
+        connection.commit()
+        connection.close()
+        self.assertEqual(self.cache.get(self.paths[0]), None)
+        frozen = self.cache.read(self.paths[0])
+        self.assertEqual(frozen['Exif.Image.Software'], 'ImageReady')
+        self.failIfEqual(self.cache.get(self.paths[0]), None)
+
+
+class TestMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.paths = []
+        for filename in ('smiley1.jpg', 'exiv2-bug540.jpg'):
+            path = os.path.join(self.directory, filename)
+            shutil.copy(testutils.get_absolute_file_path(
+                os.path.join('data', filename)), path)
+            self.paths.append(path)
+        # Count the actual reads
+        self.reads = []
+        self._read = cache._read
+        def read(path, families):
+            self.reads.append(path)
+            return self._read(path, families)
+        cache._read = read
+        self.cache = MetadataCache()
+
+    def tearDown(self):
+        cache._read = self._read
+        shutil.rmtree(self.directory)
+
+    def test_read(self):
+        frozen = self.cache.read(self.paths[0])
+        self.assertEqual(frozen['Exif.Image.Software'], 'ImageReady')
+        self.assert_(self.cache.read(self.paths[0]) is frozen)
+        self.assertEqual(self.cache.read(self.paths[0], ('iptc',)).families,
+                         ('iptc',))
+        self.assertEqual(len(self.reads), 1)
+        self.assertEqual(len(self.cache), 1)
+        self.assert_(self.cache.size > 0)
+
+    def test_invalidate_on_write(self):
+        self.cache.read(self.paths[0])
+        metadata = ImageMetadata(self.paths[0])
+        metadata.read()
+        metadata['Exif.Image.Software'] = 'pyexiv2'
+        metadata.write(preserve_timestamps=True)
+        frozen = self.cache.read(self.paths[0])
+        self.assertEqual(frozen['Exif.Image.Software'], 'pyexiv2')
+        self.assertEqual(len(self.reads), 2)
+
+    def test_invalidate(self):
+        self.cache.read(self.paths[0])
+        self.cache.invalidate(self.paths[0])
+        self.assertEqual(len(self.cache), 0)
+        self.cache.read(self.paths[0])
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.size, 0)
+        self.assertEqual(len(self.reads), 2)
+
+    def test_evict(self):
+        self.cache.max_items = 1
+        self.cache.read(self.paths[0])
+        self.cache.read(self.paths[1])
+        self.assertEqual(len(self.cache), 1)
+        self.cache.read(self.paths[1])
+        self.cache.read(self.paths[0])
+        self.assertEqual(len(self.reads), 3)
+        self.cache.max_bytes = 0
+        self.cache.read(self.paths[1])
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.size, 0)
+
+    def test_coalesce_reads(self):
+        results = []
+        def read():
+            results.append(self.cache.read(self.paths[0]))
+        threads = [threading.Thread(target=read) for i in xrange(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 8)
+        for frozen in results:
+            self.assert_(frozen is results[0])
+        self.assertEqual(len(self.reads), 1)
+
+    def test_read_errors(self):
+        self.failUnlessRaises(OSError, self.cache.read, 'idontexist')
+        self.failUnlessRaises(ValueError, self.cache.read, self.paths[0],
+                              ('bleh',))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_read_interrupted(self):
+        # An interruption of the read (not an Exception) reaches the threads
+        # waiting for it too.
+        class Interrupt(BaseException):
+            pass
+        entered = threading.Event()
+        waiting = threading.Event()
+        release = threading.Event()
+        def read(path, families):
+            entered.set()
+            release.wait()
+            raise Interrupt()
+        cache._read = read
+        errors = []
+        def target():
+            try:
+                self.cache.read(self.paths[0])
+            except Interrupt, error:
+                errors.append(error)
+        reader = threading.Thread(target=target)
+        reader.start()
+        entered.wait()
+        done = self.cache._pending[self.paths[0]].done
+        done_wait = done.wait
+        def wait(*args):
+            waiting.set()
+            return done_wait(*args)
+        done.wait = wait
+        waiter = threading.Thread(target=target)
+        waiter.start()
+        waiting.wait()
+        release.set()
+        reader.join()
+        waiter.join()
+        self.assertEqual(len(errors), 2)
+        self.assert_(errors[0] is errors[1])
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache._pending, {})
@@ -26,7 +26,7 @@
 
 import unittest
 
-from pyexiv2.exif import ExifTag, ExifValueError
+from pyexiv2.exif import ExifTag, ExifValueError, _RawValueConverter
 from pyexiv2.metadata import ImageMetadata
 from pyexiv2.utils import make_fraction
 
@@ -327,12 +327,72 @@ class TestExifTag(unittest.TestCase):
         # Invalid values
         self.failUnlessRaises(ExifValueError, tag._convert_to_string, 3)
 
+    def test_undefined_bytes(self):
+        tag = ExifTag('Exif.Photo.MakerNote', '\x00\x01\xfe\xff')
+        self.assertEqual(tag.type, 'Undefined')
+        self.assertEqual(tag.raw_value, '0 1 254 255')
+        tag.raw_value = '48 49 48 48'
+        self.assertEqual(tag.value, '0100')
+        tag.value = u'0221'
+        self.assertEqual(tag.raw_value, '48 50 50 49')
+        self.failUnlessRaises(ExifValueError, setattr, tag, 'value', 3)
+
     def test_set_value(self):
         tag = ExifTag('Exif.Thumbnail.Orientation', 1) # top, left
         old_value = tag.value
         tag.value = 2
         self.failIfEqual(tag.value, old_value)
 
+    def test_multiple_values(self):
+        tag = ExifTag('Exif.Image.TransferFunction', range(256))
+        self.assertEqual(tag.type, 'Short')
+        self.assertEqual(tag.raw_value, ' '.join(map(str, range(256))))
+        tag.raw_value = '1 2 3'
+        self.assertEqual(tag.value, [1, 2, 3])
+        tag.raw_value = '1 foo 3'
+        self.failUnlessRaises(ExifValueError, getattr, tag, 'value')
+        self.failUnlessRaises(ExifValueError, setattr, tag, 'value', [1, -2])
+
+    def test_multiple_rational_values(self):
+        tag = ExifTag('Exif.GPSInfo.GPSLatitude')
+        self.assertEqual(tag.type, 'Rational')
+        tag.raw_value = '48/1 51/1 2437/100'
+        self.assertEqual(tag.value, [make_fraction(48, 1), make_fraction(51, 1),
+                                     make_fraction(2437, 100)])
+        tag.raw_value = '48/1 51/1 2437/0'
+        self.failUnlessRaises(ExifValueError, getattr, tag, 'value')
+
+    def test_numeric_values_without_raw_value(self):
+        # The value of a numeric tag read from an image is decoded from its
+        # components, libexiv2 does not format it to a string.
+        class _Tag(object):
+            def __init__(self, type, numbers):
+                self.type = type
+                self.numbers = numbers
+                self.raw_value_calls = 0
+            def _getKey(self):
+                return 'Exif.Image.StripOffsets'
+            def _getType(self):
+                return self.type
+            def _getNumericValues(self):
+                return self.numbers
+            def _getRawValue(self):
+                self.raw_value_calls += 1
+                return ' '.join(map(str, self.numbers))
+        _tag = _Tag('Short', [1])
+        tag = ExifTag._from_existing_tag(_tag)
+        self.assertEqual(tag.value, 1)
+        _tag = _Tag('Rational', [(72, 1)])
+        tag = ExifTag._from_existing_tag(_tag)
+        self.assertEqual(tag.value, make_fraction(72, 1))
+        _tag = _Tag('Long', [8L, 1024L, 2048L])
+        tag = ExifTag._from_existing_tag(_tag)
+        self.assertEqual(tag.value, [8L, 1024L, 2048L])
+        self.assertEqual(_tag.raw_value_calls, 0)
+        # The raw value is still available on demand.
+        self.assertEqual(tag.raw_value, '8 1024 2048')
+        self.assertEqual(_tag.raw_value_calls, 1)
+
     def test_set_raw_value_invalid(self):
         tag = ExifTag('Exif.GPSInfo.GPSVersionID')
         value = '2 0 0 foo'
@@ -363,3 +423,16 @@ class TestExifTag(unittest.TestCase):
         self.assertEqual(tag2.type, 'Long')
         self.assertEqual(tag2.value, [76830L, 20070527L, 2L, 1L, 4228109L])
 
+    def test_raw_value_converter(self):
+        # Values of a snapshot are converted without any tag.
+        convert = _RawValueConverter(1)
+        self.assertEqual(convert('Short', '640 480'), [640, 480])
+        self.assertEqual(convert('Short', '8'), 8)
+        self.assertEqual(convert('SRational', '-5/3'), make_fraction(-5, 3))
+        self.assertEqual(convert('Ascii', '2009:03:01 12:46:51'),
+                         datetime.datetime(2009, 3, 1, 12, 46, 51))
+        self.assertEqual(convert('Comment', 'charset="Ascii" A comment'),
+                         'A comment')
+        self.assertEqual(convert('Undefined', '48 49 48 48'), '0100')
+        self.failUnlessRaises(ExifValueError, convert, 'Short', 'abc')
+        self.failUnlessRaises(ExifValueError, convert, 'Unknown', 'abc')
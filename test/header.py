@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+# ******************************************************************************
+#
+# Copyright (C) 2012 Olivier Tilloy <olivier@tilloy.net>
+#
+# This file is part of the pyexiv2 distribution.
+#
+# pyexiv2 is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# pyexiv2 is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyexiv2; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, 5th Floor, Boston, MA 02110-1301 USA.
+#
+# Author: Olivier Tilloy <olivier@tilloy.net>
+#
+# ******************************************************************************
+
+
+import unittest
+import struct
+
+from pyexiv2 import header
+from pyexiv2.header import probe
+from pyexiv2.metadata import ImageMetadata
+
+import testutils
+
+
+class TestProbe(unittest.TestCase):
+
+    FILES = ('smiley1.jpg', 'exiv2-bug540.jpg', 'pentax-makernote.jpg',
+             'empty.jpg')
+
+    def _read(self, filename):
+        filepath = testutils.get_absolute_file_path(filename)
+        metadata = ImageMetadata(filepath)
+        metadata.read()
+        return filepath, (metadata.mime_type,) + metadata.dimensions
+
+    def test_jpeg_file(self):
+        for filename in self.FILES:
+            filepath, expected = self._read('data/' + filename)
+            self.assertEqual(probe(filepath), expected)
+
+    def test_jpeg_buffer(self):
+        for filename in self.FILES:
+            filepath, expected = self._read('data/' + filename)
+            data = open(filepath, 'rb').read()
+            self.assertEqual(probe(buffer(data)), expected)
+            self.assertEqual(probe(bytearray(data)), expected)
+
+    def test_jpeg_truncated_after_frame_header(self):
+        # Only the headers up to the frame header are read.
+        filepath, expected = self._read('data/smiley1.jpg')
+        data = open(filepath, 'rb').read()
+        offset = 2
+        while data[offset + 1] not in '\xc0\xc1\xc2':
+            offset += 2 + struct.unpack('>H', data[offset + 2:offset + 4])[0]
+        self.assertEqual(probe(buffer(data[:offset + 9])), expected)
+
+    def test_png(self):
+        data = '\x89PNG\r\n\x1a\n' + struct.pack('>I4sII', 13, 'IHDR', 640, 480)
+        self.assertEqual(probe(buffer(data)), ('image/png', 640, 480))
+
+    def test_gif(self):
+        data = 'GIF89a' + struct.pack('<HH', 320, 200)
+        self.assertEqual(probe(buffer(data)), ('image/gif', 320, 200))
+
+    def test_bmp(self):
+        data = 'BM' + '\x00' * 16 + struct.pack('<ii', 100, -50)
+        self.assertEqual(probe(buffer(data)), ('image/x-ms-bmp', 100, 50))
+
+    def test_tiff(self):
+        for order, magic in (('<', 'II*\x00'), ('>', 'MM\x00*')):
+            data = magic + struct.pack(order + 'IH', 8, 2) + \
+                   struct.pack(order + 'HHIHH', 256, 3, 1, 1024, 0) + \
+                   struct.pack(order + 'HHII', 257, 4, 1, 768) + \
+                   struct.pack(order + 'I', 0)
+            self.assertEqual(probe(buffer(data)), ('image/tiff', 1024, 768))
+
+    def test_tiff_with_make(self):
+        # A camera or scanner TIFF image is not RAW.
+        for order, magic in (('<', 'II*\x00'), ('>', 'MM\x00*')):
+            data = magic + struct.pack(order + 'IH', 8, 4) + \
+                   struct.pack(order + 'HHIHH', 256, 3, 1, 1024, 0) + \
+                   struct.pack(order + 'HHIHH', 257, 3, 1, 768, 0) + \
+                   struct.pack(order + 'HHIHH', 259, 3, 1, 5, 0) + \
+                   struct.pack(order + 'HHII', 271, 2, 4, 0x006e6143) + \
+                   struct.pack(order + 'I', 0)
+            self.assertEqual(header._probe_tiff(header._BufferReader(data)),
+                             ('image/tiff', 1024, 768))
+
+    def test_tiff_raw_compression(self):
+        data = 'II*\x00' + struct.pack('<IH', 8, 3) + \
+               struct.pack('<HHIHH', 256, 3, 1, 4000, 0) + \
+               struct.pack('<HHIHH', 257, 3, 1, 3000, 0) + \
+               struct.pack('<HHIHH', 259, 3, 1, 34713, 0) + \
+               struct.pack('<I', 0)
+        self.assertEqual(header._probe_tiff(header._BufferReader(data)), None)
+
+    def test_memoryview(self):
+        data = 'GIF89a' + struct.pack('<HH', 320, 200)
+        self.assertEqual(probe(memoryview(data)), ('image/gif', 320, 200))
+        self.assertEqual(probe(memoryview(bytearray(data))),
+                         ('image/gif', 320, 200))
+
+    def _dng(self, order, magic):
+        # A DNG header: IFD0 holds a thumbnail, the primary image is in a
+        # SubIFD.
+        entry = lambda tag, type, value: \
+            struct.pack(order + 'HHI', tag, type, 1) + \
+            struct.pack(order + (type == 3 and 'HH' or 'I'), value,
+                        *(type == 3 and (0,) or ()))
+        subifd = 8 + 2 + 12 * 5 + 4
+        return magic + struct.pack(order + 'IH', 8, 5) + \
+               entry(254, 4, 1) + entry(256, 3, 256) + entry(257, 3, 171) + \
+               entry(330, 4, subifd) + \
+               struct.pack(order + 'HHI4B', 50706, 1, 4, 1, 4, 0, 0) + \
+               struct.pack(order + 'I', 0) + \
+               struct.pack(order + 'H', 3) + \
+               entry(254, 4, 0) + entry(256, 4, 4000) + entry(257, 4, 3000) + \
+               struct.pack(order + 'I', 0)
+
+    def test_tiff_raw(self):
+        for order, magic in (('<', 'II*\x00'), ('>', 'MM\x00*')):
+            data = self._dng(order, magic)
+            # IFD0 is not the primary image, libexiv2 is left to probe it.
+            self.assertEqual(header._probe_tiff(header._BufferReader(data)),
+                             None)
+            metadata = ImageMetadata.from_buffer(data)
+            metadata.read()
+            self.assertEqual(probe(buffer(data)),
+                             (metadata.mime_type,) + metadata.dimensions)
+
+    def test_unknown_format(self):
+        self.failUnlessRaises(IOError, probe, buffer('not an image'))
+
+    def test_nonexistent_file(self):
+        self.failUnlessRaises(IOError, probe, 'idontexist')
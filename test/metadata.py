@@ -24,14 +24,16 @@
 #
 # ******************************************************************************
 
-from pyexiv2.metadata import ImageMetadata
+from pyexiv2.metadata import ImageMetadata, FrozenMetadata, _KeyIndex
 from pyexiv2.exif import ExifTag
 from pyexiv2.iptc import IptcTag
 from pyexiv2.xmp import XmpTag
+from pyexiv2.preview import Preview
 from pyexiv2.utils import FixedOffset, make_fraction
 
 import datetime
 import os
+import pickle
 import tempfile
 import time
 import unittest
@@ -104,6 +106,39 @@ class TestImageMetadata(unittest.TestCase):
         self.metadata.read()
         self.failIfEqual(self.metadata._image, None)
 
+    def test_read_families(self):
+        self.metadata.read(families=('exif',))
+        self.assertEqual(len(self.metadata.exif_keys), 2)
+        self.assertEqual(self.metadata['Exif.Image.Make'].value,
+                         'EASTMAN KODAK COMPANY')
+        self.assertRaises(IOError, getattr, self.metadata, 'iptc_keys')
+        self.assertRaises(IOError, getattr, self.metadata, 'xmp_keys')
+        self.assertRaises(IOError, self.metadata.__getitem__,
+                          'Iptc.Application2.Caption')
+        self.assertRaises(IOError, self.metadata.__setitem__,
+                          'Xmp.dc.format', ('image', 'png'))
+        self.assertRaises(IOError, self.metadata.__delitem__,
+                          'Xmp.dc.format')
+        self.assertRaises(IOError, self.metadata.snapshot, ('iptc',))
+        self.assertEqual(list(self.metadata), self.metadata.exif_keys)
+        self.assertEqual(len(self.metadata), 2)
+        self.assertEqual(sorted(self.metadata.snapshot().keys()),
+                         sorted(self.metadata.exif_keys))
+
+    def test_read_families_write_preserves_others(self):
+        self.metadata.read(families=('exif',))
+        self.metadata['Exif.Image.Make'] = 'World Company'
+        self.metadata.write()
+        metadata = ImageMetadata(self.pathname)
+        metadata.read()
+        self.assertEqual(metadata['Exif.Image.Make'].value, 'World Company')
+        self.assertEqual(metadata['Iptc.Application2.Caption'].value,
+                         ['blabla'])
+        self.assertEqual(metadata['Xmp.dc.format'].value, ('image', 'jpeg'))
+
+    def test_read_unknown_family(self):
+        self.failUnlessRaises(ValueError, self.metadata.read, ('bleh',))
+
     def test_read_nonexistent_file(self):
         metadata = ImageMetadata('idontexist')
         self.failUnlessRaises(IOError, metadata.read)
@@ -159,7 +194,7 @@ class TestImageMetadata(unittest.TestCase):
         self.assertEqual(self.metadata._keys['exif'], None)
         keys = self.metadata.exif_keys
         self.assertEqual(len(keys), 2)
-        self.assertEqual(self.metadata._keys['exif'], keys)
+        self.assertEqual(self.metadata._keys['exif'].tolist(), keys)
 
     def test_get_exif_tag(self):
         self.metadata.read()
@@ -267,7 +302,16 @@ class TestImageMetadata(unittest.TestCase):
         self.assertEqual(self.metadata._keys['iptc'], None)
         keys = self.metadata.iptc_keys
         self.assertEqual(len(keys), 2)
-        self.assertEqual(self.metadata._keys['iptc'], keys)
+        self.assertEqual(self.metadata._keys['iptc'].tolist(), keys)
+
+    def test_iptc_key_counts(self):
+        self.metadata.read()
+        self.metadata['Iptc.Application2.Keywords'] = ['a', 'b', 'c']
+        counts = self.metadata.iptc_key_counts
+        self.assertEqual(counts, {'Iptc.Application2.Caption': 1,
+                                  'Iptc.Application2.DateCreated': 1,
+                                  'Iptc.Application2.Keywords': 3})
+        self.assertEqual(sorted(self.metadata.iptc_keys), sorted(counts))
 
     def test_get_iptc_tag(self):
         self.metadata.read()
@@ -366,6 +410,21 @@ class TestImageMetadata(unittest.TestCase):
         self.assertEqual(self.metadata._tags['iptc'], {})
         self.failIf(key in self.metadata.iptc_keys)
 
+    def test_iptc_repetitions(self):
+        self.metadata.read()
+        image = self.metadata._image
+        self.metadata['Iptc.Application2.Keywords'] = ['a', 'b', 'c']
+        self.metadata['Iptc.Application2.Writer'] = ['Nobody']
+        # Erasing repetitions moves the data that follow them.
+        self.metadata['Iptc.Application2.Keywords'] = ['d']
+        self.assertEqual(image._getIptcTag('Iptc.Application2.Keywords')._getRawValues(), ['d'])
+        self.assertEqual(image._getIptcTag('Iptc.Application2.Writer')._getRawValues(), ['Nobody'])
+        self.metadata['Iptc.Application2.Keywords'] = ['d', 'e']
+        self.metadata._delete_iptc_tag('Iptc.Application2.Caption')
+        self.assertEqual(image._getIptcTag('Iptc.Application2.Keywords')._getRawValues(), ['d', 'e'])
+        self.assertEqual(image._getIptcTag('Iptc.Application2.Writer')._getRawValues(), ['Nobody'])
+        self.assertRaises(KeyError, image._getIptcTag, 'Iptc.Application2.Caption')
+
     ##########################
     # Test XMP-related methods
     ##########################
@@ -375,7 +434,7 @@ class TestImageMetadata(unittest.TestCase):
         self.assertEqual(self.metadata._keys['xmp'], None)
         keys = self.metadata.xmp_keys
         self.assertEqual(len(keys), 2)
-        self.assertEqual(self.metadata._keys['xmp'], keys)
+        self.assertEqual(self.metadata._keys['xmp'].tolist(), keys)
 
     def test_get_xmp_tag(self):
         self.metadata.read()
@@ -475,6 +534,38 @@ class TestImageMetadata(unittest.TestCase):
         self.assertEqual(self.metadata._tags['xmp'], {})
         self.failIf(key in self.metadata.xmp_keys)
 
+    def test_delete_xmp_tag_lookup(self):
+        self.metadata.read()
+        keys = self.metadata.xmp_keys
+        self.metadata._delete_xmp_tag(keys[0])
+        # The tags that followed the deleted one can still be looked up.
+        for key in keys[1:]:
+            self.assertEqual(self.metadata._image._getXmpTag(key)._getKey(), key)
+        self.metadata['Xmp.xmp.Label'] = 'Test'
+        self.metadata._delete_xmp_tag(keys[1])
+        tag = self.metadata._image._getXmpTag('Xmp.xmp.Label')
+        self.assertEqual(tag._getKey(), 'Xmp.xmp.Label')
+        self.assertEqual(tag._getTextValue(), 'Test')
+
+    def test_delete_xmp_tags_interleaved(self):
+        self.metadata.read()
+        keys = ['Xmp.dc.k%d' % i for i in xrange(50)]
+        self.metadata.update([(key, key) for key in keys])
+        # Delete every other tag, looking up the others in between.
+        for i, key in enumerate(keys):
+            if i % 2 == 0:
+                del self.metadata[key]
+            else:
+                tag = self.metadata._image._getXmpTag(key)
+                self.assertEqual(tag._getTextValue(), key)
+        for i, key in enumerate(keys):
+            if i % 2 == 0:
+                self.failUnlessRaises(KeyError,
+                                      self.metadata._image._getXmpTag, key)
+            else:
+                tag = self.metadata._image._getXmpTag(key)
+                self.assertEqual(tag._getTextValue(), key)
+
     ###########################
     # Test dictionary interface
     ###########################
@@ -564,6 +655,24 @@ class TestImageMetadata(unittest.TestCase):
         for key in keys:
             self.metadata[key] = self.metadata[key]        
 
+    def test_key_index(self):
+        keys = ['Xmp.dc.k%d' % i for i in xrange(100)]
+        index = _KeyIndex(keys)
+        self.assertEqual(index.tolist(), keys)
+        index.add(keys[0])
+        self.assertEqual(len(index), 100)
+        for key in keys[:90:2]:
+            index.remove(key)
+            keys.remove(key)
+        self.assertEqual(index.tolist(), keys)
+        self.assertEqual(list(index), keys)
+        self.assertEqual(len(index), len(keys))
+        self.failIf('Xmp.dc.k0' in index)
+        self.failUnless('Xmp.dc.k1' in index)
+        self.failUnlessRaises(KeyError, index.remove, 'Xmp.dc.k0')
+        index.add('Xmp.dc.k0')
+        self.assertEqual(index.tolist(), keys + ['Xmp.dc.k0'])
+
     def test_nonexistent_tag_family(self):
         self.metadata.read()
         key = 'Bleh.Image.DateTime'
@@ -571,6 +680,105 @@ class TestImageMetadata(unittest.TestCase):
         self.failUnlessRaises(KeyError, self.metadata.__setitem__, key, datetime.date.today())
         self.failUnlessRaises(KeyError, self.metadata.__delitem__, key)
 
+    def test_update(self):
+        self.metadata.read()
+        values = {'Exif.Image.Make': 'Canon',
+                  'Exif.Image.XResolution': make_fraction(72, 1),
+                  'Exif.Photo.UserComment': u'déjà vu',
+                  'Exif.Photo.MakerNote': '\x00\x01\xff',
+                  'Iptc.Application2.Caption': ['foo'],
+                  'Iptc.Application2.Keywords': ['a', 'b', 'c'],
+                  'Xmp.dc.subject': ['foo', 'bar'],
+                  'Xmp.dc.title': {'x-default': 'title'},
+                  'Xmp.dc.creator': ['me']}
+        self.metadata.update(values)
+        reference = ImageMetadata(self.pathname)
+        reference.read()
+        for key, value in values.iteritems():
+            reference[key] = value
+        for key, value in values.iteritems():
+            self.failUnless(key in self.metadata)
+            self.assertEqual(self.metadata[key].value, value)
+            self.assertEqual(self.metadata[key].raw_value,
+                             reference[key].raw_value)
+        self.assertEqual(self.metadata.exif_keys, reference.exif_keys)
+        self.assertEqual(self.metadata.iptc_keys, reference.iptc_keys)
+        self.assertEqual(self.metadata.xmp_keys, reference.xmp_keys)
+
+    def test_update_tags_and_pairs(self):
+        self.metadata.read()
+        tag = ExifTag('Exif.Image.Make', 'Canon')
+        self.metadata.update([('Exif.Image.Make', 'Nikon'),
+                              ('Exif.Image.Make', tag),
+                              ('Exif.Image.Model', 'EOS')])
+        self.assertEqual(self.metadata['Exif.Image.Make'].value, 'Canon')
+        self.assertEqual(self.metadata['Exif.Image.Model'].value, 'EOS')
+
+    def test_update_keywords(self):
+        self.metadata.read()
+        self.metadata.update([('Exif.Image.Make', 'Nikon')],
+                             **{'Exif.Image.Make': 'Canon',
+                                'Xmp.dc.subject': ['foo']})
+        self.assertEqual(self.metadata['Exif.Image.Make'].value, 'Canon')
+        self.assertEqual(self.metadata['Xmp.dc.subject'].value, ['foo'])
+        # Keyword values are part of the same atomic batch.
+        self.failUnlessRaises(ValueError, self.metadata.update,
+                              {'Exif.Image.Make': 'Nikon'},
+                              **{'Exif.Image.XResolution': 'foo'})
+        self.assertEqual(self.metadata['Exif.Image.Make'].value, 'Canon')
+
+    def test_update_cached_tag(self):
+        self.metadata.read()
+        tag = self.metadata['Iptc.Application2.Caption']
+        self.metadata.update({'Iptc.Application2.Caption': ['foo']})
+        self.assertEqual(self.metadata['Iptc.Application2.Caption'].value,
+                         ['foo'])
+
+    def test_update_invalid(self):
+        self.metadata.read()
+        self.failUnlessRaises(KeyError, self.metadata.update,
+                              {'Bleh.Image.DateTime': 'foo'})
+        self.failUnlessRaises(ValueError, self.metadata.update,
+                              {'Exif.Image.XResolution': 'foo'})
+        self.failUnlessRaises(KeyError, self.metadata.update,
+                              {'Iptc.Application2.Caption': ['foo', 'bar']})
+        self.assertEqual(self.metadata['Iptc.Application2.Caption'].value,
+                         ['blabla'])
+
+    def test_update_invalid_atomic(self):
+        self.metadata.read()
+        exif_keys = self.metadata.exif_keys
+        iptc_keys = self.metadata.iptc_keys
+        xmp_keys = self.metadata.xmp_keys
+        # The invalid values come in the middle of the batch, a value that
+        # is rejected by the python tag classes and one that is rejected by
+        # libexiv2 (the caption is not repeatable).
+        for invalid in (('Exif.Image.XResolution', 'foo'),
+                        ('Iptc.Application2.Caption', ['foo', 'bar'])):
+            self.failUnlessRaises((ValueError, KeyError), self.metadata.update,
+                                  [('Exif.Image.Make', 'Nikon'),
+                                   ('Exif.Image.Artist', 'me'),
+                                   ('Iptc.Application2.Keywords', ['a']),
+                                   invalid,
+                                   ('Xmp.dc.subject', ['foo']),
+                                   ('Xmp.dc.creator', ['me'])])
+            # None of the tags were set.
+            self.assertEqual(self.metadata.exif_keys, exif_keys)
+            self.assertEqual(self.metadata.iptc_keys, iptc_keys)
+            self.assertEqual(self.metadata.xmp_keys, xmp_keys)
+            self.assertEqual(self.metadata['Exif.Image.Make'].value,
+                             'EASTMAN KODAK COMPANY')
+            self.assertEqual(
+                self.metadata['Iptc.Application2.Caption'].value, ['blabla'])
+            self.assertEqual(self.metadata['Xmp.dc.subject'].value,
+                             ['image', 'test', 'pyexiv2'])
+            image = self.metadata._image
+            for key in ('Exif.Image.Artist', 'Iptc.Application2.Keywords',
+                        'Xmp.dc.creator'):
+                family = key.split('.')[0]
+                self.failUnlessRaises(KeyError,
+                                      getattr(image, '_get%sTag' % family), key)
+
     ##########################
     # Test the image comment #
     ##########################
@@ -675,6 +883,115 @@ class TestImageMetadata(unittest.TestCase):
         self.assertTrue('Iptc.Application2.Caption' not in self.clean)
         self.assertTrue('Xmp.dc.subject' not in self.clean)
 
+    ##################
+    # Test snapshots #
+    ##################
+
+    def test_snapshot(self):
+        self.metadata.read()
+        snapshot = self.metadata.snapshot()
+        self.assertEqual(sorted(snapshot.keys()), sorted(self.metadata.keys()))
+        for key in self.metadata:
+            self.assertEqual(snapshot[key], self.metadata[key].value)
+
+    def test_snapshot_families(self):
+        self.metadata.read()
+        snapshot = self.metadata.snapshot(families=('iptc',))
+        self.assertEqual(sorted(snapshot.keys()),
+                         sorted(self.metadata.iptc_keys))
+        self.assertEqual(snapshot['Iptc.Application2.Caption'], ['blabla'])
+        self.failUnlessRaises(ValueError, self.metadata.snapshot, ('bleh',))
+
+    def test_snapshot_reflects_changes(self):
+        self.metadata.read()
+        key = 'Exif.Image.Make'
+        self.metadata[key] = 'World Company'
+        snapshot = self.metadata.snapshot(families=('exif',))
+        self.assertEqual(snapshot[key], 'World Company')
+
+    def test_snapshot_keys(self):
+        self.metadata.read()
+        keys = ('Exif.Image.Make', 'Iptc.Application2.Caption',
+                'Xmp.dc.subject', 'Exif.Image.Artist')
+        snapshot = self.metadata.snapshot(keys=keys)
+        self.assertEqual(sorted(snapshot.keys()), sorted(keys[:3]))
+        for key in snapshot:
+            self.assertEqual(snapshot[key], self.metadata[key].value)
+        self.assertEqual(self.metadata.snapshot(keys=[]), {})
+        self.failUnlessRaises(ValueError, self.metadata.snapshot,
+                              keys=('Bleh.Image.Make',))
+
+    def test_snapshot_keys_unread_family(self):
+        self.metadata.read(('exif',))
+        snapshot = self.metadata.snapshot(keys=('Exif.Image.Make',))
+        self.assertEqual(snapshot.keys(), ['Exif.Image.Make'])
+        self.failUnlessRaises(IOError, self.metadata.snapshot,
+                              keys=('Iptc.Application2.Caption',))
+
+    def test_freeze(self):
+        self.metadata.read()
+        self.metadata['Xmp.dc.title'] = {'x-default': 'Title'}
+        frozen = self.metadata.freeze()
+        self.assertEqual(frozen.families, ('exif', 'iptc', 'xmp'))
+        self.assertEqual(list(frozen), list(self.metadata))
+        self.assertEqual(frozen.exif_keys, tuple(self.metadata.exif_keys))
+        self.assertEqual(frozen.iptc_keys, tuple(self.metadata.iptc_keys))
+        self.assertEqual(frozen.xmp_keys, tuple(self.metadata.xmp_keys))
+        for key in self.metadata:
+            value = self.metadata[key].value
+            if isinstance(value, list):
+                value = tuple(value)
+            self.assertEqual(frozen[key], value)
+        self.assertEqual(frozen['Xmp.dc.subject'], ('image', 'test', 'pyexiv2'))
+        self.assertEqual(frozen.mime_type, self.metadata.mime_type)
+        self.assertEqual(frozen.dimensions, self.metadata.dimensions)
+        self.assertEqual(frozen.comment, 'Hello World!')
+        self.failUnlessRaises(KeyError, frozen.__getitem__, 'Exif.Image.Artist')
+
+        # The view and its values are immutable
+        self.failIf(hasattr(frozen, '__setitem__'))
+        title = frozen['Xmp.dc.title']
+        self.assertEqual(title, {'x-default': 'Title'})
+        self.failUnlessRaises(TypeError, title.__setitem__, 'fr-FR', 'Titre')
+        self.failUnlessRaises(TypeError, title.update, {'fr-FR': 'Titre'})
+
+        # The view does not reflect later changes
+        self.metadata['Exif.Image.Make'] = 'World Company'
+        self.assertEqual(frozen['Exif.Image.Make'], 'EASTMAN KODAK COMPANY')
+
+        # The view can be pickled
+        for protocol in xrange(pickle.HIGHEST_PROTOCOL + 1):
+            unpickled = pickle.loads(pickle.dumps(frozen, protocol))
+            self.assertEqual(dict(unpickled), dict(frozen))
+            self.assertEqual(list(unpickled), list(frozen))
+
+    def test_freeze_families(self):
+        self.metadata.read(('exif', 'xmp'))
+        frozen = self.metadata.freeze()
+        self.assertEqual(frozen.families, ('exif', 'xmp'))
+        self.failUnlessRaises(IOError, getattr, frozen, 'iptc_keys')
+        self.failIf('Iptc.Application2.Caption' in frozen)
+        frozen = self.metadata.freeze(('xmp',))
+        self.assertEqual(list(frozen), self.metadata.xmp_keys)
+        self.failUnlessRaises(IOError, self.metadata.freeze, ('iptc',))
+
+    def test_freeze_duplicate_keys(self):
+        # An EXIF tag may be repeated in the image, its key maps to a single
+        # value.
+        keys = {'exif': ['Exif.Image.Make', 'Exif.Image.Model',
+                         'Exif.Image.Make'],
+                'xmp': ['Xmp.dc.format']}
+        values = {'Exif.Image.Make': 'Canon', 'Exif.Image.Model': 'EOS',
+                  'Xmp.dc.format': 'image/jpeg'}
+        frozen = FrozenMetadata(keys, values)
+        self.assertEqual(frozen.exif_keys,
+                         ('Exif.Image.Make', 'Exif.Image.Model'))
+        self.assertEqual(list(frozen), ['Exif.Image.Make', 'Exif.Image.Model',
+                                        'Xmp.dc.format'])
+        self.assertEqual(len(frozen), 3)
+        self.assertEqual(len(frozen.items()), 3)
+        self.assertEqual(len(frozen._select(('exif',))), 2)
+
     ###########################
     # Test the EXIF thumbnail #
     ###########################
@@ -781,6 +1098,48 @@ class TestImageMetadata(unittest.TestCase):
         self.assertEqual(thumb.extension, preview.extension)
         self.assertEqual(thumb.data, preview.data)
 
+    def test_preview_write_to_file(self):
+        self.metadata.read()
+        self.metadata.exif_thumbnail.data = EMPTY_JPG_DATA
+        preview = self.metadata.previews[0]
+        self.assertEqual(preview.size, len(preview.data))
+        fd, pathname = tempfile.mkstemp()
+        os.close(fd)
+        os.remove(pathname)
+        preview.write_to_file(pathname)
+        filename = pathname + preview.extension
+        try:
+            fd = open(filename, 'rb')
+            self.assertEqual(fd.read(), preview.data)
+            fd.close()
+        finally:
+            os.remove(filename)
+
+    def test_preview_data_after_write(self):
+        self.metadata.read()
+        self.metadata.exif_thumbnail.data = EMPTY_JPG_DATA
+        self.metadata.write()
+        self.metadata.read()
+        extracted, pending = self.metadata.previews[0], \
+                             self.metadata.previews[0]
+        self.assertEqual(extracted.data, EMPTY_JPG_DATA)
+        self.metadata['Exif.Image.Make'] = 'a much longer make than before'
+        self.metadata.write()
+        # The data extracted before the write is kept, the properties of the
+        # other preview are stale.
+        self.assertEqual(extracted.data, EMPTY_JPG_DATA)
+        self.failUnlessRaises(IOError, getattr, pending, 'data')
+        self.failUnlessRaises(IOError, pending.write_to_file, '/tmp/foobar')
+        self.assertEqual(self.metadata.previews[0].data, EMPTY_JPG_DATA)
+
+    def test_preview_without_metadata(self):
+        class _Preview(object):
+            mime_type = 'image/jpeg'
+            data = EMPTY_JPG_DATA
+        preview = Preview(_Preview())
+        self.assertEqual(preview.mime_type, 'image/jpeg')
+        self.assertEqual(preview.data, EMPTY_JPG_DATA)
+
     #########################
     # Test the IPTC charset #
     #########################
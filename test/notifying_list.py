@@ -27,6 +27,7 @@
 import unittest
 from pyexiv2.utils import ListenerInterface, NotifyingList
 import random
+import pickle
 
 
 class SimpleListener(ListenerInterface):
@@ -336,3 +337,18 @@ class TestNotifyingList(unittest.TestCase):
         self.failUnlessEqual(self.values, [])
         for listener in listeners:
             self.failUnlessEqual(listener.changes, 7)
+
+    def test_pickle(self):
+        listeners = self._register_listeners()
+        for protocol in xrange(pickle.HIGHEST_PROTOCOL + 1):
+            values = pickle.loads(pickle.dumps(self.values, protocol))
+            self.assert_(isinstance(values, NotifyingList))
+            self.assertEqual(values, self.values)
+            # Listeners are not pickled
+            values.append(3)
+            for listener in listeners:
+                self.assertEqual(listener.changes, 0)
+            listener = SimpleListener()
+            values.register_listener(listener)
+            values.append(3)
+            self.assertEqual(listener.changes, 1)
@@ -34,6 +34,11 @@ import pickle
 import datetime
 
 
+class CustomExifTag(ExifTag):
+    # Subclasses of tags do not need to define __slots__.
+    pass
+
+
 class TestPicklingTags(unittest.TestCase):
 
     def test_pickle_exif_tag(self):
@@ -115,3 +120,27 @@ class TestPicklingTags(unittest.TestCase):
             self.assertEqual(t.raw_value, tag.raw_value)
             self.assertEqual(t.value, tag.value)
 
+    def test_pickle_protocols(self):
+        tags = []
+        tags.append(ExifTag('Exif.Image.BitsPerSample', [8, 8, 8]))
+        tags.append(IptcTag('Iptc.Application2.Subject', ['foo', 'bar']))
+        tags.append(XmpTag('Xmp.dc.subject', ['foo', 'bar', 'baz']))
+        for tag in tags:
+            self.failIf(hasattr(tag, '__dict__'))
+            for protocol in xrange(pickle.HIGHEST_PROTOCOL + 1):
+                t = pickle.loads(pickle.dumps(tag, protocol))
+                self.assert_(isinstance(t, tag.__class__))
+                self.assertEqual(t.key, tag.key)
+                self.assertEqual(t.raw_value, tag.raw_value)
+                self.assertEqual(t.value, tag.value)
+                # The unpickled tag is fully functional
+                t.value = tag.value[:1]
+                self.assertEqual(t.value, tag.value[:1])
+
+    def test_pickle_subclass(self):
+        tag = CustomExifTag('Exif.Image.Copyright', '(C) 2010 Santa Claus')
+        tag.comment = 'Subclasses may have extra attributes'
+        for protocol in xrange(pickle.HIGHEST_PROTOCOL + 1):
+            t = pickle.loads(pickle.dumps(tag, protocol))
+            self.assert_(isinstance(t, CustomExifTag))
+            self.assertEqual(t.value, tag.value)
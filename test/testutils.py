@@ -26,6 +26,7 @@
 
 import os.path
 import hashlib
+import struct
 
 
 EMPTY_JPG_DATA = \
@@ -47,6 +48,29 @@ EMPTY_JPG_DATA = \
     '\x00\x08\x01\x01\x00\x00?\x00\x92\xbf\xff\xd9'
 
 
+def make_tiff_data(description):
+    """
+    Return the data of a minimal TIFF image (one grey pixel) with the given
+    image description.
+    """
+    description += '\x00'
+    # The tags, sorted, followed by the description and the pixel
+    offset = 8 + 2 + 9 * 12 + 4
+    entries = [(256, 3, 1, 1), (257, 3, 1, 1), (258, 3, 1, 8),
+               (259, 3, 1, 1), (262, 3, 1, 1),
+               (270, 2, len(description), offset),
+               (273, 4, 1, offset + len(description)),
+               (278, 3, 1, 1), (279, 4, 1, 1)]
+    data = 'II*\x00' + struct.pack('<I', 8) + struct.pack('<H', len(entries))
+    for tag, type, count, value in entries:
+        if type == 3:
+            data += struct.pack('<HHIHH', tag, type, count, value, 0)
+        else:
+            data += struct.pack('<HHII', tag, type, count, value)
+    data += struct.pack('<I', 0)
+    return data + description + '\x80'
+
+
 def get_absolute_file_path(filepath):
     """
     Return the absolute file path for the file path given in argument,
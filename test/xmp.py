@@ -484,3 +484,21 @@ class TestXmpNamespaces(unittest.TestCase):
         self.assertRaises(KeyError, self.metadata.__setitem__, 'Xmp.%s.baz' % prefix, 'foobaz')
         self.assertRaises(KeyError, self.metadata.__setitem__, 'Xmp.%s.baz' % prefix2, 'foobaz')
 
+
+    def test_tag_outlives_ns(self):
+        # The description of a tag is dropped from the cache when its
+        # namespace is unregistered, but the tag keeps its own.
+        name = 'blep/'
+        prefix = 'bep'
+        key = 'Xmp.%s.bar' % prefix
+        register_namespace(name, prefix)
+        tag = XmpTag(key, 'foobar')
+        type, title = tag.type, tag.title
+        unregister_namespace(name)
+        self.assertEqual(tag.type, type)
+        self.assertEqual(tag.title, title)
+        self.assertEqual(tag.value, 'foobar')
+        self.assertRaises(KeyError, XmpTag, key, 'foobar')
+        register_namespace(name, prefix)
+        self.assertEqual(XmpTag(key, 'foobar').type, type)
+        unregister_namespace(name)